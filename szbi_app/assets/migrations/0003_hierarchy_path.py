@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:56
+
+from django.db import migrations, models
+
+
+# Kopia populate_tree_paths z core/hierarchy.py z chwili utworzenia migracji -
+# późniejsze zmiany modułu nie mogą zmieniać jej działania
+
+def populate_tree_paths(model):
+    """Wylicza ścieżki ("/1/5/12/") i poziomy wszystkich węzłów modelu historycznego"""
+    parents = dict(model.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def resolve(pk):
+        chain = []
+        current = pk
+        while current is not None and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents.get(current)
+        # current w chain oznacza cykl - przerywamy go, traktując węzeł jako korzeń
+        base = paths.get(current, '') if current not in chain else ''
+        for node in reversed(chain):
+            base = f'{base or "/"}{node}/'
+            paths[node] = base
+        return paths[pk]
+
+    nodes = list(model.objects.all())
+    for node in nodes:
+        node.hierarchy_path = resolve(node.pk)
+        node.hierarchy_depth = node.hierarchy_path.strip('/').count('/')
+    model.objects.bulk_update(nodes, ['hierarchy_path', 'hierarchy_depth'], batch_size=500)
+
+
+def populate_paths(apps, schema_editor):
+    """Wylicza ścieżki hierarchii dla istniejących rekordów"""
+    for model_name in ['AssetCategory']:
+        populate_tree_paths(apps.get_model('assets', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_remove_asset_custodian_remove_asset_inventory_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetcategory',
+            name='hierarchy_depth',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Poziom w hierarchii'),
+        ),
+        migrations.AddField(
+            model_name='assetcategory',
+            name='hierarchy_path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=500, verbose_name='Ścieżka w hierarchii'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
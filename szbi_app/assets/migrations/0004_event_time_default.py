@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_hierarchy_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assetlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data i czas'),
+        ),
+    ]
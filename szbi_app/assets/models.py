@@ -1,9 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from core.models import Department, Employee
+from core.hierarchy import MaterializedPathModel
 
 
-class AssetCategory(models.Model):
+class AssetCategory(MaterializedPathModel):
     """Kategoria/Grupa aktywów - np. Sprzęt IT, Oprogramowanie, Dane, Usługi"""
     name = models.CharField(
         max_length=100,
@@ -40,9 +42,7 @@ class AssetCategory(models.Model):
     
     def get_full_path(self):
         """Zwraca pełną ścieżkę kategorii w hierarchii"""
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
-        return self.name
+        return self.get_path_display()
 
 
 class Asset(models.Model):
@@ -196,7 +196,7 @@ class AssetLog(models.Model):
         blank=True,
         verbose_name="Opis"
     )
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Data i czas")
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Data i czas")
 
     class Meta:
         verbose_name = "Dziennik aktywów"
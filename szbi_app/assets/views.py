@@ -12,6 +12,7 @@ from core.mixins import (
     SZBIPermissionRequiredMixin,
     PERM_ASSETS_ADMIN, PERM_ASSETS_OWNER, PERM_ASSETS_VIEW
 )
+from core import log_writer
 
 # Uprawnienia do przeglądania aktywów
 ASSETS_VIEW_PERMISSIONS = [PERM_ASSETS_ADMIN, PERM_ASSETS_OWNER, PERM_ASSETS_VIEW]
@@ -21,12 +22,12 @@ ASSETS_EDIT_PERMISSIONS = [PERM_ASSETS_ADMIN, PERM_ASSETS_OWNER]
 
 def _log_action(asset, user, action, description=""):
     """Helper do logowania akcji na aktywie"""
-    AssetLog.objects.create(
+    log_writer.enqueue(AssetLog(
         asset=asset,
         user=user,
         action=action,
         description=description
-    )
+    ))
 
 
 # ============== KATEGORIE AKTYWÓW ==============
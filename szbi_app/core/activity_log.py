@@ -0,0 +1,268 @@
+"""
+Odczyt dziennika zdarzeń - filtry i stronicowanie.
+
+Stronicowanie jest kursorowe (keyset) według (created_at, id), zgodnie
+z indeksami -created_at - kolejna strona to warunek "starsze niż ostatni
+wiersz" zamiast OFFSET, więc koszt nie rośnie z numerem strony. Kursory są
+nieprzezroczyste (base64) i niosą pozycję oraz kierunek.
+
+Łączna liczba zdarzeń nie jest liczona przy każdym wyświetleniu - wynik
+COUNT(*) jest przechowywany w cache dla danego zestawu filtrów.
+"""
+import base64
+import hashlib
+import itertools
+import json
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import log_archive
+from .log_search import get_search_backend
+from .models import ActivityLog
+
+
+PAGE_SIZE = 50
+FILTER_PARAMS = ('category', 'action', 'user', 'date_from', 'date_to', 'search', 'order')
+
+
+# ============== FILTRY ==============
+
+def get_activity_log_filters(params):
+    """Odczytuje filtry dziennika z parametrów GET (brakujące jako None)"""
+    return {name: params.get(name) or None for name in FILTER_PARAMS}
+
+
+def filter_activity_logs(queryset, filters):
+    """Zawęża queryset dziennika zgodnie z filtrami"""
+    if filters['category']:
+        queryset = queryset.filter(category=filters['category'])
+    if filters['action']:
+        queryset = queryset.filter(action=filters['action'])
+    if filters['user']:
+        queryset = queryset.filter(user_id=filters['user'])
+    # Zakres półotwarty [początek dnia od, początek dnia po "do") w strefie
+    # TIME_ZONE - warunek na samej kolumnie korzysta z indeksów created_at
+    date_from = _day_start(filters['date_from'])
+    if date_from is not None:
+        queryset = queryset.filter(created_at__gte=date_from)
+    date_to = _day_start(filters['date_to'], days=1)
+    if date_to is not None:
+        queryset = queryset.filter(created_at__lt=date_to)
+    if filters['search']:
+        queryset = get_search_backend().filter(queryset, filters['search'])
+    return queryset
+
+
+def _day_start(value, days=0):
+    """Początek dnia (przesuniętego o days) jako datetime w strefie TIME_ZONE"""
+    try:
+        day = parse_date(value) if value else None
+    except ValueError:
+        day = None
+    if day is None:
+        return None
+    try:
+        day += timedelta(days=days)
+        start = timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+        # Wartość zapisywana w bazie w UTC też musi mieścić się w zakresie
+        start.astimezone(dt_timezone.utc)
+    except OverflowError:
+        # Granica poza zakresem datetime (np. 9999-12-31) - zakres otwarty
+        return None
+    return start
+
+
+def get_filtered_logs(filters):
+    return filter_activity_logs(ActivityLog.objects.select_related('user'), filters)
+
+
+def get_relevance_page(filters, per_page=PAGE_SIZE):
+    """
+    Najtrafniejsze wyniki wyszukiwania (ranking backendu wyszukiwania) - bez
+    dalszych stron, przeglądanie chronologiczne zapewnia stronicowanie kursorowe.
+    """
+    without_search = dict(filters, search=None)
+    items = get_search_backend().ranked(get_filtered_logs(without_search), filters['search'], per_page)
+    return KeysetPage(items, has_next=False, has_previous=False)
+
+
+# ============== KURSORY ==============
+
+def encode_cursor(created_at, pk, direction):
+    payload = json.dumps([created_at.isoformat(), pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Zwraca (created_at, id, kierunek) lub None dla błędnego kursora"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            return None
+        return datetime.fromisoformat(created_at), int(pk), direction
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """Strona wyników stronicowania kursorowego"""
+
+    def __init__(self, items, has_next, has_previous):
+        self.object_list = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if items and has_next:
+            last = items[-1]
+            self.next_cursor = encode_cursor(last.created_at, last.pk, 'next')
+        if items and has_previous:
+            first = items[0]
+            self.previous_cursor = encode_cursor(first.created_at, first.pk, 'prev')
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def get_archive_filter(filters):
+    """Filtry dla archiwum (core/log_archive.py) lub None gdy archiwum jest puste"""
+    if not log_archive.read_manifest()['months']:
+        return None
+    return log_archive.ArchiveFilter(
+        filters, _day_start(filters['date_from']), _day_start(filters['date_to'], days=1)
+    )
+
+
+def paginate_keyset(queryset, cursor=None, per_page=PAGE_SIZE, archive_filter=None):
+    """
+    Zwraca stronę (od najnowszych) po kursorze - jedno zapytanie
+    z LIMIT per_page + 1 (nadmiarowy wiersz oznacza istnienie kolejnej strony).
+    Warunek kursora ma postać zakresu na created_at (bez OR), by mógł
+    korzystać z indeksów.
+
+    Z archive_filter, po wyczerpaniu tabeli bieżącej stronicowanie jest
+    kontynuowane w archiwum (wpisy archiwum są starsze od wpisów w tabeli).
+    """
+    position = decode_cursor(cursor)
+    if position is None or position[2] == 'next':
+        if position is None:
+            items = list(queryset.order_by('-created_at', '-pk')[:per_page + 1])
+        else:
+            created_at, pk, _ = position
+            items = list(queryset.filter(created_at__lte=created_at).exclude(
+                created_at=created_at, pk__gte=pk
+            ).order_by('-created_at', '-pk')[:per_page + 1])
+        if len(items) <= per_page and archive_filter is not None:
+            before = position[:2] if position is not None else None
+            if items:
+                before = (items[-1].created_at, items[-1].pk)
+            items.extend(itertools.islice(
+                log_archive.iter_archive(archive_filter, before=before), per_page + 1 - len(items)
+            ))
+        return KeysetPage(items[:per_page], has_next=len(items) > per_page, has_previous=position is not None)
+
+    created_at, pk, _ = position
+    items = []
+    if archive_filter is not None:
+        newest_archived = log_archive.archive_newest_at()
+        if newest_archived is not None and created_at <= newest_archived:
+            items = log_archive.archive_entries_after(archive_filter, (created_at, pk), per_page + 1)
+    if len(items) <= per_page:
+        items.extend(queryset.filter(created_at__gte=created_at).exclude(
+            created_at=created_at, pk__lte=pk
+        ).order_by('created_at', 'pk')[:per_page + 1 - len(items)])
+    has_previous = len(items) > per_page
+    items = items[:per_page]
+    items.reverse()
+    return KeysetPage(items, has_next=True, has_previous=has_previous)
+
+
+# ============== LICZBA ZDARZEŃ ==============
+
+def get_cached_count(queryset, filters):
+    """
+    Liczba zdarzeń dla filtrów - z cache (przybliżona, aktualna z dokładnością
+    do SZBI_ACTIVITY_LOG_COUNT_TIMEOUT sekund). None gdy liczenie wyłączone.
+    """
+    timeout = getattr(settings, 'SZBI_ACTIVITY_LOG_COUNT_TIMEOUT', 300)
+    if timeout is None:
+        return None
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    key = f'szbi:activity_log:count:{digest}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, timeout)
+    return count
+
+
+# ============== EKSPORT ==============
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_COLUMNS = [
+    ('id', 'ID'),
+    ('created_at', 'Data'),
+    ('username', 'Użytkownik'),
+    ('action', 'Akcja'),
+    ('category', 'Kategoria'),
+    ('object_type', 'Typ obiektu'),
+    ('object_id', 'ID obiektu'),
+    ('object_repr', 'Obiekt'),
+    ('description', 'Opis'),
+    ('details', 'Szczegóły'),
+    ('ip_address', 'Adres IP'),
+    ('user_agent', 'User-Agent'),
+]
+
+
+def iter_export_logs(filters, include_archive=True, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Wszystkie zdarzenia spełniające filtry (od najnowszych) jako słowniki
+    serialize_log - odczyt porcjami przez iterator(), bez ładowania całego
+    wyniku do pamięci; po tabeli bieżącej wpisy z archiwum.
+    """
+    logs = get_filtered_logs(filters).order_by('-created_at', '-pk')
+    for log in logs.iterator(chunk_size=chunk_size):
+        yield log_archive.serialize_log(log)
+    archive_filter = get_archive_filter(filters) if include_archive else None
+    if archive_filter is not None:
+        for entry in log_archive.iter_archive(archive_filter):
+            yield entry.row
+
+
+# Początki komórek interpretowane przez arkusze kalkulacyjne jako formuła
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_csv_value(value):
+    """
+    Tekst zaczynający się jak formuła (np. opis lub nazwa podana przez
+    użytkownika) poprzedza apostrofem, by arkusz nie wykonał go przy otwarciu pliku
+    """
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_csv_row(row):
+    """Wiersz CSV w kolejności EXPORT_COLUMNS (details jako JSON, formuły zneutralizowane)"""
+    values = []
+    for name, _ in EXPORT_COLUMNS:
+        value = row[name]
+        if name == 'details':
+            value = json.dumps(value, ensure_ascii=False) if value else ''
+        values.append('' if value is None else escape_csv_value(value))
+    return values
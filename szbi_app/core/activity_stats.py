@@ -0,0 +1,233 @@
+"""
+Statystyki dziennika zdarzeń z dziennych agregatów (ActivityDailyRollup).
+
+Agregaty aktualizowane są przyrostowo przez core/log_writer.py w transakcji
+zapisu wpisów (jedno UPDATE count = count + n na klucz paczki), a komenda
+rebuild_activity_rollups odtwarza je z tabeli dziennika i archiwum. Wykresy na panelu
+głównym i stronie statystyk czytają wyłącznie agregaty - koszt zapytań
+zależy od liczby dni i kluczy, a nie od wielkości dziennika.
+
+Dzień zdarzenia liczony jest w strefie TIME_ZONE. Wpisy przeniesione do
+archiwum (core/log_archive.py) pozostają w agregatach.
+
+W ten sam sposób utrzymywana jest lista uczestników dziennika
+(ActivityLogParticipant) - użytkowników z liczbą wpisów i czasem ostatniej
+aktywności, używana w listach wyboru zamiast DISTINCT po całym dzienniku.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateTimeField, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDate, TruncMonth
+from django.utils import timezone
+
+from . import log_archive
+from .models import ActivityDailyRollup, ActivityLog, ActivityLogParticipant
+
+
+# ============== AKTUALIZACJA ==============
+
+def record_entries(entries):
+    """Dolicza zapisane wpisy ActivityLog do agregatów dziennych i uczestników dziennika"""
+    logs = [entry for entry in entries if isinstance(entry, ActivityLog)]
+    counts = Counter(
+        (timezone.localdate(entry.created_at), entry.category, entry.action, entry.user_id)
+        for entry in logs
+    )
+    for (day, category, action, user_id), count in counts.items():
+        _add_to_rollup({'day': day, 'category': category, 'action': action, 'user_id': user_id}, count)
+    _record_participants(logs)
+
+
+def _add_to_rollup(key, count):
+    rollup = ActivityDailyRollup.objects.filter(**key)
+    if rollup.update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            ActivityDailyRollup.objects.create(count=count, **key)
+    except IntegrityError:
+        # Wiersz utworzony równolegle przez inny proces
+        rollup.update(count=F('count') + count)
+
+
+def fold_user_rollups(user_id):
+    """Dołącza agregaty użytkownika do wierszy bez użytkownika (przed usunięciem użytkownika)"""
+    with transaction.atomic():
+        rows = ActivityDailyRollup.objects.filter(user_id=user_id)
+        for day, category, action, count in rows.values_list('day', 'category', 'action', 'count'):
+            _add_to_rollup({'day': day, 'category': category, 'action': action, 'user_id': None}, count)
+        rows.delete()
+
+
+def _record_participants(logs):
+    activity = {}
+    for entry in logs:
+        if entry.user_id is None:
+            continue
+        first, last, count = activity.get(entry.user_id, (entry.created_at, entry.created_at, 0))
+        activity[entry.user_id] = (min(first, entry.created_at), max(last, entry.created_at), count + 1)
+    for user_id, (first, last, count) in activity.items():
+        participant = ActivityLogParticipant.objects.filter(user_id=user_id)
+        changes = {
+            'first_activity_at': Least('first_activity_at', Value(first, output_field=DateTimeField())),
+            'last_activity_at': Greatest('last_activity_at', Value(last, output_field=DateTimeField())),
+            'entry_count': F('entry_count') + count,
+        }
+        if participant.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                ActivityLogParticipant.objects.create(
+                    user_id=user_id, first_activity_at=first, last_activity_at=last, entry_count=count,
+                )
+        except IntegrityError:
+            # Wiersz utworzony równolegle przez inny proces
+            participant.update(**changes)
+
+
+def rebuild(since=None, batch_size=1000):
+    """
+    Odtwarza agregaty (od dnia since lub wszystkie) z tabeli dziennika
+    i z archiwum. Zwraca liczbę utworzonych wierszy agregatów.
+    """
+    start = None
+    logs = ActivityLog.objects.order_by()
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min), timezone.get_default_timezone())
+        logs = logs.filter(created_at__gte=start)
+    rows = logs.annotate(
+        day=TruncDate('created_at', tzinfo=timezone.get_default_timezone())
+    ).values('day', 'category', 'action', 'user_id').annotate(total=Count('pk'))
+
+    # Dzień może mieć wpisy zarówno w tabeli, jak i w archiwum - jeden wiersz na klucz
+    archived = Counter()
+    counts = _count_archived(start)
+    # Wpisy archiwum usuniętych użytkowników - jak w tabeli, bez użytkownika
+    existing = set(User.objects.filter(pk__in={key[3] for key in counts}).values_list('pk', flat=True))
+    for (day, category, action, user_id), count in counts.items():
+        archived[(day, category, action, user_id if user_id in existing else None)] += count
+    created = 0
+    with transaction.atomic():
+        stale = ActivityDailyRollup.objects.all()
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        batch = []
+        for row in rows.iterator():
+            key = (row['day'], row['category'], row['action'], row['user_id'])
+            batch.append(ActivityDailyRollup(
+                day=row['day'], category=row['category'], action=row['action'],
+                user_id=row['user_id'], count=row['total'] + archived.pop(key, 0),
+            ))
+            if len(batch) >= batch_size:
+                created += len(ActivityDailyRollup.objects.bulk_create(batch))
+                batch = []
+        for (day, category, action, user_id), count in archived.items():
+            batch.append(ActivityDailyRollup(
+                day=day, category=category, action=action, user_id=user_id, count=count,
+            ))
+        created += len(ActivityDailyRollup.objects.bulk_create(batch, batch_size=batch_size))
+    return created
+
+
+def _count_archived(start=None):
+    """Liczności wpisów archiwum (od chwili start) wg klucza agregatu - odczyt strumieniowy"""
+    counts = Counter()
+    for month, info in log_archive.read_manifest()['months'].items():
+        if start is not None and datetime.fromisoformat(info['max_created_at']) < start:
+            continue
+        for row in log_archive.iter_month_rows(month):
+            created_at = datetime.fromisoformat(row['created_at'])
+            if start is not None and created_at < start:
+                continue
+            counts[(timezone.localdate(created_at), row['category'], row['action'], row['user_id'])] += 1
+    return counts
+
+
+def rebuild_participants():
+    """Odtwarza uczestników dziennika z tabeli dziennika i archiwum; zwraca ich liczbę"""
+    activity = {
+        row['user_id']: (row['first'], row['last'], row['total'])
+        for row in ActivityLog.objects.filter(user__isnull=False).order_by().values('user_id').annotate(
+            first=Min('created_at'), last=Max('created_at'), total=Count('pk')
+        )
+    }
+    for month in log_archive.read_manifest()['months']:
+        for row in log_archive.iter_month_rows(month):
+            if row['user_id'] is None:
+                continue
+            created_at = datetime.fromisoformat(row['created_at'])
+            first, last, count = activity.get(row['user_id'], (created_at, created_at, 0))
+            activity[row['user_id']] = (min(first, created_at), max(last, created_at), count + 1)
+    # Wpisy archiwum mogą dotyczyć usuniętych użytkowników
+    existing = set(User.objects.filter(pk__in=activity).values_list('pk', flat=True))
+    with transaction.atomic():
+        ActivityLogParticipant.objects.all().delete()
+        ActivityLogParticipant.objects.bulk_create([
+            ActivityLogParticipant(user_id=user_id, first_activity_at=first, last_activity_at=last, entry_count=count)
+            for user_id, (first, last, count) in activity.items() if user_id in existing
+        ], batch_size=1000)
+    return len(existing)
+
+
+# ============== ODCZYT ==============
+
+def get_participants():
+    """Użytkownicy występujący w dzienniku (do list wyboru) - bez odczytu dziennika"""
+    return ActivityLogParticipant.objects.select_related('user').order_by('user__username')
+
+
+def get_rollups(category=None, action=None, user=None):
+    rollups = ActivityDailyRollup.objects.order_by()
+    if category:
+        rollups = rollups.filter(category=category)
+    if action:
+        rollups = rollups.filter(action=action)
+    if user:
+        rollups = rollups.filter(user_id=user)
+    return rollups
+
+
+def _month_start(day, months_back=0):
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def daily_trend(days=30, today=None, **filters):
+    """Lista (dzień, liczba) dla ostatnich `days` dni (z zerami)"""
+    today = today or timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    totals = dict(
+        get_rollups(**filters).filter(day__gte=first, day__lte=today)
+        .values_list('day').annotate(total=Sum('count'))
+    )
+    return [(first + timedelta(days=i), totals.get(first + timedelta(days=i), 0)) for i in range(days)]
+
+
+def monthly_trend(months=12, today=None, **filters):
+    """Lista (pierwszy dzień miesiąca, liczba) dla ostatnich `months` miesięcy (z zerami)"""
+    today = today or timezone.localdate()
+    first = _month_start(today, months - 1)
+    totals = {
+        month: total for month, total in
+        get_rollups(**filters).filter(day__gte=first, day__lte=today)
+        .annotate(month=TruncMonth('day')).values_list('month').annotate(total=Sum('count'))
+    }
+    return [(month, totals.get(month, 0)) for month in (_month_start(today, i) for i in reversed(range(months)))]
+
+
+def breakdown(field, since, limit=10, **filters):
+    """Najczęstsze wartości pola (category, action, user) od dnia since"""
+    return list(
+        get_rollups(**filters).filter(day__gte=since)
+        .values(field).annotate(total=Sum('count')).order_by('-total')[:limit]
+    )
+
+
+def with_bar_width(series):
+    """Dodaje do (etykieta, liczba) szerokość słupka w % względem maksimum"""
+    peak = max((count for _, count in series), default=0) or 1
+    return [(label, count, round(count * 100 / peak)) for label, count in series]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Organization, Department, Position, Permission, PermissionGroup, PositionPermission, DepartmentPermission, Employee, EmployeePermissionGroup, ActivityLog
+from .models import Organization, Department, Position, Permission, PermissionGroup, PositionPermission, DepartmentPermission, Employee, EmployeePermissionGroup, EmployeeEffectivePermission, ActivityLog
 
 
 @admin.register(Organization)
@@ -69,6 +69,23 @@ class EmployeePermissionGroupAdmin(admin.ModelAdmin):
     list_filter = ['permission_group']
 
 
+@admin.register(EmployeeEffectivePermission)
+class EmployeeEffectivePermissionAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'permission', 'source']
+    list_filter = ['source', 'permission']
+    search_fields = ['employee__first_name', 'employee__last_name', 'permission__name']
+    
+    # Tabela pochodna - utrzymywana automatycznie
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ActivityLog)
 class ActivityLogAdmin(admin.ModelAdmin):
     list_display = ['created_at', 'user', 'action', 'category', 'object_repr', 'ip_address']
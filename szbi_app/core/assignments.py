@@ -0,0 +1,116 @@
+"""
+Synchronizacja przypisań grup uprawnień do stanowisk, działów i pracowników.
+
+Zamiast usuwać wszystkie przypisania i tworzyć je od nowa, porównywany jest
+stan bieżący z żądanym i zapisywane są tylko różnice (jedno DELETE, jedno
+bulk_create) w jednej transakcji. Dane pochodne uprawnień odświeżane są raz,
+a zmiana trafia do dziennika zdarzeń jednym wpisem.
+"""
+from typing import NamedTuple
+
+from django.db import transaction
+
+from .models import (
+    Department, Position, Employee, PermissionGroup, ActivityLog,
+    PositionPermission, DepartmentPermission, EmployeePermissionGroup,
+)
+from .signals import ASSIGNMENT_OWNERS, deferred_permission_refresh, employees_permissions_changed
+
+
+# Model właściciela -> model przypisania
+ASSIGNMENT_MODELS = {
+    Position: PositionPermission,
+    Department: DepartmentPermission,
+    Employee: EmployeePermissionGroup,
+}
+
+
+class AssignmentChanges(NamedTuple):
+    """Wynik synchronizacji - nazwy dodanych i usuniętych grup"""
+    added: list
+    removed: list
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+
+def _group_id(value):
+    return value.pk if isinstance(value, PermissionGroup) else int(value)
+
+
+def sync_permission_groups(owner, groups, request=None):
+    """
+    Ustawia grupy uprawnień właściciela (stanowiska, działu lub pracownika).
+
+    Args:
+        owner: Position, Department lub Employee
+        groups: identyfikatory lub obiekty PermissionGroup (żądany stan)
+        request: Obiekt request do wpisu w dzienniku (opcjonalne)
+
+    Returns:
+        AssignmentChanges z nazwami dodanych i usuniętych grup
+    """
+    assignment_model = ASSIGNMENT_MODELS[type(owner)]
+    owner_field, resolve_employees = ASSIGNMENT_OWNERS[assignment_model]
+    assignments = assignment_model.objects.filter(**{owner_field: owner.pk})
+    requested = {_group_id(group) for group in groups}
+
+    with transaction.atomic(), deferred_permission_refresh():
+        current = set(assignments.values_list('permission_group_id', flat=True))
+        # Pomijamy identyfikatory nieistniejących grup
+        names = dict(PermissionGroup.objects.filter(
+            pk__in=requested | current
+        ).values_list('pk', 'name'))
+        added = {pk for pk in requested - current if pk in names}
+        removed = current - requested
+
+        if not added and not removed:
+            return AssignmentChanges([], [])
+
+        if removed:
+            assignments.filter(permission_group_id__in=removed).delete()
+        if added:
+            # bulk_create nie wysyła sygnałów - odświeżenie poniżej
+            assignment_model.objects.bulk_create([
+                assignment_model(**{owner_field: owner.pk, 'permission_group_id': pk})
+                for pk in added
+            ])
+        employees_permissions_changed(resolve_employees({owner.pk}))
+
+        changes = AssignmentChanges(
+            sorted(names[pk] for pk in added),
+            sorted(names.get(pk, str(pk)) for pk in removed),
+        )
+        _log_changes(owner, changes, request)
+    return changes
+
+
+def _log_changes(owner, changes, request):
+    """Jeden wpis w dzienniku zdarzeń dla całej zmiany"""
+    if changes.added and changes.removed:
+        action = 'update'
+    elif changes.added:
+        action = 'assign'
+    else:
+        action = 'unassign'
+
+    parts = []
+    if changes.added:
+        parts.append(f'dodano: {", ".join(changes.added)}')
+    if changes.removed:
+        parts.append(f'usunięto: {", ".join(changes.removed)}')
+
+    user = None
+    if request is not None and request.user.is_authenticated:
+        user = request.user
+    ActivityLog.log(
+        user=user,
+        action=action,
+        category='permission',
+        object_type=owner.__class__.__name__,
+        object_id=owner.pk,
+        object_repr=str(owner),
+        description=f'Zmieniono grupy uprawnień "{owner}" ({"; ".join(parts)})',
+        details={'added': changes.added, 'removed': changes.removed},
+        request=request,
+    )
@@ -0,0 +1,40 @@
+"""
+Uwierzytelnianie użytkowników - ModelBackend z odkładaną aktualizacją
+skrótu hasła (core/hashers.py).
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import BaseBackend, ModelBackend
+from django.contrib.auth.hashers import check_password
+
+from . import hashers
+
+
+UserModel = get_user_model()
+
+
+class DeferredRehashModelBackend(ModelBackend):
+    """
+    Jak ModelBackend, ale skrót hasła wymagający aktualizacji (np. po
+    kalibracji Argon2) nie jest przeliczany w trakcie logowania, tylko
+    zlecany do wykonania po wysłaniu odpowiedzi.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Wyrównanie czasu odpowiedzi dla nieistniejącego użytkownika (jak w ModelBackend)
+            UserModel().set_password(password)
+            return
+        setter = partial(hashers.schedule_rehash, user)
+        if check_password(password, user.password, setter) and self.user_can_authenticate(user):
+            return user
+
+    # Wersja asynchroniczna wywołuje authenticate (ModelBackend.aauthenticate aktualizuje skrót od razu)
+    aauthenticate = BaseBackend.aauthenticate
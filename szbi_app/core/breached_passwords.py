@@ -0,0 +1,235 @@
+"""
+Offline korpus haseł z wycieków danych - skróty SHA-1 w formacie
+Have I Been Pwned (HIBP), sprawdzane bez wczytywania do pamięci.
+
+Komenda update_breached_passwords przetwarza pobrane dane HIBP (katalog
+plików zakresów XXXXX.txt z wierszami SUFFIKS:LICZBA albo jeden plik
+posortowany wg skrótu z wierszami SKRÓT:LICZBA) na katalog corpus-<data
+i czas budowy> w DIR:
+- SHARD_COUNT plików shardów (00.bin ... ff.bin) wg pierwszego bajtu
+  skrótu; każdy to posortowana tablica rekordów: pozostałe 19 bajtów
+  skrótu + liczba wystąpień (uint32 big-endian),
+- manifest.json z liczbą skrótów, źródłem i datą budowy.
+
+Sprawdzenie hasła przebiega jak zapytanie zakresowe HIBP (k-anonimowość):
+prefiks skrótu wybiera shard, a resztę skrótu wyszukuje się binarnie
+w pliku shardu mapowanym do pamięci (mmap) - strony współdzielone są przez
+procesy serwera, a pamięć procesu nie zależy od wielkości korpusu.
+
+Aktywny korpus wskazuje dowiązanie symboliczne DIR/current, podmieniane
+atomowo po zbudowaniu nowego korpusu. Procesy serwera sprawdzają cel
+dowiązania przy każdym sprawdzeniu hasła i przechodzą na nowy korpus bez
+restartu. Poprzedni korpus usuwany jest dopiero przy kolejnej aktualizacji
+(proces mógł właśnie odczytać stary cel dowiązania), a otwarte mapowania
+pozostają ważne także po usunięciu plików.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+
+CURRENT_LINK = 'current'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+CORPUS_PREFIX = 'corpus-'
+SHARD_COUNT = 256
+RECORD = struct.Struct('>19sI')
+MAX_COUNT = 2 ** 32 - 1
+
+_open_corpora = {}
+
+
+def get_config():
+    config = {
+        'DIR': Path(settings.BASE_DIR) / 'password_data' / 'breached',
+        'MIN_COUNT': 1,
+    }
+    config.update(getattr(settings, 'SZBI_BREACHED_PASSWORDS', {}))
+    config['DIR'] = Path(config['DIR'])
+    return config
+
+
+def password_digest(password):
+    return hashlib.sha1(password.encode('utf-8')).digest()
+
+
+def shard_name(first_byte):
+    return f'{first_byte:02x}.bin'
+
+
+# ============== BUDOWANIE ==============
+
+def _parse_line(line, prefix=''):
+    line = line.strip()
+    if not line:
+        return None
+    hash_hex, _, count = line.partition(':')
+    digest = bytes.fromhex(prefix + hash_hex)
+    if len(digest) != 20:
+        raise ValueError(f'Nieprawidłowy skrót SHA-1: {prefix}{hash_hex}')
+    return digest, min(int(count or 1), MAX_COUNT)
+
+
+def iter_source(source):
+    """
+    Pary (skrót, liczba wystąpień) ze źródła HIBP - katalogu plików zakresów
+    (nazwa pliku = 5 znaków prefiksu) lub pojedynczego pliku pełnych skrótów.
+    """
+    source = Path(source)
+    if source.is_dir():
+        for path in sorted(source.iterdir(), key=lambda p: p.name.upper()):
+            if path.name.startswith('.') or not path.is_file():
+                continue
+            prefix = path.name.split('.')[0]
+            with open(path, encoding='ascii') as f:
+                for line in f:
+                    record = _parse_line(line, prefix)
+                    if record:
+                        yield record
+    else:
+        with open(source, encoding='ascii') as f:
+            for line in f:
+                record = _parse_line(line)
+                if record:
+                    yield record
+
+
+def build_corpus(source, directory=None, min_count=1):
+    """
+    Buduje nowy korpus ze źródła (posortowanego wg skrótu, jak dane HIBP)
+    i aktywuje go. Zwraca manifest nowego korpusu.
+    """
+    directory = Path(directory or get_config()['DIR'])
+    directory.mkdir(parents=True, exist_ok=True)
+    name = CORPUS_PREFIX + timezone.now().strftime('%Y%m%d%H%M%S%f')
+    building = directory / f'.{name}'
+    building.mkdir()
+    try:
+        shards = _write_shards(iter_source(source), building, min_count)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'source': str(source),
+            'min_count': min_count,
+            'count': sum(shards.values()),
+            'shards': shards,
+        }
+        with open(building / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(building, directory / name)
+    except BaseException:
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+    activate(directory, name)
+    return manifest
+
+
+def _write_shards(records, directory, min_count):
+    shards = {}
+    previous = None
+    shard, shard_byte = None, None
+    try:
+        for digest, count in records:
+            if previous is not None and digest <= previous:
+                raise ValueError(f'Źródło nie jest posortowane wg skrótu (przy {digest.hex().upper()})')
+            previous = digest
+            if count < min_count:
+                continue
+            if digest[0] != shard_byte:
+                if shard:
+                    shard.close()
+                shard_byte = digest[0]
+                shard = open(directory / shard_name(shard_byte), 'wb', buffering=2 ** 20)
+                shards[shard_name(shard_byte)] = 0
+            shard.write(RECORD.pack(digest[1:], count))
+            shards[shard_name(shard_byte)] += 1
+    finally:
+        if shard:
+            shard.close()
+    return shards
+
+
+def activate(directory, name):
+    """
+    Atomowo przełącza dowiązanie current na korpus name. Zachowywany jest
+    tylko korpus dotychczas aktywny - starsze są usuwane.
+    """
+    directory = Path(directory)
+    current = directory / CURRENT_LINK
+    keep = {name}
+    if current.is_symlink():
+        keep.add(os.readlink(current))
+    link = directory / f'.{CURRENT_LINK}-{os.getpid()}'
+    if link.is_symlink():
+        link.unlink()
+    os.symlink(name, link)
+    os.replace(link, current)
+    for path in directory.iterdir():
+        if path.name.startswith(CORPUS_PREFIX) and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# ============== ODCZYT ==============
+
+class BreachedCorpus:
+    """Korpus otwarty z katalogu corpus-... - wszystkie niepuste shardy mapowane od razu"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_NAME, encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.shards = [None] * SHARD_COUNT
+        for first_byte in range(SHARD_COUNT):
+            name = shard_name(first_byte)
+            if self.manifest['shards'].get(name):
+                with open(self.path / name, 'rb') as f:
+                    self.shards[first_byte] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def count(self, password):
+        """Liczba wystąpień hasła w wyciekach (0 - brak w korpusie)"""
+        digest = password_digest(password)
+        data = self.shards[digest[0]]
+        if data is None:
+            return 0
+        key = digest[1:]
+        size = RECORD.size
+        key_size = size - 4
+        lo, hi = 0, len(data) // size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[mid * size:mid * size + key_size] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo * size < len(data):
+            suffix, count = RECORD.unpack_from(data, lo * size)
+            if suffix == key:
+                return count
+        return 0
+
+
+def open_corpus(directory=None):
+    """
+    Aktywny korpus (None, gdy nie został zbudowany). Cel dowiązania
+    current sprawdzany jest przy każdym wywołaniu - po aktualizacji korpusu
+    otwierany jest nowy.
+    """
+    directory = str(directory or get_config()['DIR'])
+    try:
+        target = os.readlink(os.path.join(directory, CURRENT_LINK))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    cached = _open_corpora.get(directory)
+    if cached is None or cached[0] != target:
+        cached = _open_corpora[directory] = (target, BreachedCorpus(os.path.join(directory, target)))
+    return cached[1]
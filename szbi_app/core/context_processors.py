@@ -0,0 +1,18 @@
+"""
+Procesory kontekstu szablonów modułu core.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .mixins import get_request_permissions
+
+
+def szbi_permissions(request):
+    """
+    Udostępnia w szablonach zmienną szbi_permissions (frozenset nazw uprawnień).
+    
+    Użycie:
+        {% if 'Przeglądanie rejestru aktywów' in szbi_permissions %}...{% endif %}
+    """
+    return {
+        'szbi_permissions': SimpleLazyObject(lambda: get_request_permissions(request)),
+    }
@@ -0,0 +1,124 @@
+"""
+Utrzymanie tabeli EmployeeEffectivePermission.
+
+Efektywne uprawnienia pracownika wyliczane są trzema zapytaniami (po jednym
+na ścieżkę nadawania: stanowiska, dział, bezpośrednie grupy) dla całej partii
+pracowników naraz, a następnie porównywane ze stanem tabeli - zapisywane są
+tylko różnice.
+"""
+from django.db import transaction
+
+from .models import (
+    Employee, EmployeePermissionGroup, EmployeeEffectivePermission,
+    PositionPermission, DepartmentPermission,
+)
+
+
+REBUILD_BATCH_SIZE = 500
+
+
+def compute_effective_rows(employee_ids=None):
+    """
+    Wylicza zbiór krotek (employee_id, permission_id, source).
+    Dla employee_ids=None wylicza uprawnienia wszystkich pracowników.
+    """
+    through = Employee.positions.through.objects.all()
+    employees = Employee.objects.all()
+    direct = EmployeePermissionGroup.objects.all()
+    if employee_ids is not None:
+        through = through.filter(employee_id__in=employee_ids)
+        employees = employees.filter(pk__in=employee_ids)
+        direct = direct.filter(employee_id__in=employee_ids)
+
+    perm_path = 'permission_group__permissions'
+    rows = set()
+    rows.update(
+        (employee_id, permission_id, 'position')
+        for employee_id, permission_id in through.filter(
+            **{f'position__permission_assignments__{perm_path}__isnull': False}
+        ).values_list('employee_id', f'position__permission_assignments__{perm_path}')
+    )
+    rows.update(
+        (employee_id, permission_id, 'department')
+        for employee_id, permission_id in employees.filter(
+            **{f'department__permission_assignments__{perm_path}__isnull': False}
+        ).values_list('pk', f'department__permission_assignments__{perm_path}')
+    )
+    rows.update(
+        (employee_id, permission_id, 'direct')
+        for employee_id, permission_id in direct.filter(
+            **{f'{perm_path}__isnull': False}
+        ).values_list('employee_id', perm_path)
+    )
+    return rows
+
+
+def sync_employees(employee_ids):
+    """Aktualizuje efektywne uprawnienia wskazanych pracowników (zapisuje tylko różnice)"""
+    employee_ids = set(employee_ids)
+    if not employee_ids:
+        return
+    with transaction.atomic():
+        desired = compute_effective_rows(employee_ids)
+        existing = {
+            (employee_id, permission_id, source): pk
+            for pk, employee_id, permission_id, source in EmployeeEffectivePermission.objects.filter(
+                employee_id__in=employee_ids
+            ).values_list('pk', 'employee_id', 'permission_id', 'source')
+        }
+        stale = [pk for row, pk in existing.items() if row not in desired]
+        if stale:
+            EmployeeEffectivePermission.objects.filter(pk__in=stale).delete()
+        missing = desired.difference(existing)
+        if missing:
+            EmployeeEffectivePermission.objects.bulk_create(
+                [
+                    EmployeeEffectivePermission(employee_id=e, permission_id=p, source=s)
+                    for e, p, s in missing
+                ],
+                ignore_conflicts=True,
+            )
+
+
+def rebuild_all(batch_size=REBUILD_BATCH_SIZE):
+    """Przebudowuje całą tabelę partiami pracowników; zwraca liczbę pracowników"""
+    employee_ids = list(Employee.objects.order_by('pk').values_list('pk', flat=True))
+    with transaction.atomic():
+        EmployeeEffectivePermission.objects.exclude(employee_id__in=Employee.objects.all()).delete()
+        for start in range(0, len(employee_ids), batch_size):
+            sync_employees(employee_ids[start:start + batch_size])
+    return len(employee_ids)
+
+
+# ============== WYZNACZANIE PRACOWNIKÓW DOTKNIĘTYCH ZMIANĄ ==============
+
+def employee_ids_for_positions(position_ids):
+    return set(
+        Employee.positions.through.objects.filter(
+            position_id__in=position_ids
+        ).values_list('employee_id', flat=True)
+    )
+
+
+def employee_ids_for_departments(department_ids):
+    return set(Employee.objects.filter(department_id__in=department_ids).values_list('pk', flat=True))
+
+
+def employee_ids_for_groups(group_ids):
+    """Pracownicy, do których grupy docierają dowolną ścieżką"""
+    group_ids = list(group_ids)
+    position_ids = PositionPermission.objects.filter(
+        permission_group_id__in=group_ids
+    ).values('position_id')
+    department_ids = DepartmentPermission.objects.filter(
+        permission_group_id__in=group_ids
+    ).values('department_id')
+    ids = employee_ids_for_positions(position_ids)
+    ids.update(employee_ids_for_departments(department_ids))
+    ids.update(
+        EmployeePermissionGroup.objects.filter(
+            permission_group_id__in=group_ids
+        ).values_list('employee_id', flat=True)
+    )
+    return ids
+
@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from .models import Organization, Department, Position, Permission, PermissionGroup, Employee, EmployeePermissionGroup
+from django.db import transaction
+from .models import Organization, Department, Position, Permission, PermissionGroup, Employee
+from .assignments import sync_permission_groups
+from .signals import deferred_permission_refresh
 
 
 class OrganizationForm(forms.ModelForm):
@@ -132,9 +135,10 @@ class EmployeeForm(forms.ModelForm):
             'positions': forms.CheckboxSelectMultiple(),
         }
 
-    def __init__(self, *args, organization=None, **kwargs):
+    def __init__(self, *args, organization=None, request=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.organization = organization
+        self.request = request
         
         # Ustaw queryset dla grup uprawnień
         self.fields['permission_groups'].queryset = PermissionGroup.objects.all()
@@ -190,13 +194,15 @@ class EmployeeForm(forms.ModelForm):
         employee.organization = self.organization
         
         if commit:
-            employee.save()
-            self.save_m2m()  # Zapisz relacje M2M (positions)
-            
-            # Zapisz grupy uprawnień
-            EmployeePermissionGroup.objects.filter(employee=employee).delete()
-            for group in self.cleaned_data.get('permission_groups', []):
-                EmployeePermissionGroup.objects.create(employee=employee, permission_group=group)
+            # Jedno odświeżenie uprawnień dla zapisu pracownika, stanowisk i grup
+            with transaction.atomic(), deferred_permission_refresh():
+                employee.save()
+                self.save_m2m()  # Zapisz relacje M2M (positions)
+                
+                # Zapisz grupy uprawnień (tylko różnice)
+                sync_permission_groups(
+                    employee, self.cleaned_data.get('permission_groups', []), request=self.request
+                )
         
         return employee
 
@@ -0,0 +1,170 @@
+"""
+Skróty haseł Argon2 z parametrami skalibrowanymi dla serwera oraz
+odkładana aktualizacja skrótów przy logowaniu.
+
+Komenda calibrate_argon2 mierzy czas Argon2 na serwerze i zapisuje do
+pliku PARAMS_FILE (settings.SZBI_PASSWORD_HASHING) parametry dające
+zadany czas sprawdzenia hasła. CalibratedArgon2PasswordHasher czyta je
+z pliku (ponownie po jego zmianie - bez restartu procesów); bez pliku
+używa wartości domyślnych Django.
+
+Skróty z innymi parametrami (lub innym algorytmem) aktualizowane są po
+udanym logowaniu (core/backends.py), ale nie w trakcie obsługi żądania:
+wyliczenie nowego skrótu trwa tyle co sprawdzenie hasła, więc odkładane jest
+do zakończenia żądania (request_finished - po wysłaniu odpowiedzi). Hasło
+czeka tylko w pamięci wątku obsługującego żądanie i jest usuwane po próbie
+aktualizacji; poza żądaniem skrót wyliczany jest od razu. Skrót zapisywany
+jest tylko wtedy, gdy użytkownik nie zmienił w tym czasie hasła. Razem ze
+skrótem aktualizowany jest skrót uwierzytelnienia w sesji utworzonej przy
+logowaniu (login() zapisał go na podstawie poprzedniego skrótu hasła) -
+inaczej kolejne żądanie wylogowałoby użytkownika.
+DEFERRED_REHASH=False - aktualizacja od razu (np. w testach).
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import Argon2PasswordHasher, make_password
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    config = {
+        'PARAMS_FILE': Path(settings.BASE_DIR) / 'password_data' / 'argon2.json',
+        'DEFERRED_REHASH': True,
+    }
+    config.update(getattr(settings, 'SZBI_PASSWORD_HASHING', {}))
+    return config
+
+
+# ============== PARAMETRY ==============
+
+_params_cache = {}
+
+
+def read_params(path=None):
+    """Parametry z pliku kalibracji (pusty słownik, gdy plik nie istnieje)"""
+    path = str(path or get_config()['PARAMS_FILE'])
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _params_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='utf-8') as f:
+            cached = _params_cache[path] = (mtime, json.load(f))
+    return cached[1]
+
+
+def write_params(params, path=None):
+    """Zapisuje parametry (podmiana pliku - procesy nie odczytają niepełnego pliku)"""
+    path = Path(path or get_config()['PARAMS_FILE'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(params, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2 z parametrami z pliku kalibracji (komenda calibrate_argon2).
+    Algorytm jak w Argon2PasswordHasher ('argon2') - weryfikuje istniejące
+    skróty, a skróty z innymi parametrami uznaje za wymagające aktualizacji.
+    """
+
+    @property
+    def time_cost(self):
+        return read_params().get('time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return read_params().get('memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return read_params().get('parallelism', Argon2PasswordHasher.parallelism)
+
+
+# ============== ODKŁADANA AKTUALIZACJA SKRÓTÓW ==============
+
+# Hasła do aktualizacji skrótu w bieżącym żądaniu (wątek obsługujący żądanie);
+# None poza obsługą żądania
+_local = threading.local()
+
+
+def schedule_rehash(user, password):
+    """
+    Zleca wyliczenie nowego skrótu hasła użytkownika po zakończeniu bieżącego
+    żądania. Poza obsługą żądania (np. komenda) skrót wyliczany jest od razu -
+    hasło nie jest przechowywane dłużej niż trwa żądanie.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None or not get_config()['DEFERRED_REHASH']:
+        rehash(type(user), user.pk, user.password, password)
+        return
+    pending[(type(user), user.pk)] = (user.password, password, None)
+
+
+def rehash(model, pk, old_encoded, password, session=None):
+    """
+    Zapisuje nowy skrót, jeśli hasło nie zmieniło się od logowania; zwraca True
+    po zapisie. Sesja użytkownika (session) otrzymuje skrót uwierzytelnienia
+    zgodny z nowym skrótem hasła w tej samej transakcji.
+    """
+    encoded = make_password(password)
+    with transaction.atomic():
+        if not model._default_manager.filter(pk=pk, password=old_encoded).update(password=encoded):
+            return False
+        user = model._default_manager.get(pk=pk)
+        if session is not None and session.get(SESSION_KEY) == model._meta.pk.value_to_string(user):
+            # update_session_auth_hash zmienia klucz sesji - po wysłaniu odpowiedzi
+            # klient nie poznałby nowego klucza
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+    return True
+
+
+def run_pending_rehashes():
+    """Aktualizuje skróty odłożone w bieżącym żądaniu i usuwa hasła z pamięci; zwraca liczbę zaktualizowanych"""
+    pending, _local.pending = getattr(_local, 'pending', None), None
+    updated = 0
+    while pending:
+        (model, pk), (old_encoded, password, session) = pending.popitem()
+        try:
+            updated += rehash(model, pk, old_encoded, password, session)
+        except Exception:
+            # Nieudana aktualizacja zostanie ponowiona przy kolejnym logowaniu
+            logger.exception('Nie udało się zaktualizować skrótu hasła użytkownika %s', pk)
+    return updated
+
+
+def _request_started(sender, **kwargs):
+    _local.pending = {}
+
+
+def _request_finished(sender, **kwargs):
+    run_pending_rehashes()
+
+
+def _user_logged_in(sender, request, user, **kwargs):
+    """Zapamiętuje sesję logowania użytkownika czekającego na aktualizację skrótu"""
+    pending = getattr(_local, 'pending', None)
+    key = (type(user), user.pk)
+    if pending and key in pending and hasattr(request, 'session'):
+        old_encoded, password, _ = pending[key]
+        pending[key] = (old_encoded, password, request.session)
+
+
+request_started.connect(_request_started, dispatch_uid='szbi_password_rehash_start')
+request_finished.connect(_request_finished, dispatch_uid='szbi_password_rehash')
+user_logged_in.connect(_user_logged_in, dispatch_uid='szbi_password_rehash_session')
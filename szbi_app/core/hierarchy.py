@@ -0,0 +1,174 @@
+"""
+Hierarchie drzewiaste zapisane jako ścieżka zmaterializowana.
+
+Każdy węzeł przechowuje ścieżkę identyfikatorów od korzenia, np. "/1/5/12/"
+(z indeksem), dzięki czemu przodków, potomków i filtry poddrzewa można
+wyznaczyć jednym zapytaniem:
+
+- przodkowie - identyfikatory odczytane ze ścieżki (pk__in),
+- potomkowie - hierarchy_path__startswith=<ścieżka węzła>,
+- poddrzewo w innym modelu - np. Asset.objects.filter(category.subtree_q('category')).
+
+Przy zmianie rodzica ścieżki całego poddrzewa aktualizowane są jednym UPDATE.
+
+Model korzystający z mixinu musi mieć pole `parent` (ForeignKey do 'self').
+"""
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
+
+
+PATH_SEPARATOR = '/'
+
+
+def build_path(parent_path, pk):
+    """Ścieżka węzła na podstawie ścieżki rodzica"""
+    return f'{parent_path or PATH_SEPARATOR}{pk}{PATH_SEPARATOR}'
+
+
+def path_to_ids(path):
+    """Zamienia ścieżkę na listę identyfikatorów (od korzenia)"""
+    return [int(part) for part in path.strip(PATH_SEPARATOR).split(PATH_SEPARATOR) if part]
+
+
+def populate_tree_paths(model):
+    """
+    Wylicza ścieżki wszystkich węzłów modelu (np. w migracji danych).
+    Działa także z modelami historycznymi - korzysta tylko z pól parent i hierarchy_*.
+    """
+    parents = dict(model.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def resolve(pk):
+        chain = []
+        current = pk
+        while current is not None and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents.get(current)
+        # current w chain oznacza cykl - przerywamy go, traktując węzeł jako korzeń
+        base = paths.get(current, '') if current not in chain else ''
+        for node in reversed(chain):
+            base = build_path(base, node)
+            paths[node] = base
+        return paths[pk]
+
+    nodes = list(model.objects.all())
+    for node in nodes:
+        node.hierarchy_path = resolve(node.pk)
+        node.hierarchy_depth = len(path_to_ids(node.hierarchy_path)) - 1
+    model.objects.bulk_update(nodes, ['hierarchy_path', 'hierarchy_depth'], batch_size=500)
+
+
+class MaterializedPathModel(models.Model):
+    """Abstrakcyjny model węzła drzewa ze ścieżką zmaterializowaną"""
+    hierarchy_path = models.CharField(
+        max_length=500,
+        db_index=True,
+        editable=False,
+        default='',
+        verbose_name="Ścieżka w hierarchii"
+    )
+    hierarchy_depth = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Poziom w hierarchii"
+    )
+
+    class Meta:
+        abstract = True
+
+    # ---------- zapis ----------
+
+    def _parent_path(self):
+        if self.parent_id is None:
+            return ''
+        return type(self)._default_manager.filter(
+            pk=self.parent_id
+        ).values_list('hierarchy_path', flat=True).first() or ''
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id is not None:
+            if self.parent_id == self.pk or self.pk in path_to_ids(self._parent_path()):
+                raise ValidationError({
+                    'parent': 'Element nadrzędny nie może być tym samym elementem ani jego elementem podrzędnym.'
+                })
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' not in update_fields and 'parent_id' not in update_fields:
+            return super().save(*args, **kwargs)
+
+        manager = type(self)._default_manager
+        with transaction.atomic():
+            old_path = None
+            if self.pk:
+                old_path = manager.filter(pk=self.pk).values_list('hierarchy_path', flat=True).first()
+            parent_path = self._parent_path()
+            if old_path and parent_path.startswith(old_path):
+                raise ValueError('Nie można przenieść węzła do jego własnego poddrzewa.')
+
+            # Ścieżka wyliczana przed zapisem - instancja mogła zostać wczytana
+            # przed przeniesieniem jej przodka i mieć nieaktualną ścieżkę
+            has_pk = self.pk is not None
+            if has_pk:
+                self._set_path(parent_path)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'hierarchy_path', 'hierarchy_depth'}
+            super().save(*args, **kwargs)
+
+            if not has_pk:
+                # Nowy węzeł - identyfikator znany dopiero po zapisie
+                self._set_path(parent_path)
+                manager.filter(pk=self.pk).update(
+                    hierarchy_path=self.hierarchy_path, hierarchy_depth=self.hierarchy_depth
+                )
+            new_path, new_depth = self.hierarchy_path, self.hierarchy_depth
+            if old_path and new_path != old_path:
+                # Przeniesienie poddrzewa - podmiana prefiksu ścieżek potomków
+                manager.filter(hierarchy_path__startswith=old_path).exclude(pk=self.pk).update(
+                    hierarchy_path=Concat(
+                        Value(new_path),
+                        Substr('hierarchy_path', len(old_path) + 1),
+                        output_field=models.CharField(),
+                    ),
+                    hierarchy_depth=F('hierarchy_depth') + (new_depth - len(path_to_ids(old_path)) + 1),
+                )
+
+    def _set_path(self, parent_path):
+        self.hierarchy_path = build_path(parent_path, self.pk)
+        self.hierarchy_depth = len(path_to_ids(self.hierarchy_path)) - 1
+
+    # ---------- zapytania ----------
+
+    def get_ancestor_ids(self, include_self=False):
+        ids = path_to_ids(self.hierarchy_path)
+        return ids if include_self else ids[:-1]
+
+    def get_ancestors(self, include_self=False):
+        """Przodkowie od korzenia - jedno zapytanie"""
+        return type(self)._default_manager.filter(
+            pk__in=self.get_ancestor_ids(include_self)
+        ).order_by('hierarchy_depth')
+
+    def get_descendants(self, include_self=False):
+        """Wszyscy potomkowie (dowolna głębokość) - jedno zapytanie"""
+        qs = type(self)._default_manager.filter(hierarchy_path__startswith=self.hierarchy_path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+
+    def subtree_q(self, lookup):
+        """
+        Warunek Q dla obiektów powiązanych z poddrzewem węzła.
+        Np. Asset.objects.filter(category.subtree_q('category'))
+        """
+        return Q(**{f'{lookup}__hierarchy_path__startswith': self.hierarchy_path})
+
+    def get_path_display(self, separator=' > '):
+        """Pełna ścieżka nazw od korzenia - jedno zapytanie zamiast jednego na przodka"""
+        names = dict(self.get_ancestors().values_list('pk', 'name'))
+        parts = [names[pk] for pk in self.get_ancestor_ids() if pk in names]
+        parts.append(self.name)
+        return separator.join(parts)
@@ -0,0 +1,384 @@
+"""
+Archiwum dziennika zdarzeń - miesięczne pliki JSONL kompresowane gzip.
+
+Wpisy starsze niż okres przechowywania (pełne miesiące) przenoszone są
+z tabeli ActivityLog do plików activity_log-RRRR-MM.jsonl.gz w katalogu
+archiwum, dzięki czemu tabela bieżąca i jej indeksy pozostają małe.
+Wiersze w pliku są uporządkowane od najnowszych (created_at, id), tak jak
+lista w widoku, co pozwala czytać archiwum strumieniowo i kontynuować
+stronicowanie kursorowe za ostatnim wierszem tabeli bieżącej.
+
+Plik manifest.json opisuje każdy miesiąc: liczbę wierszy, sumę kontrolną
+SHA-256 pliku oraz zakres created_at i id.
+"""
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ActivityLog
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+DELETE_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+ACTION_LABELS = dict(ActivityLog.ACTION_CHOICES)
+CATEGORY_LABELS = dict(ActivityLog.CATEGORY_CHOICES)
+
+
+def get_config():
+    config = {
+        'DIR': Path(settings.BASE_DIR) / 'archive' / 'activity_log',
+        'RETENTION_DAYS': 365,
+    }
+    config.update(getattr(settings, 'SZBI_ACTIVITY_LOG_ARCHIVE', {}))
+    config['DIR'] = Path(config['DIR'])
+    return config
+
+
+# ============== MANIFEST ==============
+
+def read_manifest(directory=None):
+    path = Path(directory or get_config()['DIR']) / MANIFEST_NAME
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': MANIFEST_VERSION, 'months': {}}
+
+
+def write_manifest(manifest, directory):
+    """Zapis atomowy - plik tymczasowy podmieniany przez os.replace"""
+    path = Path(directory) / MANIFEST_NAME
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    """Utrwala na dysku zmiany wpisów katalogu (np. podmianę pliku przez os.replace)"""
+    if os.name != 'posix':
+        return  # katalogów nie można otworzyć do fsync poza systemami POSIX
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def month_file_name(month):
+    return f'activity_log-{month}.jsonl.gz'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ============== ZAPIS ==============
+
+def serialize_log(log):
+    return {
+        'id': log.pk,
+        'created_at': log.created_at.isoformat(),
+        'user_id': log.user_id,
+        'username': log.user.username if log.user_id else None,
+        'action': log.action,
+        'category': log.category,
+        'object_type': log.object_type,
+        'object_id': log.object_id,
+        'object_repr': log.object_repr,
+        'description': log.description,
+        'details': log.details,
+        'ip_address': log.ip_address,
+        'user_agent': log.user_agent,
+        'prev_hash': log.prev_hash,
+        'entry_hash': log.entry_hash,
+    }
+
+
+def archive_cutoff(retention_days=None, now=None):
+    """Początek najstarszego miesiąca pozostającego w tabeli (w strefie TIME_ZONE)"""
+    if retention_days is None:
+        retention_days = get_config()['RETENTION_DAYS']
+    local = timezone.localtime(now or timezone.now()) - timedelta(days=retention_days)
+    return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_bounds(month_start):
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    return month_start, timezone.make_aware(
+        datetime(next_month.year, next_month.month, 1), month_start.tzinfo
+    )
+
+
+def months_to_archive(cutoff):
+    """Miesiące (początki, strefa lokalna) z wpisami starszymi niż cutoff"""
+    oldest = ActivityLog.objects.filter(created_at__lt=cutoff).order_by('created_at').values_list(
+        'created_at', flat=True
+    ).first()
+    if oldest is None:
+        return []
+    tz = cutoff.tzinfo
+    month = timezone.localtime(oldest, tz).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    months = []
+    while month < cutoff:
+        months.append(month)
+        month = month_bounds(month)[1]
+    return months
+
+
+def archive_month(month_start, directory=None, delete=True):
+    """
+    Przenosi wpisy z miesiąca do pliku archiwum; zwraca liczbę przeniesionych wierszy.
+    Gdy plik miesiąca istnieje (np. po przerwanym przebiegu), wiersze są scalane
+    bez duplikatów. Wiersze z tabeli usuwane są dopiero po utrwaleniu na dysku
+    (fsync) pliku i manifestu.
+    """
+    directory = Path(directory or get_config()['DIR'])
+    directory.mkdir(parents=True, exist_ok=True)
+    start, end = month_bounds(month_start)
+    month = start.strftime('%Y-%m')
+    logs = ActivityLog.objects.filter(created_at__gte=start, created_at__lt=end)
+    ids = list(logs.values_list('pk', flat=True))
+    if not ids:
+        return 0
+
+    # Scalanie strumieni (plik i tabela, oba od najnowszych) - bez wczytywania miesiąca do pamięci
+    table_rows = (
+        serialize_log(log)
+        for log in logs.select_related('user').order_by('-created_at', '-pk').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    merged = heapq.merge(table_rows, iter_month_rows(month, directory), key=_key, reverse=True)
+
+    path = directory / month_file_name(month)
+    tmp_path = path.with_suffix('.tmp')
+    count, newest, oldest, previous_id, min_id, max_id = 0, None, None, None, None, None
+    with open(tmp_path, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+        for row in merged:
+            if row['id'] == previous_id:
+                continue  # wiersz już zapisany w archiwum przy przerwanym przebiegu
+            previous_id = row['id']
+            f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+            count += 1
+            newest = newest or row['created_at']
+            oldest = row['created_at']
+            min_id = row['id'] if min_id is None else min(min_id, row['id'])
+            max_id = row['id'] if max_id is None else max(max_id, row['id'])
+        f.close()  # zamyka strumień gzip (zapis stopki), plik raw pozostaje otwarty
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(directory)
+
+    manifest = read_manifest(directory)
+    manifest['months'][month] = {
+        'file': path.name,
+        'rows': count,
+        'sha256': file_sha256(path),
+        'min_created_at': oldest,
+        'max_created_at': newest,
+        'min_id': min_id,
+        'max_id': max_id,
+        'archived_at': timezone.now().isoformat(),
+    }
+    write_manifest(manifest, directory)
+
+    if delete:
+        with transaction.atomic():
+            for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                ActivityLog.objects.filter(pk__in=ids[i:i + DELETE_BATCH_SIZE]).delete()
+    return len(ids)
+
+
+def verify_archive(directory=None):
+    """Sprawdza sumy kontrolne i liczby wierszy; zwraca listę opisów błędów"""
+    directory = Path(directory or get_config()['DIR'])
+    errors = []
+    for month, info in sorted(read_manifest(directory)['months'].items()):
+        path = directory / info['file']
+        if not path.exists():
+            errors.append(f'{month}: brak pliku {info["file"]}')
+            continue
+        if file_sha256(path) != info['sha256']:
+            errors.append(f'{month}: niezgodna suma kontrolna')
+            continue
+        rows = sum(1 for _ in iter_month_rows(month, directory))
+        if rows != info['rows']:
+            errors.append(f'{month}: {rows} wierszy zamiast {info["rows"]}')
+    return errors
+
+
+# ============== ODCZYT ==============
+
+def iter_month_rows(month, directory=None):
+    """Wiersze miesiąca (od najnowszych) - odczyt strumieniowy"""
+    path = Path(directory or get_config()['DIR']) / month_file_name(month)
+    if not path.exists():
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _ArchivedUser:
+    def __init__(self, pk, username):
+        self.pk = self.id = pk
+        self.username = username
+
+    def __str__(self):
+        return self.username
+
+
+class ArchivedLogEntry:
+    """Wpis z archiwum - interfejs zgodny z ActivityLog używany w szablonach i eksporcie"""
+    is_archived = True
+
+    def __init__(self, row):
+        self.row = row
+        self.pk = self.id = row['id']
+        self.created_at = datetime.fromisoformat(row['created_at'])
+        self.user_id = row['user_id']
+        self.user = _ArchivedUser(row['user_id'], row['username']) if row['user_id'] else None
+        for field in ('action', 'category', 'object_type', 'object_id', 'object_repr',
+                      'description', 'details', 'ip_address', 'user_agent'):
+            setattr(self, field, row[field])
+
+    def get_action_display(self):
+        return ACTION_LABELS.get(self.action, self.action)
+
+    def get_category_display(self):
+        return CATEGORY_LABELS.get(self.category, self.category)
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text.replace('ł', 'l').replace('Ł', 'L'))
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def _search_tokens(row):
+    parts = [row['object_repr'], row['description'], row['username'] or '']
+    if row['details']:
+        parts.append(json.dumps(row['details'], ensure_ascii=False))
+    return re.findall(r'\w+', _normalize(' '.join(parts)))
+
+
+class ArchiveFilter:
+    """Filtry widoku dziennika zastosowane do wierszy archiwum"""
+
+    def __init__(self, filters, date_from=None, date_to=None):
+        self.filters = filters
+        self.date_from = date_from
+        self.date_to = date_to
+        self.words = re.findall(r'\w+', _normalize(filters['search'])) if filters.get('search') else []
+
+    def skip_month(self, info):
+        """Miesiąc całkowicie poza zakresem dat"""
+        if self.date_from and datetime.fromisoformat(info['max_created_at']) < self.date_from:
+            return True
+        if self.date_to and datetime.fromisoformat(info['min_created_at']) >= self.date_to:
+            return True
+        return False
+
+    def matches(self, row):
+        filters = self.filters
+        if filters.get('category') and row['category'] != filters['category']:
+            return False
+        if filters.get('action') and row['action'] != filters['action']:
+            return False
+        if filters.get('user') and str(row['user_id']) != str(filters['user']):
+            return False
+        if self.date_from or self.date_to:
+            created_at = datetime.fromisoformat(row['created_at'])
+            if self.date_from and created_at < self.date_from:
+                return False
+            if self.date_to and created_at >= self.date_to:
+                return False
+        if self.words:
+            tokens = _search_tokens(row)
+            if not all(any(token.startswith(word) for token in tokens) for word in self.words):
+                return False
+        return True
+
+
+def _sorted_months(manifest, reverse):
+    return sorted(manifest['months'].items(), reverse=reverse)
+
+
+def _key(entry_or_row):
+    if isinstance(entry_or_row, dict):
+        return datetime.fromisoformat(entry_or_row['created_at']), entry_or_row['id']
+    return entry_or_row.created_at, entry_or_row.pk
+
+
+def iter_archive(archive_filter, before=None, directory=None):
+    """
+    Wpisy archiwum spełniające filtry, od najnowszych; before=(created_at, id)
+    ogranicza wynik do wpisów starszych niż podana pozycja.
+    """
+    directory = directory or get_config()['DIR']
+    for month, info in _sorted_months(read_manifest(directory), reverse=True):
+        if archive_filter.skip_month(info):
+            continue
+        if before is not None and datetime.fromisoformat(info['min_created_at']) > before[0]:
+            continue
+        for row in iter_month_rows(month, directory):
+            if before is not None and _key(row) >= before:
+                continue
+            if archive_filter.matches(row):
+                yield ArchivedLogEntry(row)
+
+
+def archive_entries_after(archive_filter, after, limit, directory=None):
+    """
+    Najstarsze `limit` wpisów archiwum nowszych niż pozycja after (rosnąco) -
+    w pamięci przechowywane jest co najwyżej `limit` wierszy.
+    """
+    directory = directory or get_config()['DIR']
+    result = []
+    for month, info in _sorted_months(read_manifest(directory), reverse=False):
+        if datetime.fromisoformat(info['max_created_at']) < after[0] or archive_filter.skip_month(info):
+            continue
+        window = deque(maxlen=limit - len(result))
+        for row in iter_month_rows(month, directory):
+            if _key(row) <= after:
+                break  # wiersze uporządkowane malejąco - pozostałe są starsze
+            if archive_filter.matches(row):
+                window.append(row)
+        result.extend(ArchivedLogEntry(row) for row in reversed(window))
+        if len(result) >= limit:
+            break
+    return result
+
+
+def archive_newest_at(directory=None):
+    """Najnowszy created_at w archiwum (None gdy archiwum puste)"""
+    months = read_manifest(directory)['months']
+    if not months:
+        return None
+    return max(datetime.fromisoformat(info['max_created_at']) for info in months.values())
+
+
+def archived_row_count(directory=None):
+    return sum(info['rows'] for info in read_manifest(directory)['months'].values())
@@ -0,0 +1,294 @@
+"""
+Łańcuch skrótów dziennika zdarzeń - wykrywanie modyfikacji i usunięć wpisów.
+
+Każdy wpis ActivityLog ma entry_hash = SHA-256(prev_hash + treść wpisu),
+gdzie prev_hash to entry_hash poprzedniego wpisu (wg id). Koniec łańcucha
+(ActivityLogChainHead) aktualizowany jest w transakcji zapisu wpisów
+(core/log_writer.py) - przed odczytem jest blokowany instrukcją UPDATE, co
+szereguje zapisujące procesy także na SQLite.
+
+Co CHECKPOINT_INTERVAL wpisów powstaje punkt kontrolny podpisany HMAC
+(klucz KEY, domyślnie SECRET_KEY). Weryfikacja (komenda verify_activity_log)
+sprawdza tylko odcinki od ostatniego zweryfikowanego punktu kontrolnego -
+data weryfikacji jest objęta podpisem, więc jej ustawienie bezpośrednio
+w bazie nie pozwala pominąć zmienionych wpisów.
+Ciągłość łańcucha sprawdzana jest lokalnie (wpis - poprzedni wpis), więc
+odcinki (między punktami kontrolnymi i części dłuższych odcinków) są
+niezależne i mogą być sprawdzane równolegle.
+
+Wpisy przeniesione do archiwum (core/log_archive.py) zachowują skróty
+w plikach archiwum - weryfikacja tabeli zaczyna się wtedy od pierwszego
+wpisu pozostającego w tabeli.
+"""
+import hashlib
+import hmac
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timezone as dt_timezone
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import log_archive
+from .models import ActivityLog, ActivityLogChainHead, ActivityLogCheckpoint
+
+
+GENESIS_HASH = '0' * 64
+
+# Pola wpisu objęte skrótem (kolejność ma znaczenie)
+CHAIN_FIELDS = (
+    'created_at', 'user_id', 'action', 'category', 'object_type', 'object_id',
+    'object_repr', 'description', 'details', 'ip_address', 'user_agent',
+)
+
+DEFAULTS = {
+    'CHECKPOINT_INTERVAL': 10000,
+    'VERIFY_SEGMENT_SIZE': 50000,
+    'KEY': None,
+}
+
+
+def get_config():
+    """Konfiguracja z settings.SZBI_ACTIVITY_LOG_CHAIN uzupełniona wartościami domyślnymi"""
+    return {**DEFAULTS, **getattr(settings, 'SZBI_ACTIVITY_LOG_CHAIN', {})}
+
+
+# ============== SKRÓTY I PODPISY ==============
+
+def _normalize(name, value):
+    if value is None:
+        return None
+    if name == 'created_at':
+        return value.astimezone(dt_timezone.utc).isoformat()
+    if name == 'details':
+        return value
+    return str(value)
+
+
+def compute_hash(prev_hash, values):
+    """Skrót wpisu - values to wartości pól CHAIN_FIELDS (w tej kolejności)"""
+    payload = [prev_hash] + [_normalize(name, value) for name, value in zip(CHAIN_FIELDS, values)]
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def entry_values(entry):
+    """
+    Wartości pól CHAIN_FIELDS niezapisanego wpisu w postaci zapisywanej
+    w bazie (get_prep_value) - np. adres IPv6 2001:0DB8::0001 zapisywany jest
+    jako 2001:db8::1, a weryfikacja liczy skrót z wartości odczytanych z bazy.
+    """
+    return tuple(
+        getattr(entry, name) if name in ('created_at', 'details')
+        else ActivityLog._meta.get_field(name).get_prep_value(getattr(entry, name))
+        for name in CHAIN_FIELDS
+    )
+
+
+def sign_checkpoint(last_id, entry_hash, rows, verified_at=None):
+    """Podpis punktu kontrolnego (z datą weryfikacji dla punktów zweryfikowanych)"""
+    key = (get_config()['KEY'] or settings.SECRET_KEY).encode()
+    message = f'{last_id}:{entry_hash}:{rows}'
+    if verified_at is not None:
+        message += f':{verified_at.astimezone(dt_timezone.utc).isoformat()}'
+    return hmac.new(key, message.encode(), hashlib.sha256).hexdigest()
+
+
+def checkpoint_signature_valid(checkpoint):
+    expected = sign_checkpoint(checkpoint.last_id, checkpoint.entry_hash, checkpoint.rows, checkpoint.verified_at)
+    return hmac.compare_digest(expected, checkpoint.signature)
+
+
+# ============== ZAPIS ==============
+
+def lock_head():
+    """Blokuje i zwraca koniec łańcucha (wywoływane w transakcji zapisu)"""
+    # UPDATE przed odczytem - select_for_update nie blokuje na SQLite
+    if not ActivityLogChainHead.objects.filter(pk=1).update(last_id=F('last_id')):
+        ActivityLogChainHead.objects.create(pk=1, last_hash=GENESIS_HASH)
+    return ActivityLogChainHead.objects.get(pk=1)
+
+
+def chain_entries(entries):
+    """Wylicza skróty niezapisanych wpisów; zwraca zablokowany koniec łańcucha"""
+    head = lock_head()
+    prev_hash = head.last_hash
+    for entry in entries:
+        entry.prev_hash = prev_hash
+        entry.entry_hash = prev_hash = compute_hash(prev_hash, entry_values(entry))
+    return head
+
+
+def advance_head(head, entries):
+    """Przesuwa koniec łańcucha po zapisie wpisów; tworzy punkt kontrolny co CHECKPOINT_INTERVAL wpisów"""
+    last = entries[-1]
+    head.last_id = last.pk
+    head.last_hash = last.entry_hash
+    head.rows_since_checkpoint += len(entries)
+    if head.rows_since_checkpoint >= get_config()['CHECKPOINT_INTERVAL']:
+        create_checkpoint(head.last_id, head.last_hash, head.rows_since_checkpoint)
+        head.rows_since_checkpoint = 0
+    head.save()
+
+
+def create_checkpoint(last_id, entry_hash, rows, verified=False):
+    verified_at = timezone.now() if verified else None
+    checkpoint, _ = ActivityLogCheckpoint.objects.get_or_create(last_id=last_id, defaults={
+        'entry_hash': entry_hash,
+        'rows': rows,
+        'signature': sign_checkpoint(last_id, entry_hash, rows, verified_at),
+        'verified_at': verified_at,
+    })
+    return checkpoint
+
+
+# ============== WERYFIKACJA ==============
+
+class Segment(NamedTuple):
+    """Odcinek łańcucha: wpisy o id z (start_id, end_id]"""
+    start_id: int
+    start_hash: Optional[str]  # None - brak wcześniejszych wpisów w tabeli (archiwum), bez sprawdzenia
+    end_id: int
+    end_hash: Optional[str]  # None - część dłuższego odcinka, bez sprawdzenia końca
+    checkpoint_id: Optional[int]  # punkt kontrolny kończący odcinek
+
+
+class SegmentResult(NamedTuple):
+    segment: Segment
+    rows: int
+    errors: list
+
+
+def verify_segment(segment, chunk_size=5000):
+    """Sprawdza ciągłość i skróty wpisów odcinka"""
+    errors = []
+    prev_hash = segment.start_hash
+    rows = 0
+    entries = ActivityLog.objects.filter(
+        pk__gt=segment.start_id, pk__lte=segment.end_id
+    ).order_by('pk').values_list('pk', 'prev_hash', 'entry_hash', *CHAIN_FIELDS)
+    for pk, stored_prev, stored_hash, *values in entries.iterator(chunk_size=chunk_size):
+        rows += 1
+        if prev_hash is not None and stored_prev != prev_hash:
+            errors.append(f'Wpis #{pk}: przerwany łańcuch (usunięty lub wstawiony wpis przed nim)')
+        if compute_hash(stored_prev, values) != stored_hash:
+            errors.append(f'Wpis #{pk}: treść niezgodna ze skrótem')
+        prev_hash = stored_hash
+    if segment.end_hash is not None:
+        if rows and prev_hash != segment.end_hash:
+            errors.append(f'Odcinek do #{segment.end_id}: ostatni skrót niezgodny z punktem kontrolnym')
+        elif not rows and segment.start_hash is not None:
+            errors.append(f'Odcinek #{segment.start_id}-#{segment.end_id}: brak wpisów')
+    return SegmentResult(segment, rows, errors)
+
+
+def _archived_max_id():
+    months = log_archive.read_manifest()['months'].values()
+    return max((info['max_id'] for info in months), default=0)
+
+
+def _stored_hash_at(pk):
+    """Zapisany skrót ostatniego wpisu o id <= pk (None gdy brak wpisów)"""
+    return ActivityLog.objects.filter(pk__lte=pk).order_by('-pk').values_list('entry_hash', flat=True).first()
+
+
+def _split(segment, size):
+    """
+    Dzieli odcinek na części po size identyfikatorów - część zaczyna się od
+    zapisanego skrótu wpisu poprzedzającego, który sprawdza poprzednia część,
+    więc części można weryfikować niezależnie.
+    """
+    pieces = []
+    start_id, start_hash = segment.start_id, segment.start_hash
+    while segment.end_id - start_id > size:
+        pieces.append(Segment(start_id, start_hash, start_id + size, None, None))
+        start_id += size
+        start_hash = _stored_hash_at(start_id)
+    pieces.append(segment._replace(start_id=start_id, start_hash=start_hash))
+    return pieces
+
+
+def plan_segments(full=False):
+    """
+    Odcinki do sprawdzenia - od ostatniego zweryfikowanego punktu kontrolnego
+    (lub od początku łańcucha dla full) do końca łańcucha. Zwraca (odcinki,
+    początek odcinka za ostatnim punktem kontrolnym lub None).
+    """
+    head = ActivityLogChainHead.objects.filter(pk=1).first()
+    if head is None:
+        return [], None
+    checkpoints = ActivityLogCheckpoint.objects.filter(last_id__lte=head.last_id).order_by('last_id')
+    start_id, start_hash = 0, GENESIS_HASH
+    if not full:
+        # Start od ostatniego zweryfikowanego punktu z prawidłowym podpisem -
+        # późniejsze punkty z nieprawidłowym podpisem trafią do sprawdzenia
+        for verified in checkpoints.filter(verified_at__isnull=False).reverse():
+            if checkpoint_signature_valid(verified):
+                start_id, start_hash = verified.last_id, verified.entry_hash
+                checkpoints = checkpoints.filter(last_id__gt=start_id)
+                break
+    archived_max_id = _archived_max_id()
+    size = get_config()['VERIFY_SEGMENT_SIZE']
+
+    segments = []
+    tail_start = None
+    for checkpoint in list(checkpoints) + [None]:
+        end_id = checkpoint.last_id if checkpoint else head.last_id
+        end_hash = checkpoint.entry_hash if checkpoint else head.last_hash
+        if end_id > start_id:
+            # Wpisy na początku odcinka przeniesione do archiwum
+            first_hash = start_hash if start_id >= archived_max_id else None
+            segments.extend(_split(
+                Segment(start_id, first_hash, end_id, end_hash, checkpoint.pk if checkpoint else None), size
+            ))
+            if checkpoint is None:
+                tail_start = start_id
+        start_id, start_hash = end_id, end_hash
+    return segments, tail_start
+
+
+def _verify_in_worker(segment):
+    return verify_segment(segment)
+
+
+def verify_segments(segments, workers=1):
+    """Sprawdza odcinki - przy workers > 1 równolegle w osobnych procesach"""
+    if workers > 1 and len(segments) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        connections.close_all()  # procesy potomne otwierają własne połączenia
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            return list(pool.map(_verify_in_worker, segments))
+    return [verify_segment(segment) for segment in segments]
+
+
+def verify_chain(full=False, workers=1):
+    """
+    Weryfikuje łańcuch; zwraca (liczba sprawdzonych wpisów, lista błędów).
+    Po pomyślnej weryfikacji punkty kontrolne oznaczane są jako zweryfikowane,
+    a na końcu łańcucha tworzony jest nowy punkt - kolejna weryfikacja
+    sprawdzi tylko nowe wpisy.
+    """
+    segments, tail_start = plan_segments(full)
+    results = verify_segments(segments, workers)
+    errors = [error for result in results for error in result.errors]
+    checkpoints = ActivityLogCheckpoint.objects.in_bulk(
+        [segment.checkpoint_id for segment in segments if segment.checkpoint_id]
+    )
+    for checkpoint in checkpoints.values():
+        if not checkpoint_signature_valid(checkpoint):
+            errors.append(f'Punkt kontrolny #{checkpoint.last_id}: nieprawidłowy podpis')
+    rows = sum(result.rows for result in results)
+    if not errors:
+        now = timezone.now()
+        for checkpoint in checkpoints.values():
+            checkpoint.verified_at = now
+            checkpoint.signature = sign_checkpoint(checkpoint.last_id, checkpoint.entry_hash, checkpoint.rows, now)
+        ActivityLogCheckpoint.objects.bulk_update(checkpoints.values(), ['verified_at', 'signature'])
+        if tail_start is not None:
+            tail = segments[-1]
+            tail_rows = sum(result.rows for result in results if result.segment.start_id >= tail_start)
+            create_checkpoint(tail.end_id, tail.end_hash, tail_rows, verified=True)
+    return rows, errors
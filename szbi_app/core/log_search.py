@@ -0,0 +1,181 @@
+"""
+Wyszukiwanie tekstowe w dzienniku zdarzeń.
+
+Backend wybierany jest ustawieniem SZBI_ACTIVITY_LOG_SEARCH_BACKEND (ścieżka
+do klasy); domyślnie na SQLite z FTS5 używany jest indeks pełnotekstowy,
+a w pozostałych przypadkach wyszukiwanie icontains.
+
+Indeks FTS5 (tabela core_activitylog_fts) obejmuje object_repr, description
+i wartości tekstowe z details, jest zewnętrzną treścią tabeli dziennika
+i aktualizują go wyzwalacze. Tokenizer unicode61 z remove_diacritics usuwa
+polskie znaki diakrytyczne ("usunieto" znajduje "Usunięto"); litera "ł" nie
+jest w Unicode znakiem z diakrytykiem, dlatego zamieniana jest na "l" przy
+indeksowaniu i w zapytaniu.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+FTS_TABLE = 'core_activitylog_fts'
+LOG_TABLE = 'core_activitylog'
+
+# Wagi kolumn w rankingu bm25: object_repr, description, details
+BM25_WEIGHTS = (5.0, 1.0, 0.5)
+
+
+def _fold_sql(expression):
+    return f"replace(replace({expression}, 'ł', 'l'), 'Ł', 'L')"
+
+
+def _indexed_values_sql(row):
+    """Wartości indeksowane dla wiersza (new/old) w wyzwalaczu"""
+    details = f"(SELECT group_concat(value, ' ') FROM json_tree({row}.details) WHERE type = 'text')"
+    return (
+        f'{row}.id, {_fold_sql(f"{row}.object_repr")}, '
+        f'{_fold_sql(f"{row}.description")}, {_fold_sql(details)}'
+    )
+
+
+# Przebudowa tabeli dziennika przez migrację na SQLite (np. AddField) usuwa
+# wyzwalacze - migracja musi je odtworzyć (FTS_DROP_TRIGGERS_SQL + FTS_TRIGGERS_SQL)
+FTS_TRIGGERS_SQL = [
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        VALUES ({_indexed_values_sql('new')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, object_repr, description, details)
+        VALUES ('delete', {_indexed_values_sql('old')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF object_repr, description, details ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, object_repr, description, details)
+        VALUES ('delete', {_indexed_values_sql('old')});
+        INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        VALUES ({_indexed_values_sql('new')});
+    END""",
+]
+
+FTS_CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        object_repr, description, details,
+        content='{LOG_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    *FTS_TRIGGERS_SQL,
+    # Zasilenie indeksu istniejącymi wpisami
+    f"""INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        SELECT {_indexed_values_sql(LOG_TABLE)} FROM {LOG_TABLE}""",
+]
+
+FTS_DROP_TRIGGERS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+]
+
+FTS_DROP_SQL = [
+    *FTS_DROP_TRIGGERS_SQL,
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def fold_text(text):
+    return text.replace('ł', 'l').replace('Ł', 'L')
+
+
+def build_match_query(text):
+    """
+    Zamienia tekst użytkownika na zapytanie FTS5 - każde słowo jako fraza
+    z dopasowaniem prefiksu (wszystkie słowa muszą wystąpić).
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', fold_text(text)))
+
+
+class IContainsSearchBackend:
+    """Wyszukiwanie LIKE - działa na każdej bazie, ale wymaga pełnego skanu"""
+
+    def filter(self, queryset, text):
+        return queryset.filter(
+            Q(object_repr__icontains=text) |
+            Q(description__icontains=text) |
+            Q(user__username__icontains=text)
+        )
+
+    def ranked(self, queryset, text, limit):
+        """Lista najtrafniejszych wyników (tu: najnowszych)"""
+        return list(self.filter(queryset, text).order_by('-created_at', '-pk')[:limit])
+
+
+class SQLiteFTSSearchBackend(IContainsSearchBackend):
+    """Wyszukiwanie w indeksie FTS5 z rankingiem bm25"""
+
+    def _matching_user_ids(self, text):
+        return User.objects.filter(username__icontains=text).values('pk')
+
+    def filter(self, queryset, text):
+        match = build_match_query(text)
+        if not match:
+            return super().filter(queryset, text)
+        return queryset.filter(
+            Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])) |
+            Q(user_id__in=self._matching_user_ids(text))
+        )
+
+    def ranked(self, queryset, text, limit):
+        """
+        Wyniki wg rankingu bm25 - ranking liczony w zapytaniu do indeksu FTS
+        zawężonym do wierszy spełniających pozostałe filtry; trafienia tylko
+        po nazwie użytkownika uzupełniają listę na końcu.
+        """
+        match = build_match_query(text)
+        if not match:
+            return super().ranked(queryset, text, limit)
+        candidates_sql, candidates_params = queryset.order_by().values('pk').query.sql_with_params()
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({candidates_sql}) '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+                [match, *candidates_params, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        by_id = queryset.in_bulk(ids)
+        results = [by_id[pk] for pk in ids if pk in by_id]
+        if len(results) < limit:
+            results.extend(
+                queryset.filter(user_id__in=self._matching_user_ids(text)).exclude(
+                    pk__in=ids
+                ).order_by('-created_at', '-pk')[:limit - len(results)]
+            )
+        return results
+
+
+def fts_available():
+    return connection.vendor == 'sqlite' and _fts_table_exists(connection.settings_dict['NAME'])
+
+
+@lru_cache(maxsize=None)
+def _fts_table_exists(database_name):
+    # Sprawdzane raz na bazę (tabela powstaje w migracji)
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_search_backend():
+    path = getattr(settings, 'SZBI_ACTIVITY_LOG_SEARCH_BACKEND', None)
+    if path:
+        return _load_backend(path)
+    if fts_available():
+        return _load_backend('core.log_search.SQLiteFTSSearchBackend')
+    return _load_backend('core.log_search.IContainsSearchBackend')
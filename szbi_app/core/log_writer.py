@@ -0,0 +1,201 @@
+"""
+Buforowany zapis dzienników zdarzeń (ActivityLog, DocumentLog, AssetLog,
+SoALog, IncidentLog).
+
+Wpisy trafiają do bufora w pamięci procesu dopiero po zatwierdzeniu
+transakcji, w której powstały (wycofanie transakcji je odrzuca), i są
+zapisywane zbiorczo (bulk_create, jedna transakcja zapisu na paczkę):
+- po przekroczeniu liczby wpisów (MAX_SIZE) lub wieku najstarszego wpisu (MAX_AGE),
+- po zakończeniu obsługi żądania (FLUSH_ON_REQUEST, domyślnie wyłączone -
+  wtedy tylko gdy minął MAX_AGE),
+- przy zamykaniu procesu (atexit).
+
+Wpisy w buforze mogą zostać utracone:
+- przy awarii lub zabiciu procesu (SIGKILL) - cała zawartość bufora,
+- przy wyjątku innym niż DatabaseError w write_entries (np. w wątku timera)
+  - cała zapisywana paczka (błąd jest logowany),
+- pojedyncze wpisy, których nie udało się zapisać także pojedynczo - błąd
+  jest tylko logowany.
+
+W trybie BUFFERED=False (np. w testach) wpisy zapisywane są od razu.
+Wpisy ActivityLog dołączane są do łańcucha skrótów (core/log_chain.py),
+a razem z wpisami zapisywane są zdarzenia wspólnej osi czasu
+(core/timeline.py) i aktualizowane dzienne agregaty (core/activity_stats.py).
+Czas zdarzenia ustalany jest w chwili utworzenia wpisu, a nie zapisu.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BUFFERED': True,
+    'MAX_SIZE': 100,
+    'MAX_AGE': 1.0,
+    'FLUSH_ON_REQUEST': False,
+}
+
+
+def get_config():
+    """Konfiguracja z settings.SZBI_ACTIVITY_LOG uzupełniona wartościami domyślnymi"""
+    return {**DEFAULTS, **getattr(settings, 'SZBI_ACTIVITY_LOG', {})}
+
+
+class LogBuffer:
+    """Bufor wpisów dziennika wspólny dla wątków procesu"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._first_at = None
+        self._timer = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, instance):
+        config = get_config()
+        with self._lock:
+            self._entries.append(instance)
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+                self._start_timer(config['MAX_AGE'])
+            size = len(self._entries)
+        if size >= config['MAX_SIZE']:
+            self.flush()
+
+    def is_due(self):
+        first_at = self._first_at
+        return first_at is not None and time.monotonic() - first_at >= get_config()['MAX_AGE']
+
+    def flush(self):
+        """Zapisuje zawartość bufora; zwraca liczbę zapisanych wpisów"""
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._first_at = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not entries:
+            return 0
+        return write_entries(entries)
+
+    def _start_timer(self, delay):
+        # Zapis wpisów, które czekałyby na kolejne żądanie
+        self._timer = threading.Timer(delay, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            # Wyjątek w wątku timera nie trafiłby do logów aplikacji - paczka jest tracona
+            logger.exception('Nie udało się zapisać bufora dziennika')
+        finally:
+            connection.close()  # połączenie wątku timera
+
+
+def write_entries(entries):
+    """
+    Zapisuje wpisy - jedno bulk_create na model w jednej transakcji,
+    razem ze zdarzeniami osi czasu i agregatami dziennymi
+    """
+    by_model = {}
+    for entry in entries:
+        by_model.setdefault(type(entry), []).append(entry)
+    try:
+        with transaction.atomic():
+            for model, objs in by_model.items():
+                _insert(model, objs)
+            _record_derived(entries)
+        return len(entries)
+    except DatabaseError:
+        # Np. obiekt, którego dotyczy wpis, został w międzyczasie usunięty -
+        # zapisujemy pojedynczo, pomijając wpisy niemożliwe do zapisania
+        saved = 0
+        for entry in entries:
+            entry.pk = None
+            try:
+                save_entry(entry)
+                saved += 1
+            except DatabaseError:
+                logger.exception('Nie udało się zapisać wpisu dziennika: %r', entry)
+        return saved
+
+
+def save_entry(entry):
+    """Zapisuje pojedynczy wpis wraz ze zdarzeniem osi czasu i agregatem dziennym"""
+    with transaction.atomic():
+        _insert(type(entry), [entry])
+        _record_derived([entry])
+
+
+def _insert(model, objs):
+    """Wstawia wpisy jednego modelu; wpisy ActivityLog dołącza do łańcucha skrótów (core/log_chain.py)"""
+    from . import log_chain
+
+    head = log_chain.chain_entries(objs) if model._meta.label == 'core.ActivityLog' else None
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs)
+    else:
+        # Oś czasu i łańcuch potrzebują kluczy głównych zapisanych wpisów
+        for obj in objs:
+            obj.save(force_insert=True)
+    if head is not None:
+        log_chain.advance_head(head, objs)
+
+
+def _record_derived(entries):
+    """Dane wyliczane z zapisanych wpisów: oś czasu (core/timeline.py) i agregaty (core/activity_stats.py)"""
+    from . import activity_stats, timeline
+
+    timeline.record_events(entries)
+    activity_stats.record_entries(entries)
+
+
+_buffer = LogBuffer()
+
+
+def enqueue(instance):
+    """
+    Dodaje (niezapisany) wpis dziennika do zapisu.
+    W trybie buforowanym wpis trafia do bufora po zatwierdzeniu bieżącej transakcji.
+    """
+    if not get_config()['BUFFERED']:
+        save_entry(instance)
+        return instance
+    transaction.on_commit(lambda: _buffer.add(instance))
+    return instance
+
+
+def flush():
+    """Wymusza zapis bufora (np. przed odczytem dziennika)"""
+    return _buffer.flush()
+
+
+def pending_count():
+    return len(_buffer)
+
+
+def _request_finished(sender, **kwargs):
+    if get_config()['FLUSH_ON_REQUEST'] or _buffer.is_due():
+        _buffer.flush()
+
+
+request_finished.connect(_request_finished, dispatch_uid='szbi_log_writer_flush')
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Nie udało się zapisać bufora dziennika przy zamykaniu procesu')
@@ -0,0 +1,60 @@
+"""
+Archiwizacja dziennika zdarzeń - przeniesienie pełnych miesięcy starszych niż
+okres przechowywania do skompresowanych plików JSONL (core/log_archive.py).
+
+Komenda przeznaczona jest do uruchamiania cyklicznie, np. z crona raz na dobę:
+    15 2 * * * cd /srv/szbi && python manage.py archive_activity_log
+
+Użycie:
+    python manage.py archive_activity_log
+    python manage.py archive_activity_log --retention-days 180
+    python manage.py archive_activity_log --dry-run
+    python manage.py archive_activity_log --verify
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import log_archive, log_writer
+from core.models import ActivityLog
+
+
+class Command(BaseCommand):
+    help = 'Przenosi stare wpisy dziennika zdarzeń do archiwum miesięcznego'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Okres przechowywania w tabeli (domyślnie z SZBI_ACTIVITY_LOG_ARCHIVE)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Tylko wypisuje miesiące, które zostałyby zarchiwizowane')
+        parser.add_argument('--verify', action='store_true',
+                            help='Sprawdza sumy kontrolne i liczby wierszy istniejącego archiwum')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            errors = log_archive.verify_archive()
+            if errors:
+                raise CommandError('Archiwum jest uszkodzone:\n' + '\n'.join(errors))
+            self.stdout.write(self.style.SUCCESS('Archiwum jest spójne z manifestem.'))
+            return
+
+        log_writer.flush()
+        cutoff = log_archive.archive_cutoff(options['retention_days'])
+        months = log_archive.months_to_archive(cutoff)
+        if not months:
+            self.stdout.write(f'Brak wpisów starszych niż {cutoff:%Y-%m-%d}.')
+            return
+
+        total = 0
+        for month in months:
+            if options['dry_run']:
+                start, end = log_archive.month_bounds(month)
+                rows = ActivityLog.objects.filter(created_at__gte=start, created_at__lt=end).count()
+                self.stdout.write(f'{month:%Y-%m}: {rows} wpisów')
+                continue
+            rows = log_archive.archive_month(month)
+            total += rows
+            self.stdout.write(f'{month:%Y-%m}: zarchiwizowano {rows} wpisów')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Zarchiwizowano {total} wpisów starszych niż {cutoff:%Y-%m-%d}.'
+            ))
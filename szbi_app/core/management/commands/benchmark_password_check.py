@@ -0,0 +1,94 @@
+"""
+Benchmark sprawdzania hasła na liście słabych haseł CERT PL.
+
+Porównuje dotychczasowy zbiór (set) w pamięci procesu z indeksem
+mapowanym do pamięci (core/password_index.py) - bez filtra Blooma i z nim.
+Indeksy budowane są w katalogu tymczasowym. Mierzony jest czas otwarcia,
+pamięć procesu (tracemalloc), rozmiar pliku współdzielonego przez procesy
+oraz średni czas sprawdzenia hasła spoza listy i z listy.
+
+Użycie:
+    python manage.py benchmark_password_check
+    python manage.py benchmark_password_check --wordlist /sciezka/lista.txt --checks 50000
+"""
+import os
+import random
+import secrets
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import password_index
+from core.validators import CERTPolishWeakPasswordValidator
+
+
+def load_set(wordlist_path, index_path):
+    """Poprzednia implementacja - cała lista w zbiorze (punkt odniesienia)"""
+    return set(password_index.iter_wordlist(wordlist_path))
+
+
+def open_exact(wordlist_path, index_path):
+    return password_index.WeakPasswordIndex(index_path, use_bloom=False)
+
+
+def open_bloom(wordlist_path, index_path):
+    return password_index.WeakPasswordIndex(index_path)
+
+
+class Command(BaseCommand):
+    help = 'Porównuje pamięć i czas sprawdzania hasła (set, indeks, indeks z filtrem Blooma)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wordlist', help='Lista haseł (domyślnie core/password_data/wordlist_pl.txt)')
+        parser.add_argument('--checks', type=int, default=20000,
+                            help='Liczba sprawdzanych haseł każdego rodzaju')
+
+    def handle(self, *args, **options):
+        wordlist_path = CERTPolishWeakPasswordValidator(options['wordlist']).wordlist_path
+        if not os.path.exists(wordlist_path):
+            raise CommandError(f'Brak listy haseł: {wordlist_path}')
+
+        words = list(password_index.iter_wordlist(wordlist_path))
+        weak = random.choices(words, k=options['checks'])
+        strong = [f'{secrets.token_urlsafe(12)} zdanie {i}' for i in range(options['checks'])]
+        del words
+
+        with tempfile.TemporaryDirectory() as directory:
+            index_path = os.path.join(directory, 'wordlist.idx')
+            password_index.build_index(wordlist_path, index_path)
+            file_size = os.path.getsize(index_path)
+
+            self.stdout.write(
+                f'{"implementacja":<13} | {"otwarcie [ms]":>13} | {"pamięć [MB]":>11} | '
+                f'{"plik [MB]":>9} | {"spoza listy [us]":>16} | {"z listy [us]":>12}'
+            )
+            self.stdout.write('-' * 90)
+            results = {}
+            for label, factory, shared in (
+                ('set', load_set, 0),
+                ('indeks', open_exact, file_size),
+                ('indeks+Bloom', open_bloom, file_size),
+            ):
+                tracemalloc.start()
+                start = time.perf_counter()
+                passwords = factory(wordlist_path, index_path)
+                opened = (time.perf_counter() - start) * 1000
+                memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+                tracemalloc.stop()
+
+                timings = []
+                for sample in (strong, weak):
+                    start = time.perf_counter()
+                    found = sum(password_index.normalize(password) in passwords for password in sample)
+                    timings.append((time.perf_counter() - start) / len(sample) * 10 ** 6)
+                    results.setdefault(label, []).append(found)
+                self.stdout.write(
+                    f'{label:<13} | {opened:>13.1f} | {memory:>11.1f} | {shared / 2 ** 20:>9.1f} | '
+                    f'{timings[0]:>16.2f} | {timings[1]:>12.2f}'
+                )
+                del passwords
+
+        if len({tuple(found) for found in results.values()}) != 1:
+            self.stderr.write(self.style.ERROR(f'Rozbieżne wyniki: {results}'))
@@ -0,0 +1,127 @@
+"""
+Benchmark wyliczania uprawnień pracownika.
+
+Porównuje dotychczasową implementację (zagnieżdżone pętle po stanowiskach,
+działach i grupach) z pojedynczym zapytaniem UNION z Employee.get_permission_queryset.
+Dane testowe tworzone są w transakcji, która na końcu jest wycofywana.
+
+Użycie:
+    python manage.py benchmark_permissions
+    python manage.py benchmark_permissions --positions 1 5 20 --repeat 200
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    Organization, Department, Position, Employee, EmployeePermissionGroup,
+    Permission, PermissionGroup, PositionPermission, DepartmentPermission,
+)
+
+
+def legacy_get_permissions(employee):
+    """Poprzednia implementacja Employee.get_permissions (punkt odniesienia)"""
+    permissions = set()
+    for position in employee.positions.all():
+        for pa in position.permission_assignments.all():
+            for perm in pa.permission_group.permissions.all():
+                permissions.add(perm)
+    if employee.department:
+        for da in employee.department.permission_assignments.all():
+            for perm in da.permission_group.permissions.all():
+                permissions.add(perm)
+    for epg in employee.permission_group_assignments.all():
+        for perm in epg.permission_group.permissions.all():
+            permissions.add(perm)
+    return permissions
+
+
+def union_get_permissions(employee):
+    """Nowa implementacja - jedno zapytanie UNION, bez instancji modelu"""
+    return employee.get_permission_rows()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Porównuje liczbę zapytań i czas wyliczania uprawnień (pętle vs UNION)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--positions', type=int, nargs='+', default=[1, 5, 20],
+                            help='Liczby stanowisk pracownika do zmierzenia')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Liczba powtórzeń pomiaru czasu')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['positions'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, position_counts, repeat):
+        permissions = list(Permission.objects.all()[:30])
+        if not permissions:
+            permissions = [
+                Permission.objects.create(name=f'Benchmark {i}', category='configuration')
+                for i in range(30)
+            ]
+        organization = Organization.objects.create(name='Benchmark')
+
+        self.stdout.write(f'{"stanowiska":>10} | {"implementacja":<13} | {"zapytania":>9} | {"czas [ms]":>9}')
+        self.stdout.write('-' * 52)
+
+        for count in position_counts:
+            employee = self._build_employee(organization, permissions, count)
+            for label, func in (('pętle', legacy_get_permissions), ('UNION', union_get_permissions)):
+                with CaptureQueriesContext(connection) as ctx:
+                    result = func(employee)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    func(employee)
+                elapsed = (time.perf_counter() - start) / repeat * 1000
+                self.stdout.write(
+                    f'{count:>10} | {label:<13} | {len(ctx.captured_queries):>9} | {elapsed:>9.3f}'
+                )
+            legacy_names = {p.name for p in legacy_get_permissions(employee)}
+            union_names = {name for _, name, _ in union_get_permissions(employee)}
+            if legacy_names != union_names:
+                self.stderr.write(self.style.ERROR(f'Rozbieżne wyniki dla {count} stanowisk!'))
+
+    def _build_employee(self, organization, permissions, position_count):
+        """Tworzy pracownika z podaną liczbą stanowisk, działem i grupami bezpośrednimi"""
+        def make_group(name, offset):
+            group = PermissionGroup.objects.create(name=name)
+            group.permissions.set(permissions[offset % len(permissions):][:3])
+            return group
+
+        department = Department.objects.create(organization=organization, name=f'Dział {position_count}')
+        for i in range(2):
+            DepartmentPermission.objects.create(
+                department=department, permission_group=make_group(f'Dział {position_count}/{i}', i)
+            )
+
+        user = User.objects.create(username=f'benchmark_{position_count}_{time.time_ns()}')
+        employee = Employee.objects.create(
+            user=user, organization=organization, department=department,
+            first_name='Benchmark', last_name=str(position_count),
+        )
+        for i in range(position_count):
+            position = Position.objects.create(
+                organization=organization, department=department, name=f'Stanowisko {i}'
+            )
+            PositionPermission.objects.create(
+                position=position, permission_group=make_group(f'Stanowisko {position_count}/{i}', i)
+            )
+            employee.positions.add(position)
+        for i in range(2):
+            EmployeePermissionGroup.objects.create(
+                employee=employee, permission_group=make_group(f'Bezpośrednia {position_count}/{i}', i + 7)
+            )
+        return employee
@@ -0,0 +1,42 @@
+"""
+Budowa binarnego indeksu listy słabych haseł (core/password_index.py)
+używanego przez CERTPolishWeakPasswordValidator. Komendę należy uruchomić
+po wdrożeniu i po każdej aktualizacji listy - działające procesy serwera
+otwierają nowy indeks przy kolejnym sprawdzeniu hasła. Indeks zawiera filtr
+Blooma (domyślnie 0,1% fałszywych trafień; --bloom-fp-rate 0 - bez filtra).
+
+Użycie:
+    python manage.py build_password_index
+    python manage.py build_password_index --wordlist /sciezka/lista.txt --output /sciezka/lista.idx
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import password_index
+from core.validators import CERTPolishWeakPasswordValidator
+
+
+class Command(BaseCommand):
+    help = 'Buduje binarny indeks listy słabych haseł CERT PL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wordlist', help='Lista haseł (domyślnie core/password_data/wordlist_pl.txt)')
+        parser.add_argument('--output', help='Plik indeksu (domyślnie obok listy, z rozszerzeniem .idx)')
+        parser.add_argument('--bloom-fp-rate', type=float, default=password_index.BLOOM_FP_RATE,
+                            help='Odsetek fałszywych trafień filtra Blooma (0 - bez filtra)')
+
+    def handle(self, *args, **options):
+        validator = CERTPolishWeakPasswordValidator(options['wordlist'], options['output'])
+        if not os.path.exists(validator.wordlist_path):
+            raise CommandError(f'Brak listy haseł: {validator.wordlist_path}')
+        if not 0 <= options['bloom_fp_rate'] < 1:
+            raise CommandError('--bloom-fp-rate musi należeć do przedziału [0, 1)')
+
+        count = password_index.build_index(
+            validator.wordlist_path, validator.index_path, options['bloom_fp_rate']
+        )
+        size = os.path.getsize(validator.index_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Zbudowano indeks {validator.index_path}: {count} haseł, {size / 2 ** 20:.1f} MB.'
+        ))
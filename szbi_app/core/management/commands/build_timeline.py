@@ -0,0 +1,29 @@
+"""
+Uzupełnienie wspólnej osi czasu (core/timeline.py) wpisami dzienników
+zapisanymi przed jej wprowadzeniem. Wpisy już obecne na osi czasu są
+pomijane, więc komendę można uruchamiać wielokrotnie.
+
+Użycie:
+    python manage.py build_timeline
+    python manage.py build_timeline --source documents.DocumentLog
+"""
+from django.core.management.base import BaseCommand
+
+from core import log_writer, timeline
+
+
+class Command(BaseCommand):
+    help = 'Dodaje istniejące wpisy dzienników na wspólną oś czasu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=sorted(timeline.SOURCES), action='append',
+                            help='Model źródłowy (domyślnie wszystkie dzienniki)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Liczba wpisów odczytywanych i zapisywanych naraz')
+
+    def handle(self, *args, **options):
+        log_writer.flush()
+        for source in options['source'] or timeline.SOURCES:
+            processed = timeline.backfill(source, chunk_size=options['chunk_size'])
+            self.stdout.write(f'{source}: przetworzono {processed} wpisów')
+        self.stdout.write(self.style.SUCCESS('Oś czasu uzupełniona.'))
@@ -0,0 +1,103 @@
+"""
+Kalibracja parametrów Argon2 (core/hashers.py) dla serwera.
+
+Dobiera parametry tak, aby wyliczenie skrótu trwało około --target-ms:
+najpierw największą pamięć (do --max-memory) mieszczącą się w czasie przy
+jednym przebiegu, potem największą liczbę przebiegów (time_cost). Pamięć
+dotyczy jednego sprawdzenia hasła - przy wielu jednoczesnych logowaniach
+zużycie rośnie proporcjonalnie. Wynik zapisywany jest do pliku PARAMS_FILE;
+działające procesy używają go od kolejnego skrótu, a istniejące skróty
+aktualizowane są przy logowaniu użytkowników.
+
+Użycie:
+    python manage.py calibrate_argon2
+    python manage.py calibrate_argon2 --target-ms 300 --max-memory 128 --parallelism 2
+    python manage.py calibrate_argon2 --dry-run
+"""
+import os
+import platform
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import hashers
+
+# Najmniejsza pamięć (MiB) - zalecenie OWASP dla Argon2id
+MIN_MEMORY_MIB = 19
+
+
+class Command(BaseCommand):
+    help = 'Dobiera parametry Argon2 dla zadanego czasu sprawdzenia hasła na tym serwerze'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help='Docelowy czas wyliczenia skrótu w ms (domyślnie 250)')
+        parser.add_argument('--max-memory', type=int, default=256,
+                            help='Największa pamięć jednego skrótu w MiB (domyślnie 256)')
+        parser.add_argument('--parallelism', type=int, default=min(os.cpu_count() or 1, 8),
+                            help='Liczba wątków Argon2 (domyślnie liczba procesorów, maks. 8)')
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Liczba pomiarów każdego wariantu (mediana)')
+        parser.add_argument('--output', help='Plik parametrów (domyślnie SZBI_PASSWORD_HASHING["PARAMS_FILE"])')
+        parser.add_argument('--dry-run', action='store_true', help='Tylko wyświetla wynik')
+
+    def handle(self, *args, **options):
+        try:
+            from argon2.low_level import Type, hash_secret
+        except ImportError:
+            raise CommandError('Kalibracja wymaga biblioteki argon2-cffi.')
+        target = options['target_ms']
+        parallelism = options['parallelism']
+        if target <= 0 or parallelism < 1 or options['max_memory'] < MIN_MEMORY_MIB:
+            raise CommandError(f'Nieprawidłowe parametry (pamięć co najmniej {MIN_MEMORY_MIB} MiB).')
+
+        def measure(time_cost, memory_mib):
+            timings = []
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                hash_secret(
+                    b'calibration password', os.urandom(16), time_cost=time_cost,
+                    memory_cost=memory_mib * 1024, parallelism=parallelism, hash_len=32, type=Type.ID,
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+            elapsed = statistics.median(timings)
+            self.stdout.write(f'  time_cost={time_cost:<3} pamięć={memory_mib:>4} MiB: {elapsed:8.1f} ms')
+            return elapsed
+
+        # Pamięć: od największej, połowiąc, aż jeden przebieg zmieści się w połowie czasu
+        memory_mib = options['max_memory']
+        elapsed = measure(1, memory_mib)
+        while elapsed > target / 2 and memory_mib > MIN_MEMORY_MIB:
+            memory_mib = max(memory_mib // 2, MIN_MEMORY_MIB)
+            elapsed = measure(1, memory_mib)
+
+        # Przebiegi: czas rośnie liniowo - szacunek, potem korekta pomiarem
+        time_cost = max(1, int(target / elapsed))
+        elapsed = measure(time_cost, memory_mib)
+        while elapsed > target * 1.1 and time_cost > 1:
+            time_cost -= 1
+            elapsed = measure(time_cost, memory_mib)
+        while True:
+            candidate = measure(time_cost + 1, memory_mib)
+            if candidate > target * 1.1:
+                break
+            time_cost, elapsed = time_cost + 1, candidate
+
+        params = {
+            'time_cost': time_cost,
+            'memory_cost': memory_mib * 1024,
+            'parallelism': parallelism,
+            'measured_ms': round(elapsed, 1),
+            'target_ms': target,
+            'host': platform.node(),
+            'calibrated_at': timezone.now().isoformat(),
+        }
+        summary = (f'time_cost={time_cost}, memory_cost={memory_mib} MiB, '
+                   f'parallelism={parallelism}: {elapsed:.0f} ms')
+        if options['dry_run']:
+            self.stdout.write(summary)
+            return
+        hashers.write_params(params, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Zapisano parametry Argon2 ({summary}).'))
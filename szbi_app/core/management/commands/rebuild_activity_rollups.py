@@ -0,0 +1,37 @@
+"""
+Odtworzenie dziennych agregatów i listy uczestników dziennika zdarzeń
+(core/activity_stats.py) z tabeli ActivityLog i archiwum - po wdrożeniu
+agregatów lub w razie rozbieżności. Bez --since odtwarzane są wszystkie dni.
+
+Użycie:
+    python manage.py rebuild_activity_rollups
+    python manage.py rebuild_activity_rollups --since 2024-01-01
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import activity_stats, log_writer
+
+
+class Command(BaseCommand):
+    help = 'Odtwarza dzienne agregaty i uczestników dziennika zdarzeń'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Pierwszy odtwarzany dzień (RRRR-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_date(options['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                raise CommandError(f'Nieprawidłowa data: {options["since"]}')
+
+        log_writer.flush()
+        created = activity_stats.rebuild(since)
+        participants = activity_stats.rebuild_participants()
+        self.stdout.write(self.style.SUCCESS(
+            f'Odtworzono agregaty: {created} wierszy, uczestnicy dziennika: {participants}.'
+        ))
@@ -0,0 +1,30 @@
+"""
+Przebudowa tabeli efektywnych uprawnień pracowników (EmployeeEffectivePermission).
+
+Na co dzień tabela jest aktualizowana przyrostowo przez sygnały - komendę
+należy uruchomić po wdrożeniu migracji oraz po masowych zmianach danych
+z pominięciem ORM.
+
+Użycie:
+    python manage.py rebuild_effective_permissions
+    python manage.py rebuild_effective_permissions --batch-size 1000
+"""
+from django.core.management.base import BaseCommand
+
+from core.effective_permissions import rebuild_all, REBUILD_BATCH_SIZE
+from core.models import EmployeeEffectivePermission
+
+
+class Command(BaseCommand):
+    help = 'Przebudowuje tabelę efektywnych uprawnień pracowników'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+                            help='Liczba pracowników przetwarzanych w jednej partii')
+
+    def handle(self, *args, **options):
+        employees = rebuild_all(batch_size=options['batch_size'])
+        rows = EmployeeEffectivePermission.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Przebudowano efektywne uprawnienia: {employees} pracowników, {rows} wpisów.'
+        ))
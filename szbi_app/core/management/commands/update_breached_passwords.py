@@ -0,0 +1,46 @@
+"""
+Aktualizacja offline korpusu haseł z wycieków (core/breached_passwords.py)
+z pobranych danych Have I Been Pwned - katalogu plików zakresów SHA-1
+(XXXXX.txt) lub pliku pwnedpasswords.txt posortowanego wg skrótu.
+
+Nowy korpus budowany jest obok aktywnego i przełączany atomowo - procesy
+serwera zaczynają z niego korzystać przy kolejnym sprawdzeniu hasła, bez
+restartu. --min-count pomija skróty o mniejszej liczbie wystąpień
+(mniejszy korpus).
+
+Użycie:
+    python manage.py update_breached_passwords /sciezka/pwnedpasswords.txt
+    python manage.py update_breached_passwords /sciezka/zakresy/ --min-count 10
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import breached_passwords
+
+
+class Command(BaseCommand):
+    help = 'Buduje i aktywuje offline korpus haseł z wycieków (format HIBP)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Katalog plików zakresów HIBP lub plik skrótów SHA-1')
+        parser.add_argument('--min-count', type=int, default=1,
+                            help='Minimalna liczba wystąpień skrótu zapisywanego w korpusie')
+        parser.add_argument('--dir', help='Katalog korpusów (domyślnie SZBI_BREACHED_PASSWORDS["DIR"])')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['source']):
+            raise CommandError(f'Brak źródła: {options["source"]}')
+
+        start = time.monotonic()
+        try:
+            manifest = breached_passwords.build_corpus(
+                options['source'], options['dir'], min_count=options['min_count']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Aktywowano korpus: {manifest["count"]} skrótów w {len(manifest["shards"])} shardach '
+            f'({time.monotonic() - start:.0f} s).'
+        ))
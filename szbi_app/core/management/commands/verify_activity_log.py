@@ -0,0 +1,41 @@
+"""
+Weryfikacja łańcucha skrótów dziennika zdarzeń (core/log_chain.py).
+
+Domyślnie sprawdzane są tylko wpisy dodane od ostatniego zweryfikowanego
+punktu kontrolnego; po pomyślnej weryfikacji na końcu łańcucha tworzony jest
+nowy zweryfikowany punkt kontrolny. Odcinki między punktami kontrolnymi
+mogą być sprawdzane równolegle (--workers).
+
+Użycie:
+    python manage.py verify_activity_log
+    python manage.py verify_activity_log --workers 4
+    python manage.py verify_activity_log --full
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import log_chain, log_writer
+
+
+class Command(BaseCommand):
+    help = 'Weryfikuje integralność dziennika zdarzeń (łańcuch skrótów)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Sprawdza cały łańcuch, a nie tylko nowe wpisy')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Liczba procesów sprawdzających odcinki równolegle')
+
+    def handle(self, *args, **options):
+        log_writer.flush()
+        started = time.monotonic()
+        rows, errors = log_chain.verify_chain(full=options['full'], workers=max(options['workers'], 1))
+        elapsed = time.monotonic() - started
+        if errors:
+            raise CommandError(
+                f'Dziennik zdarzeń został zmodyfikowany ({len(errors)} błędów):\n' + '\n'.join(errors[:100])
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Łańcuch dziennika jest spójny - sprawdzono {rows} wpisów w {elapsed:.1f} s.'
+        ))
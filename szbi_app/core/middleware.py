@@ -0,0 +1,25 @@
+"""
+Middleware modułu core.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .mixins import get_user_permission_names
+
+
+class SZBIPermissionsMiddleware:
+    """
+    Udostępnia request.szbi_permissions - leniwie wyliczany frozenset nazw
+    uprawnień zalogowanego użytkownika. Uprawnienia są rozwiązywane dopiero
+    przy pierwszym sprawdzeniu i tylko raz na żądanie.
+    
+    Musi znajdować się za AuthenticationMiddleware.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        request.szbi_permissions = SimpleLazyObject(
+            lambda: get_user_permission_names(request.user)
+        )
+        return self.get_response(request)
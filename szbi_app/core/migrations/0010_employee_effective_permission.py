@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Kopia wyliczania z core/effective_permissions.py z chwili utworzenia
+# migracji - późniejsze zmiany modułu nie mogą zmieniać jej działania
+
+def fill_effective_permissions(apps, schema_editor):
+    """Efektywne uprawnienia istniejących pracowników (stanowiska, dział, grupy bezpośrednie)"""
+    Employee = apps.get_model('core', 'Employee')
+    EmployeePermissionGroup = apps.get_model('core', 'EmployeePermissionGroup')
+    EmployeeEffectivePermission = apps.get_model('core', 'EmployeeEffectivePermission')
+
+    perm_path = 'permission_group__permissions'
+    rows = set()
+    rows.update(
+        (employee_id, permission_id, 'position')
+        for employee_id, permission_id in Employee.positions.through.objects.filter(
+            **{f'position__permission_assignments__{perm_path}__isnull': False}
+        ).values_list('employee_id', f'position__permission_assignments__{perm_path}')
+    )
+    rows.update(
+        (employee_id, permission_id, 'department')
+        for employee_id, permission_id in Employee.objects.filter(
+            **{f'department__permission_assignments__{perm_path}__isnull': False}
+        ).values_list('pk', f'department__permission_assignments__{perm_path}')
+    )
+    rows.update(
+        (employee_id, permission_id, 'direct')
+        for employee_id, permission_id in EmployeePermissionGroup.objects.filter(
+            **{f'{perm_path}__isnull': False}
+        ).values_list('employee_id', perm_path)
+    )
+    EmployeeEffectivePermission.objects.bulk_create(
+        [EmployeeEffectivePermission(employee_id=e, permission_id=p, source=s) for e, p, s in sorted(rows)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_remove_audit_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeEffectivePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('position', 'Stanowisko'), ('department', 'Dział'), ('direct', 'Przypisanie bezpośrednie')], max_length=20, verbose_name='Źródło')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to='core.employee', verbose_name='Pracownik')),
+                ('permission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_assignments', to='core.permission', verbose_name='Uprawnienie')),
+            ],
+            options={
+                'verbose_name': 'Efektywne uprawnienie pracownika',
+                'verbose_name_plural': 'Efektywne uprawnienia pracowników',
+                'indexes': [models.Index(fields=['permission', 'employee'], name='core_employ_permiss_9c9406_idx')],
+                'unique_together': {('employee', 'permission', 'source')},
+            },
+        ),
+        migrations.RunPython(fill_effective_permissions, migrations.RunPython.noop),
+    ]
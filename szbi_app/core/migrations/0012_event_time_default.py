@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_hierarchy_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Czas wystąpienia zdarzenia (nie zapisu - wpisy zapisywane są zbiorczo)', verbose_name='Data zdarzenia'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated manually
+
+from django.db import migrations
+
+
+# Kopia SQL z core/log_search.py z chwili utworzenia migracji - późniejsze
+# zmiany wyszukiwania nie mogą zmieniać jej działania
+
+FTS_TABLE = 'core_activitylog_fts'
+LOG_TABLE = 'core_activitylog'
+
+
+def _fold_sql(expression):
+    return f"replace(replace({expression}, 'ł', 'l'), 'Ł', 'L')"
+
+
+def _indexed_values_sql(row):
+    details = f"(SELECT group_concat(value, ' ') FROM json_tree({row}.details) WHERE type = 'text')"
+    return (
+        f'{row}.id, {_fold_sql(f"{row}.object_repr")}, '
+        f'{_fold_sql(f"{row}.description")}, {_fold_sql(details)}'
+    )
+
+
+FTS_CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        object_repr, description, details,
+        content='{LOG_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        VALUES ({_indexed_values_sql('new')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, object_repr, description, details)
+        VALUES ('delete', {_indexed_values_sql('old')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, object_repr, description, details)
+        VALUES ('delete', {_indexed_values_sql('old')});
+        INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        VALUES ({_indexed_values_sql('new')});
+    END""",
+    # Zasilenie indeksu istniejącymi wpisami
+    f"""INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        SELECT {_indexed_values_sql(LOG_TABLE)} FROM {LOG_TABLE}""",
+]
+
+FTS_DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_fts_index(apps, schema_editor):
+    """Indeks FTS5 dziennika zdarzeń - tylko SQLite z obsługą FTS5"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+            return
+    for sql in FTS_CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_activitylog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_activitylog_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('activity', 'Dziennik zdarzeń'), ('document', 'Dokumenty'), ('asset', 'Aktywa'), ('soa', 'Deklaracja stosowania'), ('incident', 'Incydenty')], max_length=20, verbose_name='Źródło')),
+                ('source_id', models.PositiveBigIntegerField(verbose_name='ID wpisu źródłowego')),
+                ('created_at', models.DateTimeField(verbose_name='Data zdarzenia')),
+                ('action', models.CharField(max_length=30, verbose_name='Akcja')),
+                ('action_display', models.CharField(max_length=100, verbose_name='Akcja (opis)')),
+                ('object_type', models.CharField(max_length=100, verbose_name='Typ obiektu')),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID obiektu')),
+                ('object_repr', models.CharField(max_length=255, verbose_name='Reprezentacja obiektu')),
+                ('description', models.TextField(blank=True, verbose_name='Opis zdarzenia')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Użytkownik')),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie osi czasu',
+                'verbose_name_plural': 'Oś czasu',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='core_timeli_created_af3a6a_idx'), models.Index(fields=['user', '-created_at', '-id'], name='core_timeli_user_id_bffadd_idx'), models.Index(fields=['object_type', 'object_id', '-created_at', '-id'], name='core_timeli_object__7d25ad_idx')],
+                'unique_together': {('source', 'source_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_timelineevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dzień')),
+                ('category', models.CharField(choices=[('organization', 'Organizacja'), ('department', 'Dział'), ('position', 'Stanowisko'), ('employee', 'Pracownik'), ('permission', 'Uprawnienia'), ('document', 'Dokument'), ('asset', 'Aktywo'), ('incident', 'Incydent'), ('audit', 'Audyt'), ('system', 'System'), ('auth', 'Autoryzacja')], max_length=20, verbose_name='Kategoria')),
+                ('action', models.CharField(choices=[('create', 'Utworzenie'), ('update', 'Modyfikacja'), ('delete', 'Usunięcie'), ('assign', 'Przypisanie'), ('unassign', 'Cofnięcie przypisania'), ('login', 'Logowanie'), ('logout', 'Wylogowanie'), ('view', 'Wyświetlenie'), ('export', 'Eksport'), ('import', 'Import'), ('other', 'Inne')], max_length=20, verbose_name='Akcja')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Liczba zdarzeń')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Użytkownik')),
+            ],
+            options={
+                'verbose_name': 'Dzienna statystyka zdarzeń',
+                'verbose_name_plural': 'Dzienne statystyki zdarzeń',
+                'indexes': [models.Index(fields=['day', 'category', 'action'], name='core_activi_day_04cf44_idx'), models.Index(fields=['user', 'day'], name='core_activi_user_id_4a8e74_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,184 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+import hashlib
+import hmac
+import json
+from datetime import timezone as dt_timezone
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Kopie z core/log_chain.py i core/log_search.py z chwili utworzenia migracji -
+# późniejsze zmiany modułów nie mogą zmieniać jej działania
+
+GENESIS_HASH = '0' * 64
+
+CHAIN_FIELDS = (
+    'created_at', 'user_id', 'action', 'category', 'object_type', 'object_id',
+    'object_repr', 'description', 'details', 'ip_address', 'user_agent',
+)
+
+FTS_TABLE = 'core_activitylog_fts'
+LOG_TABLE = 'core_activitylog'
+
+
+def _normalize(name, value):
+    if value is None:
+        return None
+    if name == 'created_at':
+        return value.astimezone(dt_timezone.utc).isoformat()
+    if name == 'details':
+        return value
+    return str(value)
+
+
+def compute_hash(prev_hash, values):
+    payload = [prev_hash] + [_normalize(name, value) for name, value in zip(CHAIN_FIELDS, values)]
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def sign_checkpoint(last_id, entry_hash, rows):
+    key = (getattr(settings, 'SZBI_ACTIVITY_LOG_CHAIN', {}).get('KEY') or settings.SECRET_KEY).encode()
+    message = f'{last_id}:{entry_hash}:{rows}'.encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def _fold_sql(expression):
+    return f"replace(replace({expression}, 'ł', 'l'), 'Ł', 'L')"
+
+
+def _indexed_values_sql(row):
+    details = f"(SELECT group_concat(value, ' ') FROM json_tree({row}.details) WHERE type = 'text')"
+    return (
+        f'{row}.id, {_fold_sql(f"{row}.object_repr")}, '
+        f'{_fold_sql(f"{row}.description")}, {_fold_sql(details)}'
+    )
+
+
+FTS_TRIGGERS_SQL = [
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        VALUES ({_indexed_values_sql('new')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, object_repr, description, details)
+        VALUES ('delete', {_indexed_values_sql('old')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF object_repr, description, details ON {LOG_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, object_repr, description, details)
+        VALUES ('delete', {_indexed_values_sql('old')});
+        INSERT INTO {FTS_TABLE}(rowid, object_repr, description, details)
+        VALUES ({_indexed_values_sql('new')});
+    END""",
+]
+
+FTS_DROP_TRIGGERS_SQL = [f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+
+
+def chain_existing_entries(apps, schema_editor):
+    """Dołącza istniejące wpisy dziennika do łańcucha skrótów (wg id)"""
+    ActivityLog = apps.get_model('core', 'ActivityLog')
+    ActivityLogChainHead = apps.get_model('core', 'ActivityLogChainHead')
+    ActivityLogCheckpoint = apps.get_model('core', 'ActivityLogCheckpoint')
+
+    quote = schema_editor.quote_name
+    # executemany zamiast bulk_update (CASE WHEN dla tysięcy wierszy jest wolne)
+    update_sql = 'UPDATE {} SET {} = %s, {} = %s WHERE {} = %s'.format(
+        quote(ActivityLog._meta.db_table), quote('prev_hash'), quote('entry_hash'), quote('id')
+    )
+    last_id, prev_hash, rows = 0, GENESIS_HASH, 0
+    while True:
+        batch = list(
+            ActivityLog.objects.filter(pk__gt=last_id).order_by('pk')
+            .values_list('pk', *CHAIN_FIELDS)[:2000]
+        )
+        if not batch:
+            break
+        updates = []
+        for pk, *values in batch:
+            entry_hash = compute_hash(prev_hash, values)
+            updates.append((prev_hash, entry_hash, pk))
+            prev_hash = entry_hash
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(update_sql, updates)
+        last_id = batch[-1][0]
+        rows += len(batch)
+
+    ActivityLogChainHead.objects.create(pk=1, last_id=last_id, last_hash=prev_hash)
+    if rows:
+        ActivityLogCheckpoint.objects.create(
+            last_id=last_id, entry_hash=prev_hash, rows=rows,
+            signature=sign_checkpoint(last_id, prev_hash, rows),
+        )
+
+
+def restore_fts_triggers(apps, schema_editor):
+    """Przebudowa tabeli dziennika na SQLite (AddField) usuwa wyzwalacze indeksu FTS"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in connection.introspection.table_names():
+        return
+    for sql in FTS_DROP_TRIGGERS_SQL + FTS_TRIGGERS_SQL:
+        schema_editor.execute(sql)
+
+
+def unchain_entries(apps, schema_editor):
+    apps.get_model('core', 'ActivityLogCheckpoint').objects.all().delete()
+    apps.get_model('core', 'ActivityLogChainHead').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_activitydailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.CreateModel(
+            name='ActivityLogChainHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_id', models.PositiveBigIntegerField(default=0, verbose_name='ID ostatniego wpisu')),
+                ('last_hash', models.CharField(max_length=64, verbose_name='Skrót ostatniego wpisu')),
+                ('rows_since_checkpoint', models.PositiveIntegerField(default=0, verbose_name='Wpisy od punktu kontrolnego')),
+            ],
+            options={
+                'verbose_name': 'Koniec łańcucha dziennika',
+                'verbose_name_plural': 'Koniec łańcucha dziennika',
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityLogCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_id', models.PositiveBigIntegerField(unique=True, verbose_name='ID ostatniego wpisu')),
+                ('entry_hash', models.CharField(max_length=64, verbose_name='Skrót ostatniego wpisu')),
+                ('rows', models.PositiveIntegerField(verbose_name='Wpisy od poprzedniego punktu')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data utworzenia')),
+                ('signature', models.CharField(max_length=64, verbose_name='Podpis')),
+                ('verified_at', models.DateTimeField(blank=True, null=True, verbose_name='Data weryfikacji')),
+            ],
+            options={
+                'verbose_name': 'Punkt kontrolny dziennika',
+                'verbose_name_plural': 'Punkty kontrolne dziennika',
+                'ordering': ['last_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='entry_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Skrót wpisu'),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='prev_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Skrót poprzedniego wpisu'),
+        ),
+        migrations.RunPython(chain_existing_entries, unchain_entries),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
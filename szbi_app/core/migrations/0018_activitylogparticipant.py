@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def fill_participants(apps, schema_editor):
+    """Uczestnicy dziennika z istniejących wpisów (archiwum: komenda rebuild_activity_rollups)"""
+    ActivityLog = apps.get_model('core', 'ActivityLog')
+    ActivityLogParticipant = apps.get_model('core', 'ActivityLogParticipant')
+    rows = ActivityLog.objects.filter(user__isnull=False).order_by().values('user_id').annotate(
+        first=Min('created_at'), last=Max('created_at'), total=Count('pk')
+    )
+    ActivityLogParticipant.objects.bulk_create([
+        ActivityLogParticipant(
+            user_id=row['user_id'], first_activity_at=row['first'],
+            last_activity_at=row['last'], entry_count=row['total'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0017_activitylog_hash_chain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogParticipant',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Użytkownik')),
+                ('first_activity_at', models.DateTimeField(verbose_name='Pierwsza aktywność')),
+                ('last_activity_at', models.DateTimeField(verbose_name='Ostatnia aktywność')),
+                ('entry_count', models.PositiveIntegerField(default=0, verbose_name='Liczba wpisów')),
+            ],
+            options={
+                'verbose_name': 'Uczestnik dziennika zdarzeń',
+                'verbose_name_plural': 'Uczestnicy dziennika zdarzeń',
+            },
+        ),
+        migrations.RunPython(fill_participants, migrations.RunPython.noop),
+    ]
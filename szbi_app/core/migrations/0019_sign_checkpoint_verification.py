@@ -0,0 +1,50 @@
+# Generated manually
+
+import hashlib
+import hmac
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations
+
+
+# Kopia podpisu z core/log_chain.py z chwili utworzenia migracji -
+# późniejsze zmiany modułu nie mogą zmieniać jej działania
+
+def sign_checkpoint(last_id, entry_hash, rows, verified_at=None):
+    key = (getattr(settings, 'SZBI_ACTIVITY_LOG_CHAIN', {}).get('KEY') or settings.SECRET_KEY).encode()
+    message = f'{last_id}:{entry_hash}:{rows}'
+    if verified_at is not None:
+        message += f':{verified_at.astimezone(dt_timezone.utc).isoformat()}'
+    return hmac.new(key, message.encode(), hashlib.sha256).hexdigest()
+
+
+def _resign(apps, with_verified_at):
+    ActivityLogCheckpoint = apps.get_model('core', 'ActivityLogCheckpoint')
+    checkpoints = list(ActivityLogCheckpoint.objects.filter(verified_at__isnull=False))
+    for checkpoint in checkpoints:
+        checkpoint.signature = sign_checkpoint(
+            checkpoint.last_id, checkpoint.entry_hash, checkpoint.rows,
+            checkpoint.verified_at if with_verified_at else None,
+        )
+    ActivityLogCheckpoint.objects.bulk_update(checkpoints, ['signature'], batch_size=500)
+
+
+def sign_verification(apps, schema_editor):
+    """Podpisy zweryfikowanych punktów kontrolnych obejmują odtąd datę weryfikacji"""
+    _resign(apps, with_verified_at=True)
+
+
+def unsign_verification(apps, schema_editor):
+    _resign(apps, with_verified_at=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_activitylogparticipant'),
+    ]
+
+    operations = [
+        migrations.RunPython(sign_verification, unsign_verification),
+    ]
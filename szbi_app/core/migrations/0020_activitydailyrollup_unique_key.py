@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    """Scala zdublowane wiersze agregatów (jeden wiersz na klucz, suma liczności)"""
+    ActivityDailyRollup = apps.get_model('core', 'ActivityDailyRollup')
+    duplicates = ActivityDailyRollup.objects.order_by().values(
+        'day', 'category', 'action', 'user_id'
+    ).annotate(rows=Count('pk'), first=Min('pk'), total=Sum('count')).filter(rows__gt=1)
+    for row in list(duplicates):
+        key = {'day': row['day'], 'category': row['category'], 'action': row['action'], 'user_id': row['user_id']}
+        ActivityDailyRollup.objects.filter(**key).exclude(pk=row['first']).delete()
+        ActivityDailyRollup.objects.filter(pk=row['first']).update(count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_sign_checkpoint_verification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='activitydailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('day', 'category', 'action', 'user'), name='unique_activity_rollup_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitydailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('day', 'category', 'action'), name='unique_activity_rollup_no_user'),
+        ),
+    ]
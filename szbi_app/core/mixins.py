@@ -7,6 +7,8 @@ from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.contrib import messages
 
+from .permissions import PermissionSet, EMPTY_PERMISSION_SET
+
 
 def get_employee_from_user(user):
     """Pobiera obiekt Employee dla zalogowanego użytkownika"""
@@ -18,17 +20,43 @@ def get_employee_from_user(user):
         return None
 
 
+def get_user_permission_names(user):
+    """
+    Zwraca PermissionSet (frozenset nazw uprawnień z maską bitową) użytkownika.
+    Wynik jest zapamiętywany na obiekcie użytkownika, więc w obrębie jednego
+    żądania uprawnienia są wyliczane tylko raz.
+    """
+    if not user.is_authenticated:
+        return EMPTY_PERMISSION_SET
+    
+    names = getattr(user, '_szbi_permission_names', None)
+    if names is None:
+        if user.is_superuser:
+            # Superuser ma wszystkie uprawnienia
+            from .models import Permission
+            names = PermissionSet(Permission.objects.values_list('name', flat=True))
+        else:
+            employee = get_employee_from_user(user)
+            names = employee.get_permission_names() if employee else EMPTY_PERMISSION_SET
+        user._szbi_permission_names = names
+    return names
+
+
+def get_request_permissions(request):
+    """Zwraca uprawnienia z request.szbi_permissions (lub wylicza je, gdy brak middleware)"""
+    names = getattr(request, 'szbi_permissions', None)
+    if names is None:
+        names = get_user_permission_names(request.user)
+    return names
+
+
 def user_has_permission(user, permission_name):
     """Sprawdza czy użytkownik ma dane uprawnienie"""
     # Superuser ma wszystkie uprawnienia
     if user.is_superuser:
         return True
     
-    employee = get_employee_from_user(user)
-    if not employee:
-        return False
-    
-    return employee.has_permission(permission_name)
+    return get_user_permission_names(user).has(permission_name)
 
 
 def user_has_any_permission(user, permission_names):
@@ -37,11 +65,7 @@ def user_has_any_permission(user, permission_names):
     if user.is_superuser:
         return True
     
-    employee = get_employee_from_user(user)
-    if not employee:
-        return False
-    
-    return employee.has_any_permission(permission_names)
+    return get_user_permission_names(user).has_any(permission_names)
 
 
 class SZBIPermissionRequiredMixin(LoginRequiredMixin):
@@ -75,16 +99,14 @@ class SZBIPermissionRequiredMixin(LoginRequiredMixin):
         if self.request.user.is_superuser:
             return True
         
-        employee = get_employee_from_user(self.request.user)
-        if not employee:
-            return False
+        permissions = get_request_permissions(self.request)
         
         # Jeśli to lista uprawnień - wystarczy jedno
         if isinstance(self.szbi_permission_required, (list, tuple)):
-            return employee.has_any_permission(self.szbi_permission_required)
+            return permissions.has_any(self.szbi_permission_required)
         
         # Pojedyncze uprawnienie
-        return employee.has_permission(self.szbi_permission_required)
+        return permissions.has(self.szbi_permission_required)
     
     def handle_permission_denied(self):
         """Obsługa braku uprawnień - domyślnie przekierowuje do dashboardu"""
@@ -119,11 +141,7 @@ class SZBIAllPermissionsRequiredMixin(LoginRequiredMixin):
         if self.request.user.is_superuser:
             return True
         
-        employee = get_employee_from_user(self.request.user)
-        if not employee:
-            return False
-        
-        return employee.has_all_permissions(self.szbi_permissions_required)
+        return get_request_permissions(self.request).has_all(self.szbi_permissions_required)
     
     def handle_permission_denied(self):
         return redirect('core:dashboard')
@@ -155,12 +173,11 @@ def szbi_permission_required(permission_name, login_url=None, raise_exception=Fa
             if request.user.is_superuser:
                 has_perm = True
             else:
-                employee = get_employee_from_user(request.user)
-                if employee:
-                    if isinstance(permission_name, (list, tuple)):
-                        has_perm = employee.has_any_permission(permission_name)
-                    else:
-                        has_perm = employee.has_permission(permission_name)
+                permissions = get_request_permissions(request)
+                if isinstance(permission_name, (list, tuple)):
+                    has_perm = permissions.has_any(permission_name)
+                else:
+                    has_perm = permissions.has(permission_name)
             
             if has_perm:
                 return view_func(request, *args, **kwargs)
@@ -1,8 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
+from .hierarchy import MaterializedPathModel
+from . import log_writer
 
-class Organization(models.Model):
+
+class Organization(MaterializedPathModel):
     """Model organizacji/jednostki"""
     name = models.CharField(max_length=255, verbose_name="Nazwa organizacji")
     short_name = models.CharField(max_length=50, verbose_name="Skrót nazwy", blank=True)
@@ -41,12 +45,10 @@ class Organization(models.Model):
 
     def get_full_path(self):
         """Zwraca pełną ścieżkę organizacji w hierarchii"""
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
-        return self.name
+        return self.get_path_display()
 
 
-class Department(models.Model):
+class Department(MaterializedPathModel):
     """Model działu/grupy w organizacji"""
     organization = models.ForeignKey(
         Organization, 
@@ -158,45 +160,54 @@ class Employee(models.Model):
         """Zwraca listę stanowisk jako string"""
         return ", ".join([p.name for p in self.positions.all()])
 
+    def get_permission_queryset(self):
+        """
+        Zwraca QuerySet uprawnień pracownika wyliczany jednym zapytaniem SQL.
+        Identyfikatory grup z trzech ścieżek nadawania (stanowiska, dział,
+        bezpośrednio przypisane grupy) są łączone przez UNION i złączane
+        z PermissionGroup.permissions.
+        """
+        group_ids = PositionPermission.objects.filter(
+            position__employees=self.pk
+        ).values('permission_group_id').union(
+            DepartmentPermission.objects.filter(
+                department_id=self.department_id
+            ).values('permission_group_id'),
+            EmployeePermissionGroup.objects.filter(
+                employee_id=self.pk
+            ).values('permission_group_id'),
+        )
+        return Permission.objects.filter(groups__in=group_ids).distinct()
+
+    def get_permission_rows(self):
+        """Zwraca listę krotek (id, nazwa, kategoria) uprawnień pracownika - bez tworzenia instancji modelu"""
+        return list(self.get_permission_queryset().values_list('id', 'name', 'category'))
+
     def get_permissions(self):
         """Zwraca wszystkie uprawnienia pracownika (z poziomu stanowisk, działu i bezpośrednio przypisanych grup)"""
-        permissions = set()
-        
-        # Uprawnienia ze stanowisk
-        for position in self.positions.all():
-            for pa in position.permission_assignments.all():
-                for perm in pa.permission_group.permissions.all():
-                    permissions.add(perm)
-        
-        # Uprawnienia z działu
-        if self.department:
-            for da in self.department.permission_assignments.all():
-                for perm in da.permission_group.permissions.all():
-                    permissions.add(perm)
-        
-        # Uprawnienia z bezpośrednio przypisanych grup
-        for epg in self.permission_group_assignments.all():
-            for perm in epg.permission_group.permissions.all():
-                permissions.add(perm)
-        
-        return permissions
+        return set(self.get_permission_queryset())
+
+    def get_permission_names(self):
+        """Zwraca PermissionSet - frozenset nazw uprawnień z maską bitową (przechowywany w cache)"""
+        from .permission_cache import get_compiled_permissions
+        return get_compiled_permissions(self).names
+
+    def get_permission_categories(self):
+        """Zwraca frozenset kategorii, z których pracownik ma jakiekolwiek uprawnienie"""
+        from .permission_cache import get_compiled_permissions
+        return get_compiled_permissions(self).categories
 
     def has_permission(self, permission_name):
         """Sprawdza czy pracownik ma dane uprawnienie (po nazwie)"""
-        permissions = self.get_permissions()
-        return any(p.name == permission_name for p in permissions)
+        return self.get_permission_names().has(permission_name)
     
     def has_any_permission(self, permission_names):
         """Sprawdza czy pracownik ma którekolwiek z podanych uprawnień"""
-        permissions = self.get_permissions()
-        perm_names = {p.name for p in permissions}
-        return bool(perm_names & set(permission_names))
+        return self.get_permission_names().has_any(permission_names)
     
     def has_all_permissions(self, permission_names):
         """Sprawdza czy pracownik ma wszystkie podane uprawnienia"""
-        permissions = self.get_permissions()
-        perm_names = {p.name for p in permissions}
-        return set(permission_names).issubset(perm_names)
+        return self.get_permission_names().has_all(permission_names)
 
 
 class EmployeePermissionGroup(models.Model):
@@ -265,6 +276,10 @@ class Permission(models.Model):
     def __str__(self):
         return self.name
 
+    def get_employees(self):
+        """Zwraca pracowników posiadających to uprawnienie (wg tabeli efektywnych uprawnień)"""
+        return Employee.objects.filter(effective_permissions__permission=self).distinct()
+
 
 class PermissionGroup(models.Model):
     """Model grupy uprawnień"""
@@ -338,6 +353,48 @@ class DepartmentPermission(models.Model):
         return f"{self.department.name} - {self.permission_group.name}"
 
 
+class EmployeeEffectivePermission(models.Model):
+    """
+    Zdenormalizowane efektywne uprawnienia pracownika.
+    Tabela jest utrzymywana przyrostowo (core/effective_permissions.py)
+    i służy do raportów audytowych oraz zapytań "kto ma uprawnienie X".
+    """
+    SOURCE_CHOICES = [
+        ('position', 'Stanowisko'),
+        ('department', 'Dział'),
+        ('direct', 'Przypisanie bezpośrednie'),
+    ]
+
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='effective_permissions',
+        verbose_name="Pracownik"
+    )
+    permission = models.ForeignKey(
+        Permission,
+        on_delete=models.CASCADE,
+        related_name='effective_assignments',
+        verbose_name="Uprawnienie"
+    )
+    source = models.CharField(
+        max_length=20,
+        choices=SOURCE_CHOICES,
+        verbose_name="Źródło"
+    )
+
+    class Meta:
+        verbose_name = "Efektywne uprawnienie pracownika"
+        verbose_name_plural = "Efektywne uprawnienia pracowników"
+        unique_together = ['employee', 'permission', 'source']
+        indexes = [
+            models.Index(fields=['permission', 'employee']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.permission} ({self.get_source_display()})"
+
+
 # ============== DZIENNIK ZDARZEŃ ==============
 
 class ActivityLog(models.Model):
@@ -422,9 +479,14 @@ class ActivityLog(models.Model):
         verbose_name="User Agent"
     )
     created_at = models.DateTimeField(
-        auto_now_add=True,
-        verbose_name="Data zdarzenia"
+        default=timezone.now,
+        editable=False,
+        verbose_name="Data zdarzenia",
+        help_text="Czas wystąpienia zdarzenia (nie zapisu - wpisy zapisywane są zbiorczo)"
     )
+    # Łańcuch skrótów (core/log_chain.py) - skrót poprzedniego wpisu i bieżącego
+    prev_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Skrót poprzedniego wpisu")
+    entry_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Skrót wpisu")
 
     class Meta:
         verbose_name = "Zdarzenie"
@@ -435,8 +497,12 @@ class ActivityLog(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['category', '-created_at']),
             models.Index(fields=['action', '-created_at']),
+            models.Index(fields=['category', 'action', '-created_at']),
         ]
 
+    # Wpisy przeniesione do archiwum (core/log_archive.py) mają is_archived = True
+    is_archived = False
+
     def __str__(self):
         user_str = self.user.username if self.user else "System"
         return f"[{self.created_at.strftime('%Y-%m-%d %H:%M')}] {user_str}: {self.get_action_display()} - {self.object_repr}"
@@ -446,6 +512,8 @@ class ActivityLog(models.Model):
             object_id=None, details=None, request=None):
         """
         Metoda pomocnicza do tworzenia wpisów w dzienniku zdarzeń.
+        Wpis zapisywany jest zbiorczo (core/log_writer.py) - zwracany obiekt
+        może jeszcze nie mieć klucza głównego.
         
         Args:
             user: Użytkownik wykonujący akcję
@@ -471,7 +539,7 @@ class ActivityLog(models.Model):
             
             user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
         
-        return cls.objects.create(
+        return log_writer.enqueue(cls(
             user=user,
             action=action,
             category=category,
@@ -482,4 +550,155 @@ class ActivityLog(models.Model):
             details=details,
             ip_address=ip_address,
             user_agent=user_agent
-        )
+        ))
+
+
+class TimelineEvent(models.Model):
+    """
+    Zdarzenie wspólnej osi czasu - kopia wpisu z dziennika zdarzeń lub
+    dziennika modułu (dokumenty, aktywa, SoA, incydenty), zapisywana razem
+    z wpisem źródłowym (core/timeline.py).
+    """
+    SOURCE_CHOICES = [
+        ('activity', 'Dziennik zdarzeń'),
+        ('document', 'Dokumenty'),
+        ('asset', 'Aktywa'),
+        ('soa', 'Deklaracja stosowania'),
+        ('incident', 'Incydenty'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, verbose_name="Źródło")
+    source_id = models.PositiveBigIntegerField(verbose_name="ID wpisu źródłowego")
+    created_at = models.DateTimeField(verbose_name="Data zdarzenia")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Użytkownik"
+    )
+    action = models.CharField(max_length=30, verbose_name="Akcja")
+    action_display = models.CharField(max_length=100, verbose_name="Akcja (opis)")
+    object_type = models.CharField(max_length=100, verbose_name="Typ obiektu")
+    object_id = models.PositiveIntegerField(null=True, blank=True, verbose_name="ID obiektu")
+    object_repr = models.CharField(max_length=255, verbose_name="Reprezentacja obiektu")
+    description = models.TextField(blank=True, verbose_name="Opis zdarzenia")
+
+    class Meta:
+        verbose_name = "Zdarzenie osi czasu"
+        verbose_name_plural = "Oś czasu"
+        ordering = ['-created_at', '-id']
+        unique_together = ['source', 'source_id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['object_type', 'object_id', '-created_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"[{self.created_at:%Y-%m-%d %H:%M}] {self.action_display} - {self.object_repr}"
+
+
+class ActivityDailyRollup(models.Model):
+    """
+    Dzienna liczba zdarzeń dziennika dla (dzień, kategoria, akcja, użytkownik),
+    aktualizowana przy zapisie wpisów (core/activity_stats.py). Każdy klucz ma
+    jeden wiersz - wiersze usuwanego użytkownika są dołączane do wierszy bez
+    użytkownika (core/signals.py).
+    """
+    day = models.DateField(verbose_name="Dzień")
+    category = models.CharField(max_length=20, choices=ActivityLog.CATEGORY_CHOICES, verbose_name="Kategoria")
+    action = models.CharField(max_length=20, choices=ActivityLog.ACTION_CHOICES, verbose_name="Akcja")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Użytkownik"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Liczba zdarzeń")
+
+    class Meta:
+        verbose_name = "Dzienna statystyka zdarzeń"
+        verbose_name_plural = "Dzienne statystyki zdarzeń"
+        indexes = [
+            models.Index(fields=['day', 'category', 'action']),
+            models.Index(fields=['user', 'day']),
+        ]
+        # Osobny warunek dla user=NULL - w SQL wartości NULL nie są sobie równe
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'category', 'action', 'user'],
+                condition=models.Q(user__isnull=False),
+                name='unique_activity_rollup_user',
+            ),
+            models.UniqueConstraint(
+                fields=['day', 'category', 'action'],
+                condition=models.Q(user__isnull=True),
+                name='unique_activity_rollup_no_user',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.category}/{self.action} - {self.count}"
+
+
+class ActivityLogParticipant(models.Model):
+    """
+    Użytkownik występujący w dzienniku zdarzeń - liczba wpisów oraz pierwsza
+    i ostatnia aktywność, aktualizowane przy zapisie wpisów (core/activity_stats.py)
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name="Użytkownik"
+    )
+    first_activity_at = models.DateTimeField(verbose_name="Pierwsza aktywność")
+    last_activity_at = models.DateTimeField(verbose_name="Ostatnia aktywność")
+    entry_count = models.PositiveIntegerField(default=0, verbose_name="Liczba wpisów")
+
+    class Meta:
+        verbose_name = "Uczestnik dziennika zdarzeń"
+        verbose_name_plural = "Uczestnicy dziennika zdarzeń"
+
+    def __str__(self):
+        return f"{self.user} ({self.entry_count})"
+
+
+class ActivityLogChainHead(models.Model):
+    """
+    Koniec łańcucha skrótów dziennika zdarzeń (jeden wiersz) - ostatni wpis
+    i jego skrót, aktualizowane w transakcji zapisu wpisów (core/log_chain.py)
+    """
+    last_id = models.PositiveBigIntegerField(default=0, verbose_name="ID ostatniego wpisu")
+    last_hash = models.CharField(max_length=64, verbose_name="Skrót ostatniego wpisu")
+    rows_since_checkpoint = models.PositiveIntegerField(default=0, verbose_name="Wpisy od punktu kontrolnego")
+
+    class Meta:
+        verbose_name = "Koniec łańcucha dziennika"
+        verbose_name_plural = "Koniec łańcucha dziennika"
+
+    def __str__(self):
+        return f"#{self.last_id}: {self.last_hash[:12]}"
+
+
+class ActivityLogCheckpoint(models.Model):
+    """Podpisany (HMAC) punkt kontrolny łańcucha skrótów dziennika zdarzeń"""
+    last_id = models.PositiveBigIntegerField(unique=True, verbose_name="ID ostatniego wpisu")
+    entry_hash = models.CharField(max_length=64, verbose_name="Skrót ostatniego wpisu")
+    rows = models.PositiveIntegerField(verbose_name="Wpisy od poprzedniego punktu")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Data utworzenia")
+    signature = models.CharField(max_length=64, verbose_name="Podpis")
+    verified_at = models.DateTimeField(null=True, blank=True, verbose_name="Data weryfikacji")
+
+    class Meta:
+        verbose_name = "Punkt kontrolny dziennika"
+        verbose_name_plural = "Punkty kontrolne dziennika"
+        ordering = ['last_id']
+
+    def __str__(self):
+        return f"#{self.last_id}: {self.entry_hash[:12]}"
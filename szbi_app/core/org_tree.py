@@ -0,0 +1,68 @@
+"""
+Budowanie drzewa struktury organizacyjnej.
+
+Wszystkie działy, stanowiska i przypisania grup uprawnień organizacji
+pobierane są stałą liczbą zapytań (4), a hierarchia o dowolnej głębokości
+składana jest w pamięci. Węzły to instancje modeli z dodatkowymi atrybutami:
+
+- Department: tree_children, tree_positions, tree_groups, tree_depth
+- Position: tree_groups
+"""
+from collections import defaultdict
+
+from .models import Department, Position, PositionPermission, DepartmentPermission
+
+
+def build_organization_tree(organization):
+    """Zwraca listę działów najwyższego poziomu z podpiętymi poddrzewami"""
+    departments = list(Department.objects.filter(organization=organization))
+    positions = Position.objects.filter(organization=organization, department__isnull=False)
+    department_groups = DepartmentPermission.objects.filter(
+        department__organization=organization
+    ).select_related('permission_group').order_by('permission_group__name')
+    position_groups = PositionPermission.objects.filter(
+        position__organization=organization
+    ).select_related('permission_group').order_by('permission_group__name')
+
+    groups_by_department = defaultdict(list)
+    for assignment in department_groups:
+        groups_by_department[assignment.department_id].append(assignment.permission_group)
+
+    groups_by_position = defaultdict(list)
+    for assignment in position_groups:
+        groups_by_position[assignment.position_id].append(assignment.permission_group)
+
+    positions_by_department = defaultdict(list)
+    for position in positions:
+        position.tree_groups = groups_by_position[position.pk]
+        positions_by_department[position.department_id].append(position)
+
+    by_id = {dept.pk: dept for dept in departments}
+    children = defaultdict(list)
+    roots = []
+    for dept in departments:
+        dept.tree_groups = groups_by_department[dept.pk]
+        dept.tree_positions = positions_by_department[dept.pk]
+        if dept.parent_id in by_id:
+            children[dept.parent_id].append(dept)
+        else:
+            roots.append(dept)
+
+    # Przypisanie dzieci i głębokości (iteracyjnie - bez limitu rekurencji)
+    visited = set()
+    stack = [(dept, 0) for dept in reversed(roots)]
+    while stack:
+        dept, depth = stack.pop()
+        visited.add(dept.pk)
+        dept.tree_depth = depth
+        dept.tree_children = children[dept.pk]
+        stack.extend((child, depth + 1) for child in reversed(dept.tree_children))
+
+    # Działy w cyklu (np. A -> B -> A) nie są osiągalne z korzenia - pokaż je na najwyższym poziomie
+    for dept in departments:
+        if dept.pk not in visited:
+            dept.tree_depth = 0
+            dept.tree_children = []
+            roots.append(dept)
+
+    return roots
@@ -0,0 +1,209 @@
+"""
+Binarny indeks listy słabych haseł (CERT PL) mapowany do pamięci.
+
+Zamiast wczytywać ~1 mln haseł do zbioru w każdym procesie, walidator
+(core/validators.py) otwiera przez mmap plik indeksu zbudowany komendą
+build_password_index. Strony pliku współdzielone są przez pamięć podręczną
+systemu między wszystkimi procesami serwera, a otwarcie indeksu nie wymaga
+odczytu listy.
+
+Format pliku (liczby little-endian):
+- nagłówek: MAGIC, liczba wpisów, długość skrótu, liczba bitów kubełka,
+  rozmiar filtra Blooma w bitach (0 - brak filtra), liczba funkcji filtra,
+- tablica kubełków: 2**BUCKET_BITS + 1 indeksów pierwszego wpisu kubełka
+  (wg pierwszych bitów skrótu),
+- posortowane, unikalne skróty BLAKE2b (DIGEST_SIZE bajtów) haseł
+  zapisanych małymi literami,
+- opcjonalnie filtr Blooma zbudowany z tych samych skrótów.
+
+Wyszukiwanie ogranicza się do skrótów jednego kubełka. 128-bitowy
+skrót nie daje praktycznie fałszywych trafień - wynik jest dokładny.
+
+Filtr Blooma (kilka MB dla ~1 mln haseł przy 0,1% fałszywych trafień)
+kopiowany jest do pamięci procesu. Hasła spoza listy odrzucane są zwykle
+już po 1-2 sprawdzonych bitach filtra, bez odczytu tablicy skrótów;
+trafienie filtra jest weryfikowane w tablicy.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+
+MAGIC = b'SZBIPWI2'
+HEADER = struct.Struct('<8sQIIQI')
+DIGEST_SIZE = 16
+BUCKET_BITS = 16
+BUCKET = struct.Struct('<I')
+BLOOM_FP_RATE = 0.001
+
+logger = logging.getLogger(__name__)
+
+_open_indexes = {}
+
+
+def normalize(password):
+    return password.lower()
+
+
+def default_index_path(wordlist_path):
+    """Indeks obok listy haseł: wordlist_pl.txt -> wordlist_pl.idx"""
+    return os.path.splitext(wordlist_path)[0] + '.idx'
+
+
+def digest(password):
+    """Skrót hasła (po normalizacji) zapisywany w indeksie"""
+    return hashlib.blake2b(normalize(password).encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+def bloom_positions(value, bits, hashes):
+    """Bity filtra dla skrótu - podwójne haszowanie połówkami skrótu (Kirsch-Mitzenmacher)"""
+    h1 = int.from_bytes(value[:8], 'little')
+    h2 = int.from_bytes(value[8:], 'little') | 1
+    return ((h1 + i * h2) % bits for i in range(hashes))
+
+
+def bloom_size(count, fp_rate):
+    """Optymalny rozmiar filtra (bity, liczba funkcji) dla count elementów"""
+    if not count or not fp_rate:
+        return 0, 0
+    bits = math.ceil(-count * math.log(fp_rate) / math.log(2) ** 2)
+    bits = (bits + 7) // 8 * 8
+    return bits, max(1, round(bits / count * math.log(2)))
+
+
+def iter_wordlist(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word = normalize(line.strip())
+            if word:
+                yield word
+
+
+# ============== BUDOWANIE ==============
+
+def build_index(wordlist_path, index_path, bloom_fp_rate=BLOOM_FP_RATE):
+    """
+    Buduje indeks z listy haseł (jedno hasło w wierszu), z filtrem Blooma
+    o zadanym odsetku fałszywych trafień (0 - bez filtra). Plik zapisywany
+    jest obok docelowego i podmieniany atomowo - procesy korzystające ze
+    starego indeksu zachowują otwarte mapowanie. Zwraca liczbę wpisów.
+    """
+    digests = sorted({digest(word) for word in iter_wordlist(wordlist_path)})
+    shift = DIGEST_SIZE * 8 - BUCKET_BITS
+    buckets = [0] * (2 ** BUCKET_BITS + 1)
+    for value in digests:
+        buckets[(int.from_bytes(value, 'big') >> shift) + 1] += 1
+    for i in range(1, len(buckets)):
+        buckets[i] += buckets[i - 1]
+
+    bloom_bits, bloom_hashes = bloom_size(len(digests), bloom_fp_rate)
+    bloom = bytearray(bloom_bits // 8)
+    for value in digests:
+        for position in bloom_positions(value, bloom_bits, bloom_hashes):
+            bloom[position >> 3] |= 1 << (position & 7)
+
+    directory = os.path.dirname(os.path.abspath(index_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.password-index-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(digests), DIGEST_SIZE, BUCKET_BITS, bloom_bits, bloom_hashes))
+            f.write(struct.pack(f'<{len(buckets)}I', *buckets))
+            f.write(b''.join(digests))
+            f.write(bloom)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return len(digests)
+
+
+# ============== ODCZYT ==============
+
+class WeakPasswordIndex:
+    """
+    Indeks haseł otwarty przez mmap (tylko do odczytu). Przy use_bloom=False
+    filtr Blooma nie jest wczytywany - każde sprawdzenie odczytuje tablicę.
+    """
+
+    def __init__(self, path, use_bloom=True):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size or self.data[:len(MAGIC)] != MAGIC:
+            self.data.close()
+            raise ValueError(f'Nieobsługiwany format indeksu haseł (przebuduj build_password_index): {path}')
+        _, count, digest_size, bucket_bits, bloom_bits, bloom_hashes = HEADER.unpack_from(self.data)
+        self.buckets_offset = HEADER.size
+        digests_offset = self.buckets_offset + (2 ** BUCKET_BITS + 1) * BUCKET.size
+        bloom_offset = digests_offset + count * DIGEST_SIZE
+        if (digest_size != DIGEST_SIZE or bucket_bits != BUCKET_BITS
+                or len(self.data) != bloom_offset + bloom_bits // 8):
+            self.data.close()
+            raise ValueError(f'Uszkodzony indeks haseł: {path}')
+        self.digests_offset = digests_offset
+        self.count = count
+        self.bloom = self.data[bloom_offset:] if use_bloom and bloom_bits else None
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, password):
+        value = digest(password)
+        if self.bloom is not None and not self._bloom_contains(value):
+            return False
+        return self._digests_contain(value)
+
+    def _bloom_contains(self, value):
+        # Jak bloom_positions, bez generatora - zwykle kończy się na 1-2 bitach
+        bloom, bits = self.bloom, self.bloom_bits
+        position = int.from_bytes(value[:8], 'little')
+        step = int.from_bytes(value[8:], 'little') | 1
+        for _ in range(self.bloom_hashes):
+            bit = position % bits
+            if not bloom[bit >> 3] >> (bit & 7) & 1:
+                return False
+            position += step
+        return True
+
+    def _digests_contain(self, value):
+        bucket = int.from_bytes(value, 'big') >> (DIGEST_SIZE * 8 - BUCKET_BITS)
+        lo, = BUCKET.unpack_from(self.data, self.buckets_offset + bucket * BUCKET.size)
+        hi, = BUCKET.unpack_from(self.data, self.buckets_offset + (bucket + 1) * BUCKET.size)
+        # Kubełek ma średnio kilkanaście skrótów - wyszukanie w jego bajtach
+        # jest szybsze niż wyszukiwanie binarne wywołujące kod Pythona
+        start = self.digests_offset
+        found = self.data.find(value, start + lo * DIGEST_SIZE, start + hi * DIGEST_SIZE)
+        while found != -1 and (found - start) % DIGEST_SIZE:
+            found = self.data.find(value, found + 1, start + hi * DIGEST_SIZE)
+        return found != -1
+
+
+def open_index(path):
+    """
+    Indeks z pamięci procesu lub otwarty z pliku (None, gdy plik nie
+    istnieje albo ma nieobsługiwany format lub jest uszkodzony - walidator
+    używa wtedy listy haseł). Po przebudowie indeksu (nowy plik) otwierany
+    jest ponownie.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns)
+    cached = _open_indexes.get(path)
+    if cached is None or cached[0] != key:
+        try:
+            index = WeakPasswordIndex(path)
+        except ValueError as error:
+            # Zapamiętywane dla tego pliku - błąd zgłaszany raz, do przebudowy indeksu
+            logger.error('%s - sprawdzanie haseł według listy słów', error)
+            index = None
+        cached = _open_indexes[path] = (key, index)
+    return cached[1]
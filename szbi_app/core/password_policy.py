@@ -0,0 +1,183 @@
+"""
+Złożona polityka haseł - jeden walidator zamiast łańcucha walidatorów
+z core/validators.py i UserAttributeSimilarityValidator.
+
+PasswordPolicyValidator tworzony jest raz na proces (Django przechowuje
+instancje walidatorów z AUTH_PASSWORD_VALIDATORS) i przy tworzeniu buduje
+automat Aho-Corasick ze wszystkich zabronionych fragmentów: przewidywalnych
+członów i sekwencji klawiaturowych. Sprawdzenie hasła to jedna zamiana na
+małe litery i jedno przejście automatu po haśle, zamiast osobnego
+wyszukiwania każdego fragmentu. Dane użytkownika są inne dla każdego hasła,
+więc sprawdzane są bezpośrednio (kilka podciągów) w tym samym tekście.
+
+Podobieństwo do danych użytkownika (UserAttributeSimilarityValidator)
+liczone jest z liczności znaków hasła wyznaczonych raz - zamiast budowania
+SequenceMatcher dla każdej części każdego atrybutu. Najdroższa reguła
+łańcucha walidatorów (import wielu użytkowników).
+
+Wynik jest taki sam jak łańcucha walidatorów: reguły sprawdzane są w tej
+samej kolejności, a każda zgłasza własny błąd (komunikat i kod), więc
+formularze nadal pokazują wszystkie powody odrzucenia hasła.
+"""
+import re
+from collections import Counter, deque
+
+from django.contrib.auth.password_validation import (
+    UserAttributeSimilarityValidator, exceeds_maximum_length_ratio,
+)
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+
+from .validators import (
+    KEYBOARD_PATTERNS, CERTBreachedPasswordValidator, CERTMaximumLengthValidator,
+    CERTMinimumLengthValidator, CERTNoSequentialValidator, CERTPolishWeakPasswordValidator,
+    CERTPredictablePatternValidator,
+)
+
+
+class AhoCorasick:
+    """
+    Automat Aho-Corasick dla listy wzorców. Przejścia z funkcją porażki
+    rozwinięte są do pełnej tabeli (znak spoza tabeli stanu - powrót do
+    korzenia), więc przejście po tekście to jedno słownikowe odwołanie na znak.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]
+        outputs = [set()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append(set())
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].add(index)
+
+        # Stany w kolejności BFS - stan porażki jest zawsze płytszy od stanu
+        self.delta = [None] * len(goto)
+        self.delta[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self.delta[state] = {**self.delta[fail[state]], **goto[state]}
+            outputs[state] |= outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = self.delta[fail[state]].get(char, 0)
+                queue.append(child)
+        self.outputs = [frozenset(output) for output in outputs]
+
+    def search(self, text):
+        """Indeksy wzorców występujących w tekście"""
+        found = set()
+        delta, outputs = self.delta, self.outputs
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+class SimilarityRule(UserAttributeSimilarityValidator):
+    """
+    UserAttributeSimilarityValidator z wynikiem SequenceMatcher.quick_ratio
+    liczonym z liczności znaków hasła (wspólnych dla wszystkich atrybutów).
+    """
+
+    def check(self, password_lower, password_counts, user=None):
+        if not user:
+            return
+        for attribute_name in self.user_attributes:
+            value = getattr(user, attribute_name, None)
+            if not value or not isinstance(value, str):
+                continue
+            value_lower = value.lower()
+            for value_part in re.split(r'\W+', value_lower) + [value_lower]:
+                if exceeds_maximum_length_ratio(password_lower, self.max_similarity, value_part):
+                    continue
+                length = len(password_lower) + len(value_part)
+                # Górne ograniczenie quick_ratio (real_quick_ratio) - zwykle wystarcza,
+                # bo części atrybutów są dużo krótsze od hasła
+                if length and 2.0 * min(len(password_lower), len(value_part)) / length < self.max_similarity:
+                    continue
+                matches = sum(min(count, password_counts[char]) for char, count in Counter(value_part).items())
+                # quick_ratio: 2 * liczba wspólnych znaków / łączna długość
+                if (2.0 * matches / length if length else 1.0) >= self.max_similarity:
+                    try:
+                        verbose_name = str(user._meta.get_field(attribute_name).verbose_name)
+                    except FieldDoesNotExist:
+                        verbose_name = attribute_name
+                    raise ValidationError(
+                        self.get_error_message(),
+                        code='password_too_similar',
+                        params={'verbose_name': verbose_name},
+                    )
+
+
+class PasswordPolicyValidator:
+    """
+    Walidator całej polityki haseł CERT PL (zamiast sześciu walidatorów
+    w AUTH_PASSWORD_VALIDATORS). Opcje jak w walidatorach składowych.
+    """
+
+    def __init__(self, min_length=14, max_length=128, wordlist_path=None, breached_corpus_dir=None,
+                 breached_min_count=None, predictable_words=None, user_attributes=None,
+                 max_similarity=0.7):
+        self.min_length = CERTMinimumLengthValidator(min_length)
+        self.max_length = CERTMaximumLengthValidator(max_length)
+        self.weak_list = CERTPolishWeakPasswordValidator(wordlist_path)
+        self.breached = CERTBreachedPasswordValidator(breached_corpus_dir, breached_min_count)
+        self.predictable = CERTPredictablePatternValidator(predictable_words)
+        self.sequential = CERTNoSequentialValidator()
+        similarity_options = {'max_similarity': max_similarity}
+        if user_attributes is not None:
+            similarity_options['user_attributes'] = user_attributes
+        self.similarity = SimilarityRule(**similarity_options)
+
+        words = [word.lower() for word in self.predictable.checked_words]
+        self.automaton = AhoCorasick(words + KEYBOARD_PATTERNS)
+        self.word_count = len(words)
+
+    def find_fragments(self, password_lower):
+        """Jak CERTPredictablePatternValidator.find_fragments - jednym przejściem automatu"""
+        found = self.automaton.search(password_lower)
+        if not found:
+            return None, False
+        first = min(found)
+        word = self.predictable.checked_words[first] if first < self.word_count else None
+        return word, max(found) >= self.word_count
+
+    def get_errors(self, password, user=None):
+        """Lista błędów wszystkich niespełnionych reguł (pusta - hasło poprawne)"""
+        password_lower = password.lower()
+        word, keyboard = self.find_fragments(password_lower)
+        rules = [
+            (self.min_length.validate, (password,)),
+            (self.max_length.validate, (password,)),
+            (self.weak_list.validate, (password,)),
+            (self.breached.validate, (password,)),
+            (self.predictable.check, (password, password_lower, word, keyboard, user)),
+            (self.sequential.validate, (password,)),
+            (self.similarity.check, (password_lower, Counter(password_lower), user)),
+        ]
+        errors = []
+        for rule, args in rules:
+            try:
+                rule(*args)
+            except ValidationError as error:
+                errors.append(error)
+        return errors
+
+    def validate(self, password, user=None):
+        errors = self.get_errors(password, user)
+        if errors:
+            raise ValidationError(errors)
+
+    def get_help_text(self):
+        return ' '.join(str(validator.get_help_text()) for validator in (
+            self.min_length, self.max_length, self.weak_list, self.breached,
+            self.predictable, self.sequential, self.similarity,
+        ))
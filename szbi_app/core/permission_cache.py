@@ -0,0 +1,99 @@
+"""
+Cache skompilowanych uprawnień pracowników.
+
+Zbiór nazw uprawnień pracownika jest wyliczany raz i przechowywany
+we frameworku cache Django. Klucze są wersjonowane:
+
+- wpis pracownika - usuwany przy każdej zmianie jego uprawnień (stanowiska,
+  dział, bezpośrednio przypisane grupy, skład grup i ich przypisania do
+  stanowisk i działów - wpisy wszystkich dotkniętych pracowników),
+- wersja globalna - podbijana tylko przy zmianie nazwy, kategorii lub
+  usunięciu uprawnienia (nazwy są zapisane w każdym wpisie).
+
+Unieważnianie realizują sygnały z core/signals.py, po zatwierdzeniu
+transakcji. Przy domyślnym LocMemCache cache jest osobny dla każdego
+procesu - zob. komentarz do CACHES w ustawieniach.
+"""
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .permissions import PermissionSet, PERMISSION_REGISTRY_FINGERPRINT
+
+
+PERMISSION_CACHE_PREFIX = 'szbi:perms'
+PERMISSION_CACHE_VERSION_KEY = f'{PERMISSION_CACHE_PREFIX}:version'
+# Format zapisywanych wartości - zmiana CompiledPermissions wymaga nowego numeru
+PERMISSION_CACHE_FORMAT = 2
+
+
+class CompiledPermissions(NamedTuple):
+    """Skompilowane uprawnienia pracownika przechowywane w cache"""
+    names: PermissionSet  # zbiór nazw z maską bitową (w cache - maska i nazwy spoza rejestru)
+    categories: frozenset
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = tuple(rows)
+        return cls(
+            names=PermissionSet(name for _, name, _ in rows),
+            categories=frozenset(category for _, _, category in rows),
+        )
+
+
+def _get_timeout():
+    return getattr(settings, 'SZBI_PERMISSION_CACHE_TIMEOUT', 3600)
+
+
+def get_cache_version():
+    """Zwraca aktualną globalną wersję cache uprawnień"""
+    version = cache.get(PERMISSION_CACHE_VERSION_KEY)
+    if version is None:
+        # Wersja startowa oparta o czas - po utracie klucza nie wrócimy
+        # do numeru, pod którym mogą jeszcze leżeć nieaktualne wpisy
+        cache.add(PERMISSION_CACHE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(PERMISSION_CACHE_VERSION_KEY)
+    return version
+
+
+def _employee_key(employee_id, version=None):
+    if version is None:
+        version = get_cache_version()
+    return (f'{PERMISSION_CACHE_PREFIX}:{PERMISSION_REGISTRY_FINGERPRINT}:f{PERMISSION_CACHE_FORMAT}'
+            f':v{version}:employee:{employee_id}')
+
+
+def get_compiled_permissions(employee):
+    """Zwraca CompiledPermissions pracownika (z cache lub wyliczone jednym zapytaniem)"""
+    key = _employee_key(employee.pk)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = CompiledPermissions.from_rows(employee.get_permission_rows())
+        cache.set(key, compiled, _get_timeout())
+    return compiled
+
+
+def get_permission_names(employee):
+    """Zwraca PermissionSet (frozenset nazw z maską bitową) pracownika"""
+    return get_compiled_permissions(employee).names
+
+
+def invalidate_employee(employee_id):
+    """Unieważnia cache uprawnień jednego pracownika"""
+    cache.delete(_employee_key(employee_id))
+
+
+def invalidate_employees(employee_ids):
+    """Unieważnia cache uprawnień wskazanych pracowników"""
+    version = get_cache_version()
+    cache.delete_many([_employee_key(pk, version) for pk in employee_ids])
+
+
+def invalidate_all():
+    """Unieważnia cache uprawnień wszystkich pracowników (podbicie wersji)"""
+    try:
+        cache.incr(PERMISSION_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(PERMISSION_CACHE_VERSION_KEY, time.time_ns(), None)
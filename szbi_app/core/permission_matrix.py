@@ -0,0 +1,86 @@
+"""
+Macierz uprawnień: wszyscy pracownicy x wszystkie uprawnienia.
+
+Macierz budowana jest stałą liczbą zapytań (pracownicy, uprawnienia,
+efektywne uprawnienia z tabeli EmployeeEffectivePermission) i przechowywana
+zwięźle - uprawnienia każdego pracownika to jedna liczba całkowita (bitset),
+w której bit i oznacza i-tą kolumnę (uprawnienie).
+"""
+from .models import Employee, Permission, EmployeeEffectivePermission
+
+
+class PermissionMatrix:
+    """Macierz pracownik x uprawnienie z wierszami zapisanymi jako bitsety"""
+
+    def __init__(self, employees, permissions, bitsets):
+        self.employees = employees        # lista słowników (id, imię, nazwisko, login, dział)
+        self.permissions = permissions    # lista słowników (id, nazwa, kategoria)
+        self.bitsets = bitsets            # lista int - wiersz macierzy dla każdego pracownika
+
+    @classmethod
+    def build(cls, organization=None):
+        """Buduje macierz trzema zapytaniami"""
+        employees = Employee.objects.order_by('last_name', 'first_name', 'pk')
+        if organization is not None:
+            employees = employees.filter(organization=organization)
+        employees = list(employees.values(
+            'id', 'first_name', 'last_name', 'user__username', 'department__name', 'is_active'
+        ))
+        permissions = list(Permission.objects.order_by('category', 'name').values('id', 'name', 'category'))
+
+        row_index = {e['id']: i for i, e in enumerate(employees)}
+        column_bit = {p['id']: 1 << i for i, p in enumerate(permissions)}
+        bitsets = [0] * len(employees)
+
+        effective = EmployeeEffectivePermission.objects.values_list('employee_id', 'permission_id').distinct()
+        if organization is not None:
+            effective = effective.filter(employee__organization=organization)
+        for employee_id, permission_id in effective.iterator(chunk_size=5000):
+            row = row_index.get(employee_id)
+            if row is not None:
+                bitsets[row] |= column_bit[permission_id]
+
+        return cls(employees, permissions, bitsets)
+
+    def __len__(self):
+        return len(self.employees)
+
+    def has(self, row, column):
+        """Czy pracownik z wiersza `row` ma uprawnienie z kolumny `column`"""
+        return bool(self.bitsets[row] >> column & 1)
+
+    def row_flags(self, row):
+        """Zwraca wiersz macierzy jako listę wartości logicznych"""
+        bits = self.bitsets[row]
+        return [bool(bits >> column & 1) for column in range(len(self.permissions))]
+
+    def column_counts(self):
+        """Liczba pracowników posiadających każde z uprawnień"""
+        counts = [0] * len(self.permissions)
+        for bits in self.bitsets:
+            column = 0
+            while bits:
+                if bits & 1:
+                    counts[column] += 1
+                bits >>= 1
+                column += 1
+        return counts
+
+    def iter_rows(self):
+        """Zwraca kolejno krotki (pracownik, lista flag)"""
+        for row, employee in enumerate(self.employees):
+            yield employee, self.row_flags(row)
+
+    def header(self):
+        """Nagłówek eksportu"""
+        return ['Nazwisko', 'Imię', 'Login', 'Dział'] + [p['name'] for p in self.permissions]
+
+    def iter_export_rows(self, true_value='X', false_value=''):
+        """Zwraca wiersze eksportu (bez nagłówka)"""
+        for employee, flags in self.iter_rows():
+            yield [
+                employee['last_name'],
+                employee['first_name'],
+                employee['user__username'],
+                employee['department__name'] or '',
+            ] + [true_value if flag else false_value for flag in flags]
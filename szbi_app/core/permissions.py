@@ -2,6 +2,8 @@
 Predefiniowane uprawnienia w systemie SZBI.
 Te uprawnienia są ładowane do bazy danych przez migrację.
 """
+import hashlib
+from functools import lru_cache
 
 
 PERMISSIONS = [
@@ -138,3 +140,94 @@ def get_permissions_by_category():
             }
         grouped[cat]['permissions'].append(perm)
     return grouped
+
+
+# ============== REJESTR BITÓW UPRAWNIEŃ ==============
+# Każde predefiniowane uprawnienie ma stałą pozycję bitu (indeks na liście
+# PERMISSIONS), dzięki czemu uprawnienia użytkownika można zapisać jako jedną
+# liczbę całkowitą, a sprawdzenie listy uprawnień to jedna operacja AND.
+# Zmiana kolejności listy zmienia odcisk rejestru, co unieważnia maski
+# zapisane wcześniej w cache.
+
+PERMISSION_BITS = {perm['name']: index for index, perm in enumerate(PERMISSIONS)}
+PERMISSION_NAMES = tuple(PERMISSION_BITS)  # nazwa dla pozycji bitu
+
+PERMISSION_REGISTRY_FINGERPRINT = hashlib.sha1(
+    '\n'.join(PERMISSION_BITS).encode('utf-8')
+).hexdigest()[:8]
+
+
+def names_to_mask(permission_names):
+    """Zwraca maskę bitową dla nazw uprawnień (nazwy spoza rejestru są pomijane)"""
+    mask = 0
+    for name in permission_names:
+        bit = PERMISSION_BITS.get(name)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def mask_to_names(mask):
+    """Nazwy uprawnień z rejestru zapisanych w masce"""
+    return [name for bit, name in enumerate(PERMISSION_NAMES) if mask >> bit & 1]
+
+
+@lru_cache(maxsize=512)
+def _required_mask(permission_names):
+    """Maska dla krotki wymaganych uprawnień lub None, gdy któreś jest spoza rejestru"""
+    if not all(name in PERMISSION_BITS for name in permission_names):
+        return None
+    return names_to_mask(permission_names)
+
+
+def required_mask(permission_names):
+    """Prekompilowana (cache'owana) maska dla listy wymaganych uprawnień"""
+    if isinstance(permission_names, str):
+        permission_names = (permission_names,)
+    return _required_mask(tuple(permission_names))
+
+
+class PermissionSet(frozenset):
+    """
+    Zbiór nazw uprawnień użytkownika wraz z maską bitową.
+    Sprawdzenia uprawnień z rejestru wykonywane są operacjami bitowymi,
+    pozostałe (np. uprawnienia dodane ręcznie w bazie) - na zbiorze nazw.
+    """
+
+    def __new__(cls, names=()):
+        instance = super().__new__(cls, names)
+        instance.mask = names_to_mask(instance)
+        return instance
+
+    @classmethod
+    def from_mask(cls, mask, extra_names=()):
+        """Odtwarza zbiór z maski i nazw spoza rejestru (bez wyliczania maski)"""
+        instance = frozenset.__new__(cls, (*mask_to_names(mask), *extra_names))
+        instance.mask = mask
+        return instance
+
+    def __reduce__(self):
+        # W cache zapisywana jest maska i tylko nazwy spoza rejestru
+        extra_names = tuple(name for name in self if name not in PERMISSION_BITS)
+        return (self.from_mask, (self.mask, extra_names))
+
+    def has(self, permission_name):
+        bit = PERMISSION_BITS.get(permission_name)
+        if bit is not None:
+            return bool(self.mask >> bit & 1)
+        return permission_name in self
+
+    def has_any(self, permission_names):
+        mask = required_mask(permission_names)
+        if mask is not None:
+            return bool(self.mask & mask)
+        return not self.isdisjoint(permission_names)
+
+    def has_all(self, permission_names):
+        mask = required_mask(permission_names)
+        if mask is not None:
+            return self.mask & mask == mask
+        return self.issuperset(permission_names)
+
+
+EMPTY_PERMISSION_SET = PermissionSet()
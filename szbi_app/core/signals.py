@@ -0,0 +1,192 @@
+"""
+Sygnały modułu core - utrzymanie pochodnych danych o uprawnieniach:
+- cache skompilowanych uprawnień (core/permission_cache.py),
+- tabeli EmployeeEffectivePermission (core/effective_permissions.py),
+oraz dziennych agregatów dziennika przy usuwaniu użytkownika (core/activity_stats.py).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    Department, Position, Employee, EmployeePermissionGroup,
+    Permission, PermissionGroup, PositionPermission, DepartmentPermission,
+)
+from . import activity_stats, effective_permissions, permission_cache
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_permission_refresh():
+    """
+    Odkłada odświeżanie danych pochodnych do końca bloku - zmiany wielu
+    przypisań (np. usunięcie kilku wierszy) dają jedno odświeżenie zamiast
+    jednego na każdy sygnał.
+    """
+    if getattr(_deferred, 'employee_ids', None) is not None:
+        yield  # zagnieżdżony blok - odświeży blok zewnętrzny
+        return
+    _deferred.employee_ids = set()
+    try:
+        yield
+        employee_ids = _deferred.employee_ids
+    finally:
+        _deferred.employee_ids = None
+    employees_permissions_changed(employee_ids)
+
+
+def employees_permissions_changed(employee_ids):
+    """Odświeża dane pochodne wskazanych pracowników"""
+    employee_ids = set(employee_ids)
+    if not employee_ids:
+        return
+    pending = getattr(_deferred, 'employee_ids', None)
+    if pending is not None:
+        pending.update(employee_ids)
+        return
+    effective_permissions.sync_employees(employee_ids)
+    # Po zatwierdzeniu - wcześniej równoległe żądanie mogłoby zapisać w cache
+    # uprawnienia sprzed zmiany na cały czas ważności wpisu
+    transaction.on_commit(lambda: permission_cache.invalidate_employees(employee_ids))
+
+
+# Przypisania grup: pole właściciela -> funkcja wyznaczająca pracowników
+ASSIGNMENT_OWNERS = {
+    PositionPermission: ('position_id', effective_permissions.employee_ids_for_positions),
+    DepartmentPermission: ('department_id', effective_permissions.employee_ids_for_departments),
+    EmployeePermissionGroup: ('employee_id', set),
+}
+
+
+@receiver(pre_save, sender=PositionPermission)
+@receiver(pre_save, sender=DepartmentPermission)
+@receiver(pre_save, sender=EmployeePermissionGroup)
+def assignment_saving(sender, instance, **kwargs):
+    """Zapamiętuje poprzedniego właściciela przypisania (edycja mogła go zmienić)"""
+    owner_field, _ = ASSIGNMENT_OWNERS[sender]
+    instance._szbi_previous_owner_id = None
+    if instance.pk:
+        instance._szbi_previous_owner_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list(owner_field, flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=PositionPermission)
+@receiver([post_save, post_delete], sender=DepartmentPermission)
+@receiver([post_save, post_delete], sender=EmployeePermissionGroup)
+def assignment_changed(sender, instance, **kwargs):
+    """Zmiana przypisania grupy do stanowiska, działu lub pracownika"""
+    owner_field, resolve_employees = ASSIGNMENT_OWNERS[sender]
+    owner_ids = {getattr(instance, owner_field)}
+    previous = getattr(instance, '_szbi_previous_owner_id', None)
+    if previous is not None:
+        owner_ids.add(previous)
+    employees_permissions_changed(resolve_employees(owner_ids))
+
+
+@receiver(m2m_changed, sender=PermissionGroup.permissions.through)
+def permission_group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Zmiana składu grupy uprawnień (group.permissions lub permission.groups)"""
+    if action == 'pre_clear' and reverse:
+        instance._szbi_cleared_ids = set(instance.groups.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        group_ids = {instance.pk}
+    elif action == 'post_clear':
+        group_ids = getattr(instance, '_szbi_cleared_ids', set())
+    else:
+        group_ids = pk_set
+    employees_permissions_changed(effective_permissions.employee_ids_for_groups(group_ids))
+
+
+@receiver(m2m_changed, sender=Employee.positions.through)
+def employee_positions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Zmiana stanowisk pracownika (employee.positions lub position.employees)"""
+    if action == 'pre_clear' and reverse:
+        instance._szbi_cleared_ids = set(instance.employees.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        employee_ids = {instance.pk}
+    elif action == 'post_clear':
+        employee_ids = getattr(instance, '_szbi_cleared_ids', set())
+    else:
+        employee_ids = pk_set
+    employees_permissions_changed(employee_ids)
+
+
+@receiver(pre_save, sender=Employee)
+def employee_saving(sender, instance, update_fields=None, **kwargs):
+    """Zapamiętuje poprzedni dział pracownika (tylko zmiana działu zmienia uprawnienia)"""
+    instance._szbi_previous_department_id = None
+    if update_fields is not None and 'department' not in update_fields and 'department_id' not in update_fields:
+        instance._szbi_previous_department_id = instance.department_id
+    elif instance.pk:
+        instance._szbi_previous_department_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('department_id', flat=True).first()
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, **kwargs):
+    """Nowy pracownik lub zmiana działu - odświeżenie uprawnień"""
+    if instance.department_id is None and created:
+        return  # bez działu nowy pracownik nie ma jeszcze żadnych uprawnień
+    if not created and instance.department_id == getattr(instance, '_szbi_previous_department_id', None):
+        return
+    employees_permissions_changed([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Permission)
+def permission_changed(sender, **kwargs):
+    """Zmiana nazwy/kategorii lub usunięcie uprawnienia - nazwy są w cache"""
+    transaction.on_commit(permission_cache.invalidate_all)
+
+
+@receiver(pre_delete, sender=PermissionGroup)
+def permission_group_deleting(sender, instance, **kwargs):
+    _deleting(effective_permissions.employee_ids_for_groups([instance.pk]))
+
+
+@receiver(pre_delete, sender=Position)
+def position_deleting(sender, instance, **kwargs):
+    """
+    Usunięcie stanowiska kasuje powiązania M2M bez sygnału m2m_changed,
+    dlatego pracowników trzeba wyznaczyć przed usunięciem.
+    """
+    _deleting(effective_permissions.employee_ids_for_positions([instance.pk]))
+
+
+@receiver(pre_delete, sender=Department)
+def department_deleting(sender, instance, **kwargs):
+    """Usunięcie działu zeruje dział pracowników (SET_NULL) bez sygnałów"""
+    _deleting(effective_permissions.employee_ids_for_departments([instance.pk]))
+
+
+def _deleting(employee_ids):
+    """
+    Pracownicy dotknięci usuwaniem - dane pochodne odświeżane po zatwierdzeniu
+    transakcji, gdy skutki kaskadowego usunięcia są już widoczne.
+    """
+    employee_ids = set(employee_ids)
+    if employee_ids:
+        transaction.on_commit(lambda: employees_permissions_changed(employee_ids))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    """
+    Usunięcie użytkownika zeruje użytkownika agregatów (SET_NULL) - jego
+    wiersze dołączane są wcześniej do wierszy bez użytkownika, by klucz
+    pozostał jednoznaczny.
+    """
+    activity_stats.fold_user_rollups(instance.pk)
@@ -1,3 +1,1595 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import pickle
+import re
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import Argon2PasswordHasher, identify_hasher
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.contrib.auth.password_validation import UserAttributeSimilarityValidator, validate_password
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+
+from . import (
+    activity_stats, breached_passwords, effective_permissions, hashers, log_archive, log_chain, log_search,
+    log_writer, password_index, permission_cache, related_objects, timeline,
+)
+from .activity_log import (
+    EXPORT_COLUMNS, decode_cursor, encode_cursor, filter_activity_logs, get_activity_log_filters,
+    get_archive_filter, paginate_keyset,
+)
+from dictionary.views import has_dictionary_permission
+
+from .assignments import ASSIGNMENT_MODELS, sync_permission_groups
+from .context_processors import szbi_permissions
+from .management.commands import benchmark_permissions
+from .middleware import SZBIPermissionsMiddleware
+from .mixins import (
+    PERM_ASSETS_ADMIN, PERM_ASSETS_OWNER, PERM_ASSETS_VIEW, PERM_DICTIONARY_MANAGE, SZBIAllPermissionsRequiredMixin,
+    SZBIPermissionRequiredMixin, szbi_permission_required, user_has_permission,
+)
+from .models import (
+    ActivityDailyRollup, ActivityLog, ActivityLogCheckpoint, ActivityLogParticipant, Department, DepartmentPermission,
+    Employee, EmployeeEffectivePermission, EmployeePermissionGroup, Organization, Permission, PermissionGroup,
+    Position, PositionPermission, TimelineEvent,
+)
+from .org_tree import build_organization_tree
+from .password_policy import AhoCorasick, PasswordPolicyValidator
+from .permission_matrix import PermissionMatrix
+from .permissions import EMPTY_PERMISSION_SET, PermissionSet, mask_to_names, names_to_mask
+from .related_objects import get_related_objects
+from .signals import ASSIGNMENT_OWNERS
+from .validators import (
+    CERTBreachedPasswordValidator, CERTMaximumLengthValidator, CERTMinimumLengthValidator,
+    CERTNoSequentialValidator, CERTPolishWeakPasswordValidator, CERTPredictablePatternValidator,
+)
+
+
+# Pełny odczyt tabeli w planie SQLite: "SCAN core_activitylog" bez "USING ... INDEX"
+FULL_SCAN = re.compile(r'SCAN core_activitylog\b(?! USING (COVERING )?INDEX)')
+# Odczyt całego indeksu - dopuszczalny tylko bez warunków (kolejność + LIMIT)
+INDEX_SCAN = re.compile(r'SCAN core_activitylog\b')
+
+# Filtry obsługiwane indeksami (wyszukiwanie tekstowe nie jest tu uwzględniane)
+INDEXED_FILTERS = {
+    'category': 'employee',
+    'action': 'update',
+    'user': None,  # identyfikator użytkownika testowego
+    'date_from': '2024-03-01',
+    'date_to': '2024-03-31',
+}
+
+
+class PermissionCacheTests(TestCase):
+    """Cache skompilowanych uprawnień unieważniany każdą ścieżką zmiany (core/signals.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Org')
+        self.department = Department.objects.create(organization=self.org, name='IT')
+        self.position = Position.objects.create(organization=self.org, name='Administrator')
+        self.permission, self.other_permission = Permission.objects.order_by('pk')[:2]
+        self.group = PermissionGroup.objects.create(name='Grupa')
+        self.group.permissions.add(self.permission)
+        self.employee = Employee.objects.create(
+            user=User.objects.create_user('pracownik'), organization=self.org,
+            first_name='Jan', last_name='Kowalski',
+        )
+
+    def names(self):
+        return set(Employee.objects.get(pk=self.employee.pk).get_permission_names())
+
+    def assertNames(self, expected):
+        # Odczyt przez cache - po sprawdzeniu wartość jest ponownie zapisana
+        self.assertEqual(self.names(), {permission.name for permission in expected})
+        with self.assertNumQueries(1):  # tylko pobranie pracownika
+            self.names()
+
+    def committed(self):
+        # Unieważnienie cache następuje dopiero po zatwierdzeniu transakcji
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def test_cached_value_is_reused(self):
+        with self.committed():
+            self.employee.positions.add(self.position)
+            PositionPermission.objects.create(position=self.position, permission_group=self.group)
+        self.assertNames([self.permission])
+        compiled = permission_cache.get_compiled_permissions(self.employee)
+        self.assertEqual(compiled.categories, {self.permission.category})
+
+    def test_invalidated_only_after_commit(self):
+        self.assertNames([])
+        with self.captureOnCommitCallbacks() as callbacks:
+            EmployeePermissionGroup.objects.create(employee=self.employee, permission_group=self.group)
+            # Odczyt przed zatwierdzeniem nie może zapisać w cache nowego stanu na stałe
+            self.assertEqual(self.names(), set())
+        for callback in callbacks:
+            callback()
+        self.assertNames([self.permission])
+
+    def test_position_paths(self):
+        self.assertNames([])
+        with self.committed():
+            assignment = PositionPermission.objects.create(position=self.position, permission_group=self.group)
+        self.assertNames([])
+        with self.committed():
+            self.employee.positions.add(self.position)
+        self.assertNames([self.permission])
+        with self.committed():
+            self.position.employees.remove(self.employee)
+        self.assertNames([])
+        with self.committed():
+            self.employee.positions.add(self.position)
+        self.assertNames([self.permission])
+        with self.committed():
+            self.position.employees.clear()
+        self.assertNames([])
+        with self.committed():
+            self.employee.positions.add(self.position)
+        self.assertNames([self.permission])
+        with self.committed():
+            assignment.delete()
+        self.assertNames([])
+
+    def test_department_paths(self):
+        with self.committed():
+            DepartmentPermission.objects.create(department=self.department, permission_group=self.group)
+        self.assertNames([])
+        self.employee.department = self.department
+        with self.committed():
+            self.employee.save()
+        self.assertNames([self.permission])
+        with self.committed():
+            self.department.delete()
+        self.assertNames([])
+
+    def test_direct_group_and_group_contents(self):
+        with self.committed():
+            assignment = EmployeePermissionGroup.objects.create(employee=self.employee, permission_group=self.group)
+        self.assertNames([self.permission])
+        with self.committed():
+            self.group.permissions.add(self.other_permission)
+        self.assertNames([self.permission, self.other_permission])
+        with self.committed():
+            self.other_permission.groups.remove(self.group)
+        self.assertNames([self.permission])
+        with self.committed():
+            self.permission.groups.clear()
+        self.assertNames([])
+        with self.committed():
+            self.group.permissions.set([self.other_permission])
+        self.assertNames([self.other_permission])
+        with self.committed():
+            self.group.permissions.clear()
+        self.assertNames([])
+        with self.committed():
+            self.group.permissions.add(self.permission)
+        self.assertNames([self.permission])
+        with self.committed():
+            assignment.delete()
+        self.assertNames([])
+
+    def test_permission_rename_and_deletes(self):
+        with self.committed():
+            EmployeePermissionGroup.objects.create(employee=self.employee, permission_group=self.group)
+        self.assertNames([self.permission])
+        self.permission.name = 'Nowa nazwa'
+        with self.committed():
+            self.permission.save()
+        self.assertNames([self.permission])
+        with self.committed():
+            self.group.delete()
+        self.assertNames([])
+        with self.committed():
+            PositionPermission.objects.create(
+                position=self.position, permission_group=PermissionGroup.objects.create(name='Druga'),
+            )
+            PermissionGroup.objects.get(name='Druga').permissions.add(self.other_permission)
+            self.employee.positions.add(self.position)
+        self.assertNames([self.other_permission])
+        with self.committed():
+            self.position.delete()
+        self.assertNames([])
+
+
+class PermissionQueryTests(TestCase):
+    """Uprawnienia pracownika jednym zapytaniem UNION - wynik jak w dawnych pętlach"""
+
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Org')
+        self.permissions = list(Permission.objects.order_by('pk'))
+
+    def assertMatchesLegacy(self, employee):
+        expected = {(p.pk, p.name, p.category) for p in benchmark_permissions.legacy_get_permissions(employee)}
+        with self.assertNumQueries(1):
+            rows = employee.get_permission_rows()
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(set(rows), expected)
+
+    def test_union_matches_legacy_loops(self):
+        command = benchmark_permissions.Command()
+        for count in (1, 5, 20):
+            with self.subTest(positions=count):
+                employee = command._build_employee(self.org, self.permissions, count)
+                self.assertMatchesLegacy(employee)
+
+    def test_employee_without_department(self):
+        employee = benchmark_permissions.Command()._build_employee(self.org, self.permissions, 3)
+        employee.department = None
+        employee.save()
+        self.assertMatchesLegacy(employee)
+        employee.positions.clear()
+        employee.permission_group_assignments.all().delete()
+        self.assertMatchesLegacy(employee)
+        self.assertEqual(employee.get_permission_rows(), [])
+
+    def test_dictionary_permission_uses_categories(self):
+        employee = Employee.objects.create(
+            user=User.objects.create_user('pracownik'), organization=self.org, first_name='Jan', last_name='K',
+        )
+        user = User.objects.select_related('employee').get(pk=employee.user_id)
+        with self.assertNumQueries(1):
+            self.assertFalse(has_dictionary_permission(user))
+        with self.captureOnCommitCallbacks(execute=True):
+            group = PermissionGroup.objects.create(name='Słownik')
+            group.permissions.add(Permission.objects.get(name=PERM_DICTIONARY_MANAGE))
+            EmployeePermissionGroup.objects.create(employee=employee, permission_group=group)
+        user = User.objects.select_related('employee').get(pk=employee.user_id)
+        with self.assertNumQueries(1):
+            self.assertTrue(has_dictionary_permission(user))
+
+
+class RequestPermissionTests(TestCase):
+    """request.szbi_permissions (SZBIPermissionsMiddleware) oraz mixiny i dekorator uprawnień"""
+
+    @classmethod
+    def setUpTestData(cls):
+        org = Organization.objects.create(name='Org')
+        group = PermissionGroup.objects.create(name='Aktywa')
+        group.permissions.add(*Permission.objects.filter(name__in=[PERM_ASSETS_VIEW, PERM_ASSETS_OWNER]))
+        cls.user = User.objects.create_user('pracownik')
+        employee = Employee.objects.create(user=cls.user, organization=org, first_name='Jan', last_name='Kowalski')
+        EmployeePermissionGroup.objects.create(employee=employee, permission_group=group)
+        cls.superuser = User.objects.create_superuser('root')
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=user.pk) if user.is_authenticated else user
+        SZBIPermissionsMiddleware(lambda request: None)(request)
+        return request
+
+    def test_permissions_are_resolved_lazily_once(self):
+        with self.assertNumQueries(0):
+            request = self.request(AnonymousUser())
+            self.assertEqual(set(request.szbi_permissions), set())
+        request = self.request(self.user)
+        with self.assertNumQueries(2):  # pracownik i uprawnienia (jedno zapytanie)
+            self.assertIn(PERM_ASSETS_VIEW, request.szbi_permissions)
+            self.assertTrue(request.szbi_permissions.has_all([PERM_ASSETS_VIEW, PERM_ASSETS_OWNER]))
+            self.assertFalse(user_has_permission(request.user, PERM_ASSETS_ADMIN))
+            context = szbi_permissions(request)['szbi_permissions']
+            self.assertEqual(set(context), {PERM_ASSETS_VIEW, PERM_ASSETS_OWNER})
+
+    def test_permission_mixin(self):
+        class AnyView(SZBIPermissionRequiredMixin, View):
+            szbi_permission_required = [PERM_ASSETS_ADMIN, PERM_ASSETS_VIEW]
+
+            def get(self, request):
+                return HttpResponse('ok')
+
+        class AdminView(AnyView):
+            szbi_permission_required = PERM_ASSETS_ADMIN
+
+        self.assertEqual(AnyView.as_view()(self.request(self.user)).status_code, 200)
+        self.assertEqual(AdminView.as_view()(self.request(self.user)).url, reverse('core:dashboard_access_denied'))
+        self.assertEqual(AdminView.as_view()(self.request(self.superuser)).status_code, 200)
+        self.assertEqual(AdminView.as_view()(self.request(AnonymousUser())).status_code, 302)
+
+    def test_all_permissions_mixin(self):
+        class AllView(SZBIAllPermissionsRequiredMixin, View):
+            szbi_permissions_required = [PERM_ASSETS_VIEW, PERM_ASSETS_OWNER]
+
+            def get(self, request):
+                return HttpResponse('ok')
+
+        class AllWithAdminView(AllView):
+            szbi_permissions_required = [PERM_ASSETS_VIEW, PERM_ASSETS_ADMIN]
+
+        self.assertEqual(AllView.as_view()(self.request(self.user)).status_code, 200)
+        self.assertEqual(AllWithAdminView.as_view()(self.request(self.user)).status_code, 302)
+        self.assertEqual(AllWithAdminView.as_view()(self.request(self.superuser)).status_code, 200)
+
+    def test_decorator(self):
+        view = szbi_permission_required(PERM_ASSETS_OWNER)(lambda request: HttpResponse('ok'))
+        strict = szbi_permission_required([PERM_ASSETS_ADMIN], raise_exception=True)(lambda request: HttpResponse())
+        self.assertEqual(view(self.request(self.user)).status_code, 200)
+        with self.assertRaises(PermissionDenied):
+            strict(self.request(self.user))
+        self.assertEqual(strict(self.request(self.superuser)).status_code, 200)
+        self.assertIn('/accounts/login/', view(self.request(AnonymousUser())).url)
+
+
+class EffectivePermissionTests(TestCase):
+    """Tabela EmployeeEffectivePermission zgodna z Employee.get_permission_queryset"""
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='Org')
+        self.department = Department.objects.create(organization=self.org, name='IT')
+        self.other_department = Department.objects.create(organization=self.org, name='HR')
+        self.position = Position.objects.create(organization=self.org, name='Administrator')
+        permissions = list(Permission.objects.order_by('pk')[:4])
+        self.groups = []
+        for index in range(3):
+            group = PermissionGroup.objects.create(name=f'G{index}')
+            group.permissions.set(permissions[index:index + 2])
+            self.groups.append(group)
+        self.employees = [
+            Employee.objects.create(
+                user=User.objects.create_user(f'pracownik{index}'), organization=self.org,
+                department=self.department, first_name='Jan', last_name=f'P{index}',
+            )
+            for index in range(2)
+        ]
+
+    def assertTableMatches(self):
+        for employee in Employee.objects.all():
+            expected = set(employee.get_permission_queryset().values_list('pk', flat=True))
+            actual = set(employee.effective_permissions.values_list('permission_id', flat=True))
+            self.assertEqual(actual, expected, employee)
+
+    def test_assignments(self):
+        employee = self.employees[0]
+        PositionPermission.objects.create(position=self.position, permission_group=self.groups[0])
+        employee.positions.add(self.position)
+        DepartmentPermission.objects.create(department=self.department, permission_group=self.groups[1])
+        EmployeePermissionGroup.objects.create(employee=employee, permission_group=self.groups[2])
+        self.assertTableMatches()
+        self.assertTrue(employee.effective_permissions.exists())
+        self.groups[1].permissions.clear()
+        self.assertTableMatches()
+        self.position.employees.remove(employee)
+        self.assertTableMatches()
+
+    def test_department_change(self):
+        DepartmentPermission.objects.create(department=self.other_department, permission_group=self.groups[0])
+        employee = self.employees[0]
+        employee.department = self.other_department
+        employee.save()
+        self.assertTableMatches()
+        self.assertTrue(employee.effective_permissions.exists())
+        employee.department = None
+        employee.save(update_fields=['department'])
+        self.assertTableMatches()
+
+    def test_save_without_department_change_skips_sync(self):
+        employee = self.employees[0]
+        with mock.patch.object(effective_permissions, 'sync_employees') as sync:
+            employee.first_name = 'Adam'
+            employee.save()
+            employee.save(update_fields=['first_name'])
+            sync.assert_not_called()
+            employee.department = self.other_department
+            employee.save()
+            sync.assert_called_once_with({employee.pk})
+
+    def test_deletes(self):
+        PositionPermission.objects.create(position=self.position, permission_group=self.groups[0])
+        self.employees[0].positions.add(self.position)
+        DepartmentPermission.objects.create(department=self.department, permission_group=self.groups[1])
+        EmployeePermissionGroup.objects.create(employee=self.employees[1], permission_group=self.groups[2])
+        self.assertTableMatches()
+        for obj in (self.groups[2], self.position, self.department):
+            with self.captureOnCommitCallbacks(execute=True):
+                obj.delete()
+            self.assertTableMatches()
+        self.assertFalse(EmployeeEffectivePermission.objects.exists())
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False})
+class PermissionMatrixTests(TestCase):
+    """Macierz uprawnień (core/permission_matrix.py) i jej eksport"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Organization.objects.create(pk=1, name='Moja Organizacja')
+        other_org = Organization.objects.create(name='Inna')
+        department = Department.objects.create(organization=cls.org, name='IT')
+        permissions = list(Permission.objects.order_by('pk'))
+        group = PermissionGroup.objects.create(name='Grupa')
+        group.permissions.set(permissions[:3])
+        DepartmentPermission.objects.create(department=department, permission_group=group)
+        direct = PermissionGroup.objects.create(name='Bezpośrednia')
+        direct.permissions.set(permissions[2:5])
+        cls.employees = []
+        for index, (org, dept) in enumerate([(cls.org, department), (cls.org, None), (other_org, department)]):
+            employee = Employee.objects.create(
+                user=User.objects.create_user(f'pracownik{index}'), organization=org, department=dept,
+                first_name='Jan', last_name=f'Nowak{index}',
+            )
+            cls.employees.append(employee)
+        EmployeePermissionGroup.objects.create(employee=cls.employees[1], permission_group=direct)
+        cls.admin = User.objects.create_user('admin', is_staff=True)
+
+    def test_matrix_matches_permission_queryset(self):
+        with self.assertNumQueries(3):
+            matrix = PermissionMatrix.build(self.org)
+        self.assertEqual([employee['id'] for employee in matrix.employees], [e.pk for e in self.employees[:2]])
+        columns = [permission['id'] for permission in matrix.permissions]
+        for row, employee in enumerate(self.employees[:2]):
+            expected = set(employee.get_permission_queryset().values_list('pk', flat=True))
+            self.assertEqual({columns[i] for i, flag in enumerate(matrix.row_flags(row)) if flag}, expected)
+            self.assertTrue(all(matrix.has(row, columns.index(pk)) for pk in expected))
+        self.assertEqual(
+            matrix.column_counts(),
+            [sum(matrix.has(row, column) for row in range(len(matrix))) for column in range(len(columns))],
+        )
+        self.assertEqual(len(PermissionMatrix.build()), 3)
+
+    def export(self, fmt):
+        self.client.force_login(self.admin)
+        return self.client.get(reverse('core:permission_matrix_export', args=[fmt]))
+
+    def test_csv_export(self):
+        response = self.export('csv')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+        matrix = PermissionMatrix.build(self.org)
+        self.assertEqual(rows, [matrix.header(), *matrix.iter_export_rows()])
+        self.assertEqual(rows[1][:4], ['Nowak0', 'Jan', 'pracownik0', 'IT'])
+        self.assertEqual(rows[2][3], '')
+        self.assertEqual(rows[1][4:].count('X'), 3)
+        self.assertTrue(ActivityLog.objects.filter(action='export', category='permission').exists())
+
+    def test_csv_export_escapes_formulas(self):
+        Employee.objects.filter(pk=self.employees[0].pk).update(
+            first_name='=HYPERLINK("http://x")', last_name='@SUM(A1)',
+        )
+        content = b''.join(self.export('csv').streaming_content).decode('utf-8')
+        rows = list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(rows[1][:3], ["'@SUM(A1)", '\'=HYPERLINK("http://x")', 'pracownik0'])
+
+    @unittest.skipUnless(importlib.util.find_spec('openpyxl'), 'Eksport XLSX wymaga pakietu openpyxl')
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        response = self.export('xlsx')
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = [['' if value is None else value for value in row] for row in sheet.iter_rows(values_only=True)]
+        matrix = PermissionMatrix.build(self.org)
+        self.assertEqual(rows, [matrix.header(), *matrix.iter_export_rows()])
+
+    def test_xlsx_without_openpyxl(self):
+        with mock.patch.dict('sys.modules', {'openpyxl': None}):
+            response = self.export('xlsx')
+        self.assertRedirects(response, reverse('core:permission_matrix'), fetch_redirect_response=False)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.export('pdf').status_code, 404)
+
+
+class OrganizationTreeTests(TestCase):
+    """Drzewo struktury organizacyjnej budowane stałą liczbą zapytań"""
+
+    def setUp(self):
+        self.org = Organization.objects.create(pk=1, name='Moja Organizacja')
+        self.group = PermissionGroup.objects.create(name='Grupa działu')
+        self.admin = User.objects.create_user('admin', is_staff=True)
+
+    def add_branch(self, depth, prefix):
+        parent = None
+        for level in range(depth):
+            parent = Department.objects.create(organization=self.org, name=f'{prefix}{level}', parent=parent)
+            DepartmentPermission.objects.create(department=parent, permission_group=self.group)
+            position = Position.objects.create(
+                organization=self.org, name=f'Stanowisko {prefix}{level}', department=parent,
+            )
+            PositionPermission.objects.create(position=position, permission_group=self.group)
+        return parent
+
+    def test_tree_structure(self):
+        self.add_branch(6, 'A')
+        self.add_branch(2, 'B')
+        with self.assertNumQueries(4):
+            roots = build_organization_tree(self.org)
+        self.assertEqual([dept.name for dept in roots], ['A0', 'B0'])
+        node, depth = roots[0], 0
+        while node.tree_children:
+            self.assertEqual(node.tree_depth, depth)
+            self.assertEqual([pos.name for pos in node.tree_positions], [f'Stanowisko {node.name}'])
+            self.assertEqual(node.tree_groups, [self.group])
+            self.assertEqual(node.tree_positions[0].tree_groups, [self.group])
+            node, depth = node.tree_children[0], depth + 1
+        self.assertEqual((node.name, node.tree_depth), ('A5', 5))
+
+    def test_cycle_is_shown_at_top_level(self):
+        a = Department.objects.create(organization=self.org, name='A')
+        b = Department.objects.create(organization=self.org, name='B', parent=a)
+        Department.objects.filter(pk=a.pk).update(parent=b)
+        roots = build_organization_tree(self.org)
+        self.assertEqual(sorted(dept.name for dept in roots), ['A', 'B'])
+
+    def render(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('core:organization_structure'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode('utf-8'), len(queries)
+
+    def test_view_renders_whole_tree_with_constant_queries(self):
+        self.add_branch(1, 'A')
+        _, small_tree_queries = self.render()
+        self.add_branch(8, 'B')
+        content, queries = self.render()
+        self.assertEqual(queries, small_tree_queries)
+        for level in range(8):
+            self.assertIn(f'<strong>B{level}</strong>', content)
+            self.assertIn(f'<strong>Stanowisko B{level}</strong>', content)
+        # Działy zagnieżdżone rekurencyjnie: B7 wewnątrz listy dzieci B6
+        self.assertRegex(content, r'(?s)<strong>B6</strong>.*<ul class="org-children">\s*<li>.*<strong>B7</strong>')
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False})
+class PermissionGroupSyncTests(TestCase):
+    """Synchronizacja przypisań grup (core/assignments.py) - zapis różnic i jedno odświeżenie"""
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='Org')
+        self.department = Department.objects.create(organization=self.org, name='IT')
+        self.position = Position.objects.create(organization=self.org, name='Administrator')
+        self.employee = Employee.objects.create(
+            user=User.objects.create_user('pracownik'), organization=self.org, department=self.department,
+            first_name='Jan', last_name='Kowalski',
+        )
+        self.employee.positions.add(self.position)
+        permissions = list(Permission.objects.order_by('pk')[:3])
+        self.groups = []
+        for index, name in enumerate(['Alfa', 'Beta', 'Gamma']):
+            group = PermissionGroup.objects.create(name=name)
+            group.permissions.add(permissions[index])
+            self.groups.append(group)
+
+    def assigned(self, owner):
+        model = ASSIGNMENT_MODELS[type(owner)]
+        owner_field, _ = ASSIGNMENT_OWNERS[model]
+        return set(model.objects.filter(**{owner_field: owner.pk}).values_list('permission_group__name', flat=True))
+
+    def test_diff_is_applied_with_single_refresh(self):
+        alfa, beta, gamma = self.groups
+        for owner in (self.position, self.department, self.employee):
+            with self.subTest(owner=type(owner).__name__):
+                sync_permission_groups(owner, [alfa, beta])
+                kept = ASSIGNMENT_MODELS[type(owner)].objects.get(permission_group=beta).pk
+                with mock.patch.object(effective_permissions, 'sync_employees',
+                                       wraps=effective_permissions.sync_employees) as sync, \
+                        mock.patch.object(permission_cache, 'invalidate_employees') as invalidate, \
+                        self.captureOnCommitCallbacks(execute=True):
+                    changes = sync_permission_groups(owner, [beta.pk, str(gamma.pk), 999999])
+                sync.assert_called_once_with({self.employee.pk})
+                invalidate.assert_called_once_with({self.employee.pk})
+                self.assertEqual(changes, (['Gamma'], ['Alfa']))
+                self.assertEqual(self.assigned(owner), {'Beta', 'Gamma'})
+                self.assertEqual(ASSIGNMENT_MODELS[type(owner)].objects.get(permission_group=beta).pk, kept)
+                entry = ActivityLog.objects.filter(object_type=type(owner).__name__).latest('pk')
+                self.assertEqual(entry.action, 'update')
+                self.assertEqual(entry.details, {'added': ['Gamma'], 'removed': ['Alfa']})
+                expected = set(self.employee.get_permission_queryset().values_list('pk', flat=True))
+                actual = set(self.employee.effective_permissions.values_list('permission_id', flat=True))
+                self.assertEqual(actual, expected)
+
+    def test_unchanged_selection_does_nothing(self):
+        sync_permission_groups(self.position, self.groups[:2])
+        logs = ActivityLog.objects.count()
+        with mock.patch.object(effective_permissions, 'sync_employees') as sync:
+            changes = sync_permission_groups(self.position, reversed(self.groups[:2]))
+        self.assertFalse(changes)
+        sync.assert_not_called()
+        self.assertEqual(ActivityLog.objects.count(), logs)
+
+    def test_actions(self):
+        self.assertEqual(sync_permission_groups(self.department, self.groups).added, ['Alfa', 'Beta', 'Gamma'])
+        self.assertEqual(ActivityLog.objects.latest('pk').action, 'assign')
+        self.assertEqual(sync_permission_groups(self.department, []).removed, ['Alfa', 'Beta', 'Gamma'])
+        self.assertEqual(ActivityLog.objects.latest('pk').action, 'unassign')
+        self.assertFalse(self.employee.effective_permissions.exists())
+
+
+class PermissionSetTests(unittest.TestCase):
+    """Sprawdzanie uprawnień maską bitową i zapis PermissionSet w cache"""
+
+    OWNER, APPROVER, VIEWER = 'Właściciel dokumentów', 'Zatwierdzający dokumenty', 'Przeglądanie rejestru aktywów'
+    MANUAL = 'Uprawnienie dodane ręcznie'
+
+    def setUp(self):
+        self.names = PermissionSet([self.OWNER, self.APPROVER, self.MANUAL])
+
+    def test_mask_covers_registry_names_only(self):
+        self.assertEqual(self.names.mask, names_to_mask([self.OWNER, self.APPROVER]))
+        self.assertEqual(set(mask_to_names(self.names.mask)), {self.OWNER, self.APPROVER})
+
+    def test_has(self):
+        self.assertTrue(self.names.has(self.OWNER))
+        self.assertFalse(self.names.has(self.VIEWER))
+        self.assertTrue(self.names.has(self.MANUAL))
+        self.assertFalse(self.names.has('Inne uprawnienie spoza rejestru'))
+
+    def test_has_any(self):
+        self.assertTrue(self.names.has_any([self.VIEWER, self.APPROVER]))
+        self.assertFalse(self.names.has_any([self.VIEWER]))
+        self.assertTrue(self.names.has_any(self.OWNER))
+        # Nazwy spoza rejestru - sprawdzenie na zbiorze nazw
+        self.assertTrue(self.names.has_any([self.VIEWER, self.MANUAL]))
+        self.assertFalse(self.names.has_any([self.VIEWER, 'Inne uprawnienie spoza rejestru']))
+        self.assertFalse(EMPTY_PERMISSION_SET.has_any([self.OWNER]))
+
+    def test_has_all(self):
+        self.assertTrue(self.names.has_all([self.OWNER, self.APPROVER]))
+        self.assertFalse(self.names.has_all([self.OWNER, self.VIEWER]))
+        self.assertTrue(self.names.has_all([self.OWNER, self.MANUAL]))
+        self.assertFalse(self.names.has_all([self.MANUAL, 'Inne uprawnienie spoza rejestru']))
+        self.assertTrue(self.names.has_all([]))
+
+    def test_pickled_as_mask_and_names_outside_registry(self):
+        _, args = self.names.__reduce__()
+        self.assertEqual(args, (self.names.mask, (self.MANUAL,)))
+        restored = pickle.loads(pickle.dumps(self.names, pickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(restored, PermissionSet)
+        self.assertEqual(restored, self.names)
+        self.assertEqual(restored.mask, self.names.mask)
+        self.assertTrue(restored.has_all([self.OWNER, self.MANUAL]))
+
+
+class MaterializedPathTests(TestCase):
+    """Ścieżki zmaterializowane drzewa organizacji"""
+
+    def setUp(self):
+        self.a = Organization.objects.create(name='A')
+        self.b = Organization.objects.create(name='B')
+        self.c = Organization.objects.create(name='C', parent=self.a)
+        self.d = Organization.objects.create(name='D', parent=self.c)
+
+    def paths(self):
+        return dict(Organization.objects.values_list('name', 'hierarchy_path'))
+
+    def assertPaths(self, expected):
+        ids = {org.name: org.pk for org in (self.a, self.b, self.c, self.d)}
+        self.assertEqual(self.paths(), {
+            name: '/' + ''.join(f'{ids[part]}/' for part in path) for name, path in expected.items()
+        })
+        depths = dict(Organization.objects.values_list('name', 'hierarchy_depth'))
+        self.assertEqual(depths, {name: len(path) - 1 for name, path in expected.items()})
+
+    def test_new_nodes_get_paths(self):
+        self.assertPaths({'A': 'A', 'B': 'B', 'C': 'AC', 'D': 'ACD'})
+        self.assertEqual(list(self.a.get_descendants()), [self.c, self.d])
+        self.assertEqual(list(self.d.get_ancestors()), [self.a, self.c])
+
+    def test_reparenting_moves_subtree(self):
+        self.c.parent = self.b
+        self.c.save()
+        self.assertPaths({'A': 'A', 'B': 'B', 'C': 'BC', 'D': 'BCD'})
+        self.a.parent = self.b
+        self.a.save(update_fields=['parent'])
+        self.c.parent = None
+        self.c.save()
+        self.assertPaths({'A': 'BA', 'B': 'B', 'C': 'C', 'D': 'CD'})
+
+    def test_stale_instance_keeps_current_path(self):
+        stale_c = Organization.objects.get(pk=self.c.pk)
+        self.a.parent = self.b
+        self.a.save()
+        self.assertPaths({'A': 'BA', 'B': 'B', 'C': 'BAC', 'D': 'BACD'})
+        stale_c.name = 'C'
+        stale_c.save()
+        stale_c.save(update_fields=['name'])
+        self.assertPaths({'A': 'BA', 'B': 'B', 'C': 'BAC', 'D': 'BACD'})
+
+    def test_move_into_own_subtree_is_rejected(self):
+        self.a.parent = self.d
+        with self.assertRaises(ValueError):
+            self.a.save()
+        self.assertPaths({'A': 'A', 'B': 'B', 'C': 'AC', 'D': 'ACD'})
+
+
+class RelatedObjectsTests(TestCase):
+    """Liczby wierszy usuwanych kaskadowo zgodne z Collector Django"""
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='Org')
+        self.group = PermissionGroup.objects.create(name='Grupa')
+        # Drzewo działów głębsze niż dawny limit przechodzenia grafu
+        self.departments = []
+        parent = None
+        for level in range(9):
+            parent = Department.objects.create(organization=self.org, name=f'D{level}', parent=parent)
+            self.departments.append(parent)
+            DepartmentPermission.objects.create(department=parent, permission_group=self.group)
+        self.user = User.objects.create_user('pracownik')
+        self.user.groups.add(Group.objects.create(name='Pracownicy'))
+        self.employee = Employee.objects.create(
+            user=self.user, organization=self.org, department=self.departments[-1],
+            first_name='Jan', last_name='Kowalski',
+        )
+        for department in self.departments[-3:]:
+            position = Position.objects.create(organization=self.org, name=department.name, department=department)
+            self.employee.positions.add(position)
+        EmployeePermissionGroup.objects.create(employee=self.employee, permission_group=self.group)
+
+    def assertMatchesCollector(self, obj):
+        related = get_related_objects(obj, transitive=True)
+        cascaded = {model._meta.label: count
+                    for model, kind, _, count in related_objects._walk_cascades(obj) if kind == 'cascade'}
+        cascaded[obj._meta.label] = cascaded.get(obj._meta.label, 0) + 1
+        self.assertEqual(sum(item['count'] for item in related['cascade']) + 1, sum(cascaded.values()))
+        _, deleted = obj.delete()
+        self.assertEqual(cascaded, {label: count for label, count in deleted.items() if count})
+        return related
+
+    def test_department_tree(self):
+        related = self.assertMatchesCollector(self.departments[0])
+        set_null = {item['model']: item['count'] for item in related['set_null']}
+        self.assertEqual(set_null, {'Stanowiska': 3, 'Pracownicy': 1})
+
+    def test_organization(self):
+        related = self.assertMatchesCollector(self.org)
+        self.assertIn({'model': 'Stanowiska', 'count': 3, 'transitive': True, 'm2m': True}, related['cascade'])
+        self.assertEqual(related['set_null'], [])
+
+    def test_user(self):
+        self.assertMatchesCollector(self.user)
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': True, 'MAX_SIZE': 3, 'MAX_AGE': 60, 'FLUSH_ON_REQUEST': False})
+class LogBufferTests(TestCase):
+    """Buforowany zapis dziennika (core/log_writer.py)"""
+
+    def setUp(self):
+        self.addCleanup(log_writer.flush)
+
+    def entry(self, description='-', action='update'):
+        return ActivityLog(
+            action=action, category='employee', object_type='Employee',
+            object_repr='-', description=description,
+        )
+
+    def log(self, description='-'):
+        return ActivityLog.log(
+            user=None, action='update', category='employee', object_type='Employee',
+            object_repr='-', description=description,
+        )
+
+    def test_flush_at_max_size(self):
+        buffer = log_writer.LogBuffer()
+        buffer.add(self.entry())
+        buffer.add(self.entry())
+        self.assertEqual((len(buffer), ActivityLog.objects.count()), (2, 0))
+        buffer.add(self.entry())
+        self.assertEqual((len(buffer), ActivityLog.objects.count()), (0, 3))
+        self.assertEqual(log_chain.verify_chain(), (3, []))
+
+    @override_settings(SZBI_ACTIVITY_LOG={'MAX_AGE': 0.05})
+    def test_timer_flushes_at_max_age(self):
+        buffer = log_writer.LogBuffer()
+        written = threading.Event()
+        entry = self.entry()
+        with mock.patch.object(log_writer, 'write_entries', side_effect=lambda entries: written.set()) as write:
+            buffer.add(entry)
+            self.assertTrue(written.wait(5))
+        write.assert_called_once_with([entry])
+        self.assertEqual(len(buffer), 0)
+
+    def test_timer_failure_is_logged(self):
+        buffer = log_writer.LogBuffer()
+        buffer.add(self.entry())
+        with mock.patch.object(log_writer, 'write_entries', side_effect=RuntimeError('awaria')), \
+                self.assertLogs('core.log_writer', 'ERROR'):
+            thread = threading.Thread(target=buffer._flush_from_timer)
+            thread.start()
+            thread.join()
+        self.assertEqual(len(buffer), 0)
+
+    def test_request_finished_flushes_only_due_buffer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log()
+        request_finished.send(sender=None)
+        self.assertEqual(log_writer.pending_count(), 1)
+        with override_settings(SZBI_ACTIVITY_LOG={'MAX_AGE': 0}):
+            request_finished.send(sender=None)
+        self.assertEqual(log_writer.pending_count(), 0)
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_entries_are_buffered_after_commit_only(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.log('wycofany')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertEqual(log_writer.pending_count(), 0)
+            with transaction.atomic():
+                self.log('zatwierdzony')
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(log_writer.pending_count(), 1)
+        log_writer.flush()
+        self.assertEqual(list(ActivityLog.objects.values_list('description', flat=True)), ['zatwierdzony'])
+
+    def test_failed_batch_falls_back_to_single_writes(self):
+        entries = [self.entry('pierwszy'), self.entry('błędny', action=None), self.entry('trzeci')]
+        with self.assertLogs('core.log_writer', 'ERROR'):
+            self.assertEqual(log_writer.write_entries(entries), 2)
+        self.assertEqual(
+            list(ActivityLog.objects.order_by('pk').values_list('description', flat=True)), ['pierwszy', 'trzeci']
+        )
+        self.assertEqual(log_chain.verify_chain(), (2, []))
+
+
+class ActivityLogPaginationTests(TestCase):
+    """Stronicowanie kursorowe dziennika - kursory i granice stron"""
+
+    def setUp(self):
+        # Część wpisów z identycznym czasem - kolejność rozstrzyga identyfikator
+        moment = timezone.now()
+        self.logs = [
+            ActivityLog.objects.create(
+                action='update', category='employee', object_type='Employee', object_repr='-',
+                description=str(index), created_at=moment - timedelta(minutes=index // 3),
+            )
+            for index in range(7)
+        ]
+        self.newest_first = sorted(self.logs, key=lambda log: (log.created_at, log.pk), reverse=True)
+
+    def test_cursor_round_trip(self):
+        created_at = timezone.now()
+        cursor = encode_cursor(created_at, 42, 'prev')
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (created_at, 42, 'prev'))
+
+    def test_tampered_cursor_is_ignored(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        cursors = [
+            'nie-kursor', '%%%', encode([timezone.now().isoformat(), 1, 'sideways']),
+            encode([timezone.now().isoformat(), 'x', 'next']), encode(['wczoraj', 1, 'next']),
+            encode([timezone.now().isoformat(), 1]), encode(5), encode({'a': 1, 'b': 2, 'c': 3}),
+        ]
+        first = paginate_keyset(ActivityLog.objects.all(), per_page=3)
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                page = paginate_keyset(ActivityLog.objects.all(), cursor, per_page=3)
+                self.assertEqual(list(page), list(first))
+                self.assertFalse(page.has_previous)
+
+    def test_pages_cover_all_entries_in_both_directions(self):
+        for per_page in (2, 3, 7, 10):
+            with self.subTest(per_page=per_page):
+                pages, cursor = [], None
+                while True:
+                    with self.assertNumQueries(1):
+                        page = paginate_keyset(ActivityLog.objects.all(), cursor, per_page=per_page)
+                    pages.append(page)
+                    if not page.has_next:
+                        break
+                    cursor = page.next_cursor
+                self.assertEqual([log for page in pages for log in page], self.newest_first)
+                self.assertTrue(all(len(page) == per_page for page in pages[:-1]))
+                self.assertFalse(pages[0].has_previous)
+                self.assertIsNone(pages[-1].next_cursor)
+                # Powrót kursorami "prev" odtwarza kolejne strony
+                for previous, page in zip(pages, pages[1:]):
+                    back = paginate_keyset(ActivityLog.objects.all(), page.previous_cursor, per_page=per_page)
+                    self.assertEqual(list(back), list(previous))
+                    self.assertEqual(back.has_previous, previous is not pages[0])
+
+    def test_cursor_after_deleted_entries(self):
+        first = paginate_keyset(ActivityLog.objects.all(), per_page=4)
+        # Wpis, na którym kończy się strona, i wszystkie starsze zostały usunięte
+        ActivityLog.objects.filter(pk__in=[log.pk for log in self.newest_first[3:]]).delete()
+        last = paginate_keyset(ActivityLog.objects.all(), first.next_cursor, per_page=4)
+        self.assertEqual((list(last), last.has_next, last.has_previous), ([], False, True))
+        back = paginate_keyset(ActivityLog.objects.all(), encode_cursor(
+            self.newest_first[-1].created_at, self.newest_first[-1].pk, 'prev'), per_page=4)
+        self.assertEqual(list(back), self.newest_first[:3])
+        self.assertFalse(back.has_previous)
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False})
+class ActivityLogDateFilterTests(TestCase):
+    """Filtry dat jako zakresy półotwarte w strefie TIME_ZONE"""
+
+    def create_log(self, created_at):
+        return ActivityLog.objects.create(
+            action='update', category='employee', object_type='Employee',
+            object_repr='-', description='-', created_at=created_at,
+        )
+
+    def test_date_to_includes_whole_local_day(self):
+        tz = timezone.get_default_timezone()
+        last_moment = self.create_log(timezone.make_aware(datetime(2024, 3, 31, 23, 59, 59, 999999), tz))
+        next_day = self.create_log(timezone.make_aware(datetime(2024, 4, 1, 0, 0), tz))
+        logs = filter_activity_logs(ActivityLog.objects.all(), get_activity_log_filters({'date_to': '2024-03-31'}))
+        self.assertIn(last_moment, logs)
+        self.assertNotIn(next_day, logs)
+
+    def test_date_from_starts_at_local_midnight(self):
+        tz = timezone.get_default_timezone()
+        before = self.create_log(timezone.make_aware(datetime(2024, 2, 29, 23, 59, 59), tz))
+        midnight = self.create_log(timezone.make_aware(datetime(2024, 3, 1, 0, 0), tz))
+        logs = filter_activity_logs(ActivityLog.objects.all(), get_activity_log_filters({'date_from': '2024-03-01'}))
+        self.assertIn(midnight, logs)
+        self.assertNotIn(before, logs)
+
+    def test_out_of_range_dates_are_open_bounds(self):
+        entry = self.create_log(timezone.now())
+        filters = get_activity_log_filters({'date_from': '0001-01-01', 'date_to': '9999-12-31'})
+        self.assertEqual(list(filter_activity_logs(ActivityLog.objects.all(), filters)), [entry])
+
+    def test_invalid_date_is_ignored(self):
+        self.create_log(timezone.now())
+        logs = filter_activity_logs(ActivityLog.objects.all(), get_activity_log_filters({'date_from': '2024-13-45'}))
+        self.assertEqual(logs.count(), 1)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plany zapytań w formacie SQLite')
+class ActivityLogQueryPlanTests(TestCase):
+    """Żadna kombinacja filtrów dziennika nie może prowadzić do pełnego skanu tabeli"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('plan-test')
+        ActivityLog.objects.bulk_create([
+            ActivityLog(
+                user=cls.user if i % 2 else None,
+                action='update' if i % 3 else 'create',
+                category='employee' if i % 5 else 'document',
+                object_type='Employee', object_repr=f'obj {i}', description=f'opis {i}',
+            )
+            for i in range(200)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, plan, label, filtered):
+        pattern = INDEX_SCAN if filtered else FULL_SCAN
+        self.assertIsNone(pattern.search(plan), f'Pełny skan tabeli dla filtrów {label}:\n{plan}')
+
+    def filter_combinations(self):
+        values = dict(INDEXED_FILTERS, user=str(self.user.pk))
+        for size in range(len(values) + 1):
+            for names in itertools.combinations(values, size):
+                params = {name: values[name] for name in names}
+                yield names, get_activity_log_filters(params)
+
+    def test_first_page_uses_indexes(self):
+        for names, filters in self.filter_combinations():
+            queryset = filter_activity_logs(ActivityLog.objects.select_related('user'), filters)
+            plan = queryset.order_by('-created_at', '-pk')[:51].explain()
+            self.assertNoFullScan(plan, names, filtered=bool(names))
+
+    def test_cursor_pages_use_indexes(self):
+        cursor_at = timezone.now()
+        for direction in ('next', 'prev'):
+            cursor = encode_cursor(cursor_at, 100, direction)
+            for names, filters in self.filter_combinations():
+                queryset = filter_activity_logs(ActivityLog.objects.select_related('user'), filters)
+                # Plan zapytania wykonanego przez paginate_keyset
+                with self.assertNumQueries(1) as context:
+                    paginate_keyset(queryset, cursor)
+                sql = context.captured_queries[0]['sql']
+                with connection.cursor() as db_cursor:
+                    db_cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = '\n'.join(str(row[-1]) for row in db_cursor.fetchall())
+                self.assertNoFullScan(plan, (direction,) + names, filtered=True)
+
+
+class ActivityLogFullTextSearchTests(TestCase):
+    """Wyszukiwanie w indeksie FTS5 dziennika zdarzeń"""
+
+    def setUp(self):
+        if not log_search.fts_available():
+            self.skipTest('Indeks FTS5 niedostępny')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.deleted = ActivityLog.objects.create(
+            action='delete', category='employee', object_type='Employee', object_repr='Jan Kowalski',
+            description='Usunięto pracownika "Jan Kowalski"', details={'removed': ['Grupa Łączności']},
+        )
+        cls.updated = ActivityLog.objects.create(
+            action='update', category='department', object_type='Department', object_repr='Dział IT',
+            description='Zaktualizowano dział "Dział IT"',
+        )
+
+    def search(self, text):
+        return list(filter_activity_logs(ActivityLog.objects.all(), get_activity_log_filters({'search': text})))
+
+    def test_diacritics_are_folded(self):
+        self.assertEqual(self.search('usunieto'), [self.deleted])
+        self.assertEqual(self.search('dzial'), [self.updated])
+
+    def test_details_values_are_indexed(self):
+        self.assertEqual(self.search('lacznosci'), [self.deleted])
+
+    def test_index_follows_updates_and_deletes(self):
+        ActivityLog.objects.filter(pk=self.updated.pk).update(description='Przeniesiono stanowisko')
+        self.assertEqual(self.search('zaktualizowano'), [])
+        self.assertEqual(self.search('przeniesiono'), [self.updated])
+        self.deleted.delete()
+        self.assertEqual(self.search('usunieto'), [])
+
+    def test_search_uses_fts_index(self):
+        queryset = filter_activity_logs(ActivityLog.objects.all(), get_activity_log_filters({'search': 'usunieto'}))
+        plan = queryset.order_by('-created_at', '-pk')[:51].explain()
+        self.assertIn(f'{log_search.FTS_TABLE} VIRTUAL TABLE', plan)
+        self.assertIsNone(FULL_SCAN.search(plan), plan)
+
+    def test_ranked_results(self):
+        results = log_search.get_search_backend().ranked(ActivityLog.objects.all(), 'kowalski', 10)
+        self.assertEqual(results, [self.deleted])
+
+
+class ActivityLogArchiveTests(TestCase):
+    """Archiwum miesięcy dziennika (core/log_archive.py) i stronicowanie za tabelą bieżącą"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(SZBI_ACTIVITY_LOG_ARCHIVE={'DIR': self.directory})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.tz = timezone.get_default_timezone()
+        self.month = timezone.make_aware(datetime(2024, 1, 1), self.tz)
+
+    def create_log(self, created_at, description='-'):
+        return ActivityLog.objects.create(
+            action='update', category='employee', object_type='Employee',
+            object_repr='-', description=description, created_at=created_at,
+        )
+
+    def archived(self, day, hour=12):
+        return self.create_log(timezone.make_aware(datetime(2024, 1, day, hour), self.tz), f'styczeń {day}')
+
+    def page_ids(self, page):
+        return [entry.pk for entry in page]
+
+    def test_round_trip(self):
+        archived = [self.archived(day) for day in (3, 10, 17, 24, 31)]
+        current = [self.create_log(timezone.now()) for _ in range(2)]
+        self.assertEqual(log_archive.archive_month(self.month), 5)
+        self.assertEqual(list(ActivityLog.objects.order_by('pk')), current)
+
+        info = log_archive.read_manifest()['months']['2024-01']
+        path = os.path.join(self.directory, info['file'])
+        self.assertEqual(info['rows'], 5)
+        self.assertEqual(info['sha256'], log_archive.file_sha256(path))
+        self.assertEqual((info['min_id'], info['max_id']), (archived[0].pk, archived[-1].pk))
+        self.assertEqual(log_archive.verify_archive(), [])
+        archive_filter = get_archive_filter(get_activity_log_filters({}))
+        self.assertEqual(
+            [entry.pk for entry in log_archive.iter_archive(archive_filter)], [log.pk for log in reversed(archived)]
+        )
+
+        # Stronicowanie kursorowe przechodzi z tabeli do archiwum i z powrotem
+        queryset = ActivityLog.objects.all()
+        first = paginate_keyset(queryset, per_page=3, archive_filter=archive_filter)
+        self.assertEqual(self.page_ids(first), [current[1].pk, current[0].pk, archived[4].pk])
+        second = paginate_keyset(queryset, first.next_cursor, per_page=3, archive_filter=archive_filter)
+        self.assertEqual(self.page_ids(second), [log.pk for log in reversed(archived[1:4])])
+        third = paginate_keyset(queryset, second.next_cursor, per_page=3, archive_filter=archive_filter)
+        self.assertEqual(self.page_ids(third), [archived[0].pk])
+        self.assertFalse(third.has_next)
+        back = paginate_keyset(queryset, second.previous_cursor, per_page=3, archive_filter=archive_filter)
+        self.assertEqual(self.page_ids(back), self.page_ids(first))
+        self.assertFalse(back.has_previous)
+
+    def test_interrupted_run_is_merged(self):
+        first = [self.archived(day) for day in (5, 20)]
+        # Przerwany przebieg - plik i manifest zapisane, wiersze nie usunięte
+        log_archive.archive_month(self.month, delete=False)
+        later = [self.archived(day) for day in (1, 12, 28)]
+        self.assertEqual(log_archive.archive_month(self.month), 5)
+        self.assertFalse(ActivityLog.objects.exists())
+        rows = list(log_archive.iter_month_rows('2024-01'))
+        self.assertEqual([row['description'] for row in rows], [f'styczeń {day}' for day in (28, 20, 12, 5, 1)])
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(log.pk for log in first + later))
+        self.assertEqual(log_archive.read_manifest()['months']['2024-01']['rows'], 5)
+        self.assertEqual(log_archive.verify_archive(), [])
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False})
+class ActivityLogExportTests(TestCase):
+    """Strumieniowy eksport dziennika (CSV/JSONL)"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SZBI_ACTIVITY_LOG_ARCHIVE={'DIR': directory.name})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = User.objects.create_user('admin', is_staff=True)
+        self.client.force_login(self.admin)
+        for category, description in (('employee', '=HYPERLINK("http://x")'), ('employee', 'zwykły'),
+                                      ('document', 'dokument')):
+            ActivityLog.objects.create(
+                action='update', category=category, object_type='Employee',
+                object_repr='-', description=description, user_agent='@SUM(A1)',
+            )
+
+    def export(self, fmt, **params):
+        response = self.client.get(reverse('core:activity_log_export', args=[fmt]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_applies_filters_and_escapes_formulas(self):
+        content = self.export('csv', category='employee')
+        rows = list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(rows[0], [label for _, label in EXPORT_COLUMNS])
+        columns = [name for name, _ in EXPORT_COLUMNS]
+        descriptions = [row[columns.index('description')] for row in rows[1:]]
+        self.assertEqual(descriptions, ['zwykły', '\'=HYPERLINK("http://x")'])
+        self.assertEqual({row[columns.index('user_agent')] for row in rows[1:]}, {"'@SUM(A1)"})
+
+    def test_jsonl_keeps_raw_values(self):
+        rows = [json.loads(line) for line in self.export('jsonl', category='document').splitlines()]
+        self.assertEqual([(row['description'], row['user_agent']) for row in rows], [('dokument', '@SUM(A1)')])
+
+    def test_export_is_logged(self):
+        self.export('csv', category='employee')
+        entry = ActivityLog.objects.get(action='export')
+        self.assertEqual((entry.category, entry.user), ('system', self.admin))
+        self.assertEqual(entry.details, {'filters': {'category': 'employee'}})
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('core:activity_log_export', args=['xml']))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False})
+class TimelineTests(TestCase):
+    """Wspólna oś czasu zasilana zapisem dzienników"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('timeline-test')
+
+    def test_logs_are_recorded_on_timeline(self):
+        entry = ActivityLog.log(
+            user=self.user, action='update', category='employee', object_type='Employee',
+            object_id=7, object_repr='Jan Kowalski', description='Zaktualizowano pracownika',
+        )
+        event = TimelineEvent.objects.get(source='activity', source_id=entry.pk)
+        self.assertEqual(event.created_at, entry.created_at)
+        self.assertEqual(event.action_display, 'Modyfikacja')
+        self.assertEqual(list(timeline.user_stream(self.user.pk)), [event])
+        self.assertEqual(list(timeline.object_stream('Employee', 7)), [event])
+
+    def test_backfill_skips_recorded_entries(self):
+        ActivityLog.log(
+            user=None, action='other', category='system', object_type='System',
+            object_repr='-', description='-',
+        )
+        TimelineEvent.objects.all().delete()
+        timeline.backfill('core.ActivityLog')
+        timeline.backfill('core.ActivityLog')
+        self.assertEqual(TimelineEvent.objects.count(), 1)
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False})
+class ActivityRollupTests(TestCase):
+    """Dzienne agregaty dziennika aktualizowane przy zapisie i odtwarzane komendą"""
+
+    def log(self, action='update'):
+        return ActivityLog.log(
+            user=None, action=action, category='employee', object_type='Employee',
+            object_repr='-', description='-',
+        )
+
+    def test_rollups_follow_writes(self):
+        self.log()
+        self.log()
+        self.log(action='delete')
+        today = timezone.localdate()
+        self.assertEqual(activity_stats.daily_trend(1), [(today, 3)])
+        self.assertEqual(ActivityDailyRollup.objects.get(action='update').count, 2)
+        self.assertEqual(activity_stats.monthly_trend(1, action='delete'), [(today.replace(day=1), 1)])
+
+    def test_participants_follow_writes(self):
+        user = User.objects.create_user('participant-test')
+        first, last = [
+            ActivityLog.log(
+                user=user, action='login', category='auth', object_type='User',
+                object_repr=user.username, description='-',
+            )
+            for _ in range(2)
+        ]
+        self.log()  # wpis systemowy (bez użytkownika)
+        participant = activity_stats.get_participants().get()
+        self.assertEqual(participant.user, user)
+        self.assertEqual(participant.entry_count, 2)
+        self.assertEqual(participant.first_activity_at, first.created_at)
+        self.assertEqual(participant.last_activity_at, last.created_at)
+        ActivityLogParticipant.objects.all().delete()
+        self.assertEqual(activity_stats.rebuild_participants(), 1)
+        self.assertEqual(ActivityLogParticipant.objects.get(user=user).entry_count, 2)
+
+    def test_rebuild_matches_incremental_counts(self):
+        for _ in range(3):
+            self.log()
+        expected = activity_stats.daily_trend(1)
+        ActivityDailyRollup.objects.update(count=0)
+        activity_stats.rebuild()
+        self.assertEqual(activity_stats.daily_trend(1), expected)
+
+    def test_one_row_per_key(self):
+        self.log()
+        row = ActivityDailyRollup.objects.get()
+        for user in (None, User.objects.create_user('rollup-key')):
+            with self.subTest(user=user), self.assertRaises(IntegrityError), transaction.atomic():
+                ActivityDailyRollup.objects.create(day=row.day, category=row.category, action=row.action, user=user)
+                ActivityDailyRollup.objects.create(day=row.day, category=row.category, action=row.action, user=user)
+
+    def test_deleted_user_rows_are_folded(self):
+        user = User.objects.create_user('rollup-user')
+        for _ in range(2):
+            ActivityLog.log(
+                user=user, action='update', category='employee', object_type='Employee',
+                object_repr='-', description='-',
+            )
+        self.log()
+        self.log(action='delete')
+        user.delete()
+        self.assertEqual(
+            set(ActivityDailyRollup.objects.values_list('action', 'user', 'count')),
+            {('update', None, 3), ('delete', None, 1)},
+        )
+        self.log()
+        self.assertEqual(ActivityDailyRollup.objects.get(action='update').count, 4)
+        activity_stats.rebuild()
+        self.assertEqual(ActivityDailyRollup.objects.get(action='update').count, 4)
+
+
+@override_settings(SZBI_ACTIVITY_LOG={'BUFFERED': False},
+                   SZBI_ACTIVITY_LOG_CHAIN={'CHECKPOINT_INTERVAL': 3, 'VERIFY_SEGMENT_SIZE': 2})
+class ActivityLogChainTests(TestCase):
+    """Łańcuch skrótów dziennika i przyrostowa weryfikacja"""
+
+    def log(self, description='-'):
+        return ActivityLog.log(
+            user=None, action='update', category='employee', object_type='Employee',
+            object_id=1, object_repr='-', description=description, details={'changed': ['email']},
+        )
+
+    def test_entries_are_chained(self):
+        first, second = self.log(), self.log()
+        second.refresh_from_db()
+        self.assertEqual(second.prev_hash, first.entry_hash)
+        self.assertEqual(log_chain.verify_chain(), (2, []))
+
+    def test_verification_is_incremental(self):
+        for _ in range(5):
+            self.log()
+        self.assertEqual(log_chain.verify_chain(workers=1), (5, []))
+        self.log()
+        self.assertEqual(log_chain.verify_chain(), (1, []))
+        self.assertEqual(log_chain.verify_chain(full=True)[0], 6)
+
+    def test_ipv6_address_is_hashed_as_stored(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='2001:0DB8:0000::0001, 10.0.0.1')
+        entry = ActivityLog.log(
+            user=None, action='login', category='auth', object_type='User',
+            object_id='3', object_repr='-', description='-', request=request,
+        )
+        entry.refresh_from_db()
+        self.assertEqual(entry.ip_address, '2001:db8::1')
+        self.assertEqual(log_chain.verify_chain(), (1, []))
+
+    def test_tampering_is_detected(self):
+        entries = [self.log(f'opis {i}') for i in range(5)]
+        ActivityLog.objects.filter(pk=entries[1].pk).update(description='zmieniony')
+        ActivityLog.objects.filter(pk=entries[3].pk).delete()
+        rows, errors = log_chain.verify_chain()
+        self.assertEqual(errors, [
+            f'Wpis #{entries[1].pk}: treść niezgodna ze skrótem',
+            f'Wpis #{entries[4].pk}: przerwany łańcuch (usunięty lub wstawiony wpis przed nim)',
+        ])
+
+    def test_verified_at_set_in_database_does_not_skip_tampering(self):
+        entries = [self.log(f'opis {i}') for i in range(3)]
+        last = ActivityLog.objects.get(pk=entries[-1].pk)
+        checkpoint = log_chain.create_checkpoint(last.pk, last.entry_hash, 3)
+        ActivityLog.objects.filter(pk=entries[0].pk).update(description='zmieniony')
+        ActivityLogCheckpoint.objects.filter(pk=checkpoint.pk).update(verified_at=timezone.now())
+        rows, errors = log_chain.verify_chain()
+        self.assertEqual(rows, 3)
+        self.assertEqual(errors, [
+            f'Wpis #{entries[0].pk}: treść niezgodna ze skrótem',
+            f'Punkt kontrolny #{entries[-1].pk}: nieprawidłowy podpis',
+        ])
+
+    def test_verified_checkpoint_signature_covers_verification(self):
+        for _ in range(3):
+            self.log()
+        self.assertEqual(log_chain.verify_chain(), (3, []))
+        checkpoint = ActivityLogCheckpoint.objects.get()
+        self.assertIsNotNone(checkpoint.verified_at)
+        self.assertTrue(log_chain.checkpoint_signature_valid(checkpoint))
+        self.log()
+        self.assertEqual(log_chain.verify_chain(), (1, []))
+
+
+class WeakPasswordIndexTests(unittest.TestCase):
+    """Binarny indeks listy słabych haseł"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.wordlist = os.path.join(directory.name, 'wordlist_pl.txt')
+        with open(self.wordlist, 'w', encoding='utf-8') as f:
+            f.write('qwerty123\n  Zażółć2024 \n\nqwerty123\n')
+            f.writelines(f'haslo{i}\n' for i in range(5000))
+        self.validator = CERTPolishWeakPasswordValidator(self.wordlist)
+
+    def test_exact_lookups(self):
+        for bloom_fp_rate in (0, password_index.BLOOM_FP_RATE):
+            with self.subTest(bloom_fp_rate=bloom_fp_rate):
+                self.assertEqual(
+                    password_index.build_index(self.wordlist, self.validator.index_path, bloom_fp_rate), 5002
+                )
+                index = password_index.open_index(self.validator.index_path)
+                self.assertEqual(index.bloom is not None, bool(bloom_fp_rate))
+                for password in ['qwerty123', 'QWERTY123', 'zażółć2024', 'haslo0', 'haslo4999']:
+                    self.assertIn(password, index)
+                for password in ['qwerty1234', 'haslo5000', ' qwerty123', '']:
+                    self.assertNotIn(password, index)
+
+    def test_bloom_filter_rejects_most_other_passwords(self):
+        password_index.build_index(self.wordlist, self.validator.index_path)
+        index = password_index.open_index(self.validator.index_path)
+        hits = sum(index._bloom_contains(password_index.digest(f'inne hasło {i}')) for i in range(10000))
+        self.assertLess(hits, 50)
+
+    def test_validator_uses_index(self):
+        password_index.build_index(self.wordlist, self.validator.index_path)
+        with self.assertRaises(ValidationError):
+            self.validator.validate('HASLO42')
+        self.validator.validate('bardzo unikalne zdanie')
+        # Przebudowany indeks otwierany jest ponownie
+        with open(self.wordlist, 'a', encoding='utf-8') as f:
+            f.write('bardzo unikalne zdanie\n')
+        password_index.build_index(self.wordlist, self.validator.index_path)
+        with self.assertRaises(ValidationError):
+            self.validator.validate('bardzo unikalne zdanie')
+
+    def test_stale_or_corrupt_index_falls_back_to_wordlist(self):
+        password_index.build_index(self.wordlist, self.validator.index_path)
+        with open(self.validator.index_path, 'rb') as f:
+            data = f.read()
+        for name, content in [('stary', b'SZBIPWI1' + data[8:]), ('obcięty', data[:-1]), ('pusty', b'')]:
+            with self.subTest(name):
+                index_path = os.path.join(os.path.dirname(self.wordlist), f'{name}.bin')
+                with open(index_path, 'wb') as f:
+                    f.write(content)
+                validator = CERTPolishWeakPasswordValidator(self.wordlist, index_path)
+                with self.assertLogs('core.password_index', 'ERROR'):
+                    self.assertIsNone(password_index.open_index(index_path))
+                with self.assertRaises(ValidationError):
+                    validator.validate('HASLO42')
+                validator.validate('bardzo unikalne zdanie')
+
+
+class BreachedPasswordCorpusTests(unittest.TestCase):
+    """Offline korpus haseł z wycieków (format HIBP)"""
+
+    PASSWORDS = {f'wyciek-{i}': i + 1 for i in range(2000)}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.corpus_dir = os.path.join(self.root, 'corpus')
+        hashes = sorted(
+            (hashlib.sha1(password.encode()).hexdigest().upper(), count)
+            for password, count in self.PASSWORDS.items()
+        )
+        self.source = os.path.join(self.root, 'pwnedpasswords.txt')
+        with open(self.source, 'w') as f:
+            f.writelines(f'{digest}:{count}\r\n' for digest, count in hashes)
+        self.ranges = os.path.join(self.root, 'ranges')
+        os.mkdir(self.ranges)
+        for digest, count in hashes:
+            with open(os.path.join(self.ranges, f'{digest[:5]}.txt'), 'a') as f:
+                f.write(f'{digest[5:]}:{count}\r\n')
+
+    def test_lookup_counts(self):
+        for source in (self.source, self.ranges):
+            with self.subTest(source=source):
+                manifest = breached_passwords.build_corpus(source, self.corpus_dir)
+                self.assertEqual(manifest['count'], len(self.PASSWORDS))
+                corpus = breached_passwords.open_corpus(self.corpus_dir)
+                for password, count in self.PASSWORDS.items():
+                    self.assertEqual(corpus.count(password), count)
+                self.assertEqual(corpus.count('wyciek-2000'), 0)
+                self.assertEqual(corpus.count('Wyciek-1'), 0)
+
+    def test_update_is_picked_up_without_restart(self):
+        validator = CERTBreachedPasswordValidator(self.corpus_dir, min_count=10)
+        validator.validate('wyciek-15')  # brak korpusu - walidator pomijany
+        breached_passwords.build_corpus(self.source, self.corpus_dir)
+        with self.assertRaises(ValidationError):
+            validator.validate('wyciek-15')
+        validator.validate('wyciek-5')  # poniżej min_count
+        breached_passwords.build_corpus(self.source, self.corpus_dir, min_count=100)
+        validator.validate('wyciek-15')
+        breached_passwords.build_corpus(self.source, self.corpus_dir, min_count=100)
+        corpora = [name for name in os.listdir(self.corpus_dir) if name.startswith('corpus-')]
+        self.assertEqual(len(corpora), 2)  # aktywny i poprzedni
+
+    def test_unsorted_source_is_rejected(self):
+        with open(self.source, 'a') as f:
+            f.write(f'{"0" * 40}:1\n')
+        with self.assertRaises(ValueError):
+            breached_passwords.build_corpus(self.source, self.corpus_dir)
+        self.assertIsNone(breached_passwords.open_corpus(self.corpus_dir))
+        self.assertEqual(os.listdir(self.corpus_dir), [])
+
+
+class PasswordPolicyTests(unittest.TestCase):
+    """Złożona polityka haseł zgodna z łańcuchem walidatorów"""
+
+    PASSWORDS = [
+        'krótkie', 'a' * 20, '12345678901234', '98765432109876543', 'x' * 130,
+        'moje hasło do szbi jest długie', 'Administrator systemu 2024', 'zaq1xsw2 i coś jeszcze',
+        'qwertyuiop asdfghjkl', 'jan kowalski ma psa', 'jkowalski@firma.pl!', 'kowalskijan',
+        'abc abc abc abc abc', 'pociąg odjeżdża o 7:15 z peronu 3', 'Zarządzanie HASŁO Qwerty',
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wordlist = os.path.join(directory.name, 'wordlist_pl.txt')
+        with open(wordlist, 'w', encoding='utf-8') as f:
+            f.write('jan kowalski ma psa\n')
+        self.chain = [
+            CERTMinimumLengthValidator(14), CERTMaximumLengthValidator(128),
+            CERTPolishWeakPasswordValidator(wordlist), CERTBreachedPasswordValidator(directory.name),
+            CERTPredictablePatternValidator(), CERTNoSequentialValidator(), UserAttributeSimilarityValidator(),
+        ]
+        self.policy = PasswordPolicyValidator(wordlist_path=wordlist, breached_corpus_dir=directory.name)
+        self.user = User(username='jkowalski', first_name='Jan', last_name='Kowalski', email='jkowalski@firma.pl')
+
+    def errors(self, validators, password):
+        try:
+            validate_password(password, self.user, validators)
+        except ValidationError as error:
+            return [(e.code, e.message, e.params) for e in error.error_list]
+        return []
+
+    def test_aho_corasick_finds_overlapping_patterns(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers', 'rs'])
+        self.assertEqual(automaton.search('ushers'), {0, 1, 3, 4})
+        self.assertEqual(automaton.search('ahishe'), {0, 1, 2})
+        self.assertEqual(automaton.search('xyz'), set())
+
+    def test_same_errors_as_validator_chain(self):
+        for password in self.PASSWORDS:
+            with self.subTest(password=password):
+                self.assertEqual(self.errors([self.policy], password), self.errors(self.chain, password))
+
+    def test_reports_every_failed_rule(self):
+        codes = [code for code, _, _ in self.errors([self.policy], 'jkowalski1')]
+        self.assertEqual(codes, ['password_too_short', 'password_contains_user_data', 'password_too_similar'])
+
+
+class CalibratedArgon2Tests(TestCase):
+    """Parametry Argon2 z kalibracji i odkładana aktualizacja skrótów przy logowaniu"""
+
+    PASSWORD = 'pociąg odjeżdża o 7:15 z peronu 3'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.params_file = os.path.join(directory.name, 'argon2.json')
+        hashers.write_params({'time_cost': 1, 'memory_cost': 8192, 'parallelism': 1}, self.params_file)
+        settings_override = override_settings(SZBI_PASSWORD_HASHING={'PARAMS_FILE': self.params_file})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Skrót z domyślnymi parametrami Django - sprzed kalibracji
+        self.user = User.objects.create_user('argon2-test')
+        self.stale = Argon2PasswordHasher().encode(self.PASSWORD, Argon2PasswordHasher().salt())
+        User.objects.filter(pk=self.user.pk).update(password=self.stale)
+
+    def stored_hash(self):
+        return User.objects.get(pk=self.user.pk).password
+
+    def test_hasher_uses_calibrated_params(self):
+        hasher = identify_hasher(self.stale)
+        self.assertIsInstance(hasher, hashers.CalibratedArgon2PasswordHasher)
+        self.assertTrue(hasher.must_update(self.stale))
+        encoded = hasher.encode(self.PASSWORD, hasher.salt())
+        self.assertEqual(hasher.decode(encoded)['memory_cost'], 8192)
+        self.assertFalse(hasher.must_update(encoded))
+
+    def authenticate_in_request(self, password):
+        # Odkładanie aktualizacji działa tylko w trakcie obsługi żądania
+        request_started.send(sender=None)
+        self.addCleanup(hashers.run_pending_rehashes)
+        return authenticate(username='argon2-test', password=password)
+
+    def test_rehash_is_deferred_until_request_finished(self):
+        self.assertEqual(self.authenticate_in_request(self.PASSWORD), self.user)
+        self.assertEqual(self.stored_hash(), self.stale)
+        self.assertEqual(hashers.run_pending_rehashes(), 1)
+        self.assertIsNone(hashers._local.pending)
+        self.assertFalse(identify_hasher(self.stored_hash()).must_update(self.stored_hash()))
+        self.assertEqual(self.authenticate_in_request(self.PASSWORD), self.user)
+        self.assertEqual(hashers.run_pending_rehashes(), 0)
+
+    def test_rehash_outside_request_is_immediate(self):
+        self.assertEqual(authenticate(username='argon2-test', password=self.PASSWORD), self.user)
+        self.assertFalse(identify_hasher(self.stored_hash()).must_update(self.stored_hash()))
+        self.assertIsNone(getattr(hashers._local, 'pending', None))
+
+    def test_failed_rehash_drops_password(self):
+        self.authenticate_in_request(self.PASSWORD)
+        with mock.patch.object(hashers, 'rehash', side_effect=DatabaseError), \
+                self.assertLogs('core.hashers', 'ERROR'):
+            self.assertEqual(hashers.run_pending_rehashes(), 0)
+        self.assertIsNone(hashers._local.pending)
+        self.assertEqual(self.stored_hash(), self.stale)
+
+    def test_rehash_runs_in_requesting_thread_only(self):
+        self.authenticate_in_request(self.PASSWORD)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(hashers.run_pending_rehashes()))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [0])
+        self.assertEqual(hashers.run_pending_rehashes(), 1)
+
+    def test_login_rehashes_after_response(self):
+        response = self.client.post('/accounts/login/', {'username': 'argon2-test', 'password': self.PASSWORD})
+        self.assertEqual(response.status_code, 302)
+        # Klient testowy wysyła request_finished po zamknięciu odpowiedzi
+        self.assertFalse(identify_hasher(self.stored_hash()).must_update(self.stored_hash()))
+        # Sesja z logowania pozostaje ważna po zmianie skrótu hasła
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_rehash_skipped_after_password_change(self):
+        self.authenticate_in_request(self.PASSWORD)
+        self.user.set_password('zupełnie inne długie hasło')
+        self.user.save()
+        changed = self.stored_hash()
+        self.assertEqual(hashers.run_pending_rehashes(), 0)
+        self.assertEqual(self.stored_hash(), changed)
+
+    def test_wrong_password_is_not_rehashed(self):
+        self.assertIsNone(self.authenticate_in_request('złe hasło'))
+        self.assertEqual(hashers.run_pending_rehashes(), 0)
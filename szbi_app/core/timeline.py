@@ -0,0 +1,105 @@
+"""
+Wspólna oś czasu zdarzeń - dziennik zdarzeń (ActivityLog) i dzienniki
+modułów (DocumentLog, AssetLog, SoALog, IncidentLog) w jednej tabeli
+TimelineEvent z indeksami pod strumienie: globalny, użytkownika i obiektu.
+
+Zdarzenia osi czasu zapisywane są przez core/log_writer.py w tej samej
+transakcji co wpisy źródłowe, więc każdy wpis dodany przez ActivityLog.log
+lub helper _log_action modułu trafia też na oś czasu. Wpisy sprzed
+wprowadzenia osi czasu dodaje komenda build_timeline.
+
+Stronicowanie jest kursorowe (te same kursory co w dzienniku zdarzeń).
+"""
+from django.apps import apps
+
+from .activity_log import PAGE_SIZE, paginate_keyset
+from .models import TimelineEvent
+
+
+# Model wpisu (app_label.Model) -> (źródło, pole obiektu, którego dotyczy wpis)
+# Wpisy ActivityLog przechowują typ i ID obiektu we własnych polach.
+SOURCES = {
+    'core.ActivityLog': ('activity', None),
+    'documents.DocumentLog': ('document', 'document'),
+    'assets.AssetLog': ('asset', 'asset'),
+    'soa.SoALog': ('soa', 'declaration'),
+    'incidents.IncidentLog': ('incident', 'incident'),
+}
+
+
+def build_event(entry):
+    """Zdarzenie osi czasu dla zapisanego wpisu dziennika"""
+    source, object_field = SOURCES[entry._meta.label]
+    event = TimelineEvent(
+        source=source,
+        source_id=entry.pk,
+        user_id=entry.user_id,
+        action=entry.action,
+        action_display=entry.get_action_display(),
+        description=entry.description,
+    )
+    if object_field is None:
+        event.created_at = entry.created_at
+        event.object_type = entry.object_type
+        event.object_id = entry.object_id
+        event.object_repr = entry.object_repr
+    else:
+        obj = getattr(entry, object_field)
+        event.created_at = entry.timestamp
+        event.object_type = type(obj).__name__
+        event.object_id = obj.pk
+        event.object_repr = str(obj)[:255]
+    return event
+
+
+def record_events(entries, ignore_conflicts=False):
+    """Zapisuje zdarzenia osi czasu dla zapisanych wpisów (pomija modele spoza SOURCES)"""
+    events = [build_event(entry) for entry in entries if entry._meta.label in SOURCES]
+    if events:
+        TimelineEvent.objects.bulk_create(events, ignore_conflicts=ignore_conflicts)
+    return len(events)
+
+
+# ============== STRUMIENIE ==============
+
+def global_stream():
+    return TimelineEvent.objects.select_related('user')
+
+
+def user_stream(user_id):
+    """Co zrobił użytkownik - indeks (user, -created_at, -id)"""
+    return global_stream().filter(user_id=user_id)
+
+
+def object_stream(object_type, object_id):
+    """Co działo się z obiektem - indeks (object_type, object_id, -created_at, -id)"""
+    return global_stream().filter(object_type=object_type, object_id=object_id)
+
+
+def get_page(stream, cursor=None, per_page=PAGE_SIZE):
+    return paginate_keyset(stream, cursor, per_page=per_page)
+
+
+# ============== UZUPEŁNIANIE ==============
+
+def backfill(source_label, chunk_size=1000):
+    """
+    Dodaje na oś czasu istniejące wpisy modelu źródłowego (odczyt porcjami);
+    wpisy już obecne są pomijane. Zwraca liczbę przetworzonych wpisów.
+    """
+    model = apps.get_model(source_label)
+    _, object_field = SOURCES[source_label]
+    queryset = model.objects.order_by('pk')
+    if object_field is not None:
+        queryset = queryset.select_related(object_field)
+    processed = 0
+    batch = []
+    for entry in queryset.iterator(chunk_size=chunk_size):
+        batch.append(entry)
+        if len(batch) >= chunk_size:
+            processed += record_events(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        processed += record_events(batch, ignore_conflicts=True)
+    return processed
+
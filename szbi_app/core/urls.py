@@ -27,6 +27,8 @@ urlpatterns = [
     
     # Uprawnienia (tylko przeglądanie - uprawnienia są predefiniowane)
     path('uprawnienia/', views.permission_list, name='permission_list'),
+    path('uprawnienia/macierz/', views.permission_matrix, name='permission_matrix'),
+    path('uprawnienia/macierz/eksport/<str:fmt>/', views.permission_matrix_export, name='permission_matrix_export'),
     
     # Grupy uprawnień (można tworzyć grupy i przypisywać do nich uprawnienia)
     path('uprawnienia/grupy/dodaj/', views.permission_group_create, name='permission_group_create'),
@@ -42,6 +44,9 @@ urlpatterns = [
     
     # Dziennik zdarzeń
     path('dziennik/', views.activity_log_list, name='activity_log_list'),
+    path('dziennik/eksport/<str:fmt>/', views.activity_log_export, name='activity_log_export'),
+    path('dziennik/statystyki/', views.activity_statistics, name='activity_statistics'),
+    path('os-czasu/', views.timeline_view, name='timeline'),
     
     # Zarządzanie hasłami (CERT Polska)
     path('haslo/zmien/', views.password_change, name='password_change'),
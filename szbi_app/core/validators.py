@@ -7,6 +7,7 @@ Zasady:
 - Maksymalna długość hasła: 64 znaki (lub więcej)
 - NIE wymuszamy znaków specjalnych, cyfr, wielkich liter
 - Sprawdzamy hasło na liście słabych/często używanych haseł (CERT PL wordlist)
+- Sprawdzamy hasło w lokalnym korpusie haseł z wycieków (format HIBP)
 - Sprawdzamy przewidywalne człony (nazwa firmy, usługi)
 - Podajemy dokładny powód odrzucenia hasła
 - NIE wymuszamy okresowej zmiany haseł
@@ -19,6 +20,8 @@ from pathlib import Path
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 
+from . import breached_passwords, password_index
+
 
 class CERTMinimumLengthValidator:
     """
@@ -66,37 +69,48 @@ class CERTPolishWeakPasswordValidator:
     """
     Walidator słabych haseł na podstawie polskiej listy CERT Polska.
     Lista zawiera ~1 mln najpopularniejszych haseł z wycieków.
-    Hasła ładowane są do pamięci jako zbiór (set) przy pierwszym użyciu.
+    Hasła sprawdzane są w binarnym indeksie mapowanym do pamięci
+    (core/password_index.py, komenda build_password_index), współdzielonym
+    przez procesy serwera. Bez indeksu lista ładowana jest do pamięci
+    jako zbiór (set) przy pierwszym użyciu.
     """
     
-    _passwords_cache = None
+    _passwords_cache = {}
     
-    def __init__(self, wordlist_path=None):
+    def __init__(self, wordlist_path=None, index_path=None):
         if wordlist_path is None:
             self.wordlist_path = os.path.join(
                 os.path.dirname(__file__), 'password_data', 'wordlist_pl.txt'
             )
         else:
             self.wordlist_path = wordlist_path
+        if index_path is None:
+            self.index_path = password_index.default_index_path(self.wordlist_path)
+        else:
+            self.index_path = index_path
     
     @classmethod
     def _load_passwords(cls, path):
-        """Ładuje listę słabych haseł do pamięci (cache)."""
-        if cls._passwords_cache is None:
-            cls._passwords_cache = set()
+        """Ładuje listę słabych haseł do pamięci (cache dla każdej listy)."""
+        if path not in cls._passwords_cache:
+            passwords = set()
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        word = line.strip().lower()
-                        if word:
-                            cls._passwords_cache.add(word)
+                passwords.update(password_index.iter_wordlist(path))
             except FileNotFoundError:
                 pass  # Jeśli plik nie istnieje, walidator jest pomijany
-        return cls._passwords_cache
+            cls._passwords_cache[path] = passwords
+        return cls._passwords_cache[path]
+    
+    def get_passwords(self):
+        """Indeks haseł (mmap) lub - bez indeksu - zbiór haseł w pamięci"""
+        index = password_index.open_index(self.index_path)
+        if index is not None:
+            return index
+        return self._load_passwords(self.wordlist_path)
     
     def validate(self, password, user=None):
-        passwords = self._load_passwords(self.wordlist_path)
-        if password.lower() in passwords:
+        passwords = self.get_passwords()
+        if password_index.normalize(password) in passwords:
             raise ValidationError(
                 _("To hasło znajduje się na liście często używanych haseł i jest łatwe do odgadnięcia. "
                   "Użyj bardziej unikalnego hasła — najlepiej pełnego zdania lub kilku niepowiązanych słów."),
@@ -107,6 +121,45 @@ class CERTPolishWeakPasswordValidator:
         return _("Hasło nie może znajdować się na liście popularnych/słabych haseł (lista CERT Polska).")
 
 
+class CERTBreachedPasswordValidator:
+    """
+    Walidator haseł ujawnionych w wyciekach danych na podstawie lokalnego
+    korpusu skrótów SHA-1 w formacie Have I Been Pwned (komenda
+    update_breached_passwords). Korpus sprawdzany jest przez mmap, bez
+    wczytywania do pamięci; bez zbudowanego korpusu walidator jest pomijany.
+    """
+    
+    def __init__(self, corpus_dir=None, min_count=None):
+        config = breached_passwords.get_config()
+        self.corpus_dir = corpus_dir or config['DIR']
+        self.min_count = min_count or config['MIN_COUNT']
+    
+    def validate(self, password, user=None):
+        corpus = breached_passwords.open_corpus(self.corpus_dir)
+        if corpus is None:
+            return
+        count = corpus.count(password)
+        if count >= self.min_count:
+            raise ValidationError(
+                _(f"To hasło zostało ujawnione w wyciekach danych ({count} razy) i może być "
+                  f"wykorzystane w atakach słownikowych. Użyj innego hasła."),
+                code='password_breached',
+                params={'count': count},
+            )
+    
+    def get_help_text(self):
+        return _("Hasło nie może znajdować się w znanych wyciekach danych.")
+
+
+# Proste sekwencje klawiaturowe
+KEYBOARD_PATTERNS = [
+    'qwertyuiop', 'asdfghjkl', 'zxcvbnm',
+    'qwerty', 'asdfgh', 'zxcvbn',
+    'qazwsx', 'wsxedc', '1qaz2wsx',
+    'zaq1xsw2', 'qaz123', 'asd123',
+]
+
+
 class CERTPredictablePatternValidator:
     """
     Walidator sprawdzający, czy hasło nie zawiera przewidywalnych członów
@@ -123,34 +176,38 @@ class CERTPredictablePatternValidator:
             ]
         else:
             self.predictable_words = predictable_words
+        # Sprawdzane są tylko człony co najmniej 4-znakowe
+        self.checked_words = [word for word in self.predictable_words if len(word) >= 4]
+    
+    def find_fragments(self, password_lower):
+        """Pierwszy (wg listy) przewidywalny człon w haśle i czy hasło zawiera sekwencję klawiaturową"""
+        word = next((word for word in self.checked_words if word.lower() in password_lower), None)
+        keyboard = any(pattern in password_lower for pattern in KEYBOARD_PATTERNS)
+        return word, keyboard
     
     def validate(self, password, user=None):
         password_lower = password.lower()
-        
+        word, keyboard = self.find_fragments(password_lower)
+        self.check(password, password_lower, word, keyboard, user)
+    
+    def check(self, password, password_lower, predictable_word, keyboard, user=None):
+        """Zgłasza błąd na podstawie znalezionych fragmentów (find_fragments lub core/password_policy.py)"""
         # Sprawdź czy hasło zawiera przewidywalne człony
-        for word in self.predictable_words:
-            if len(word) >= 4 and word.lower() in password_lower:
-                raise ValidationError(
-                    _(f"Hasło zawiera przewidywalny fragment \"{word}\". "
-                      f"Unikaj nazw systemu, firmy lub oczywistych słów."),
-                    code='password_predictable',
-                    params={'predictable_word': word},
-                )
+        if predictable_word is not None:
+            raise ValidationError(
+                _(f"Hasło zawiera przewidywalny fragment \"{predictable_word}\". "
+                  f"Unikaj nazw systemu, firmy lub oczywistych słów."),
+                code='password_predictable',
+                params={'predictable_word': predictable_word},
+            )
         
         # Sprawdź czy hasło jest prostą sekwencją klawiatury
-        keyboard_patterns = [
-            'qwertyuiop', 'asdfghjkl', 'zxcvbnm',
-            'qwerty', 'asdfgh', 'zxcvbn',
-            'qazwsx', 'wsxedc', '1qaz2wsx',
-            'zaq1xsw2', 'qaz123', 'asd123',
-        ]
-        for pattern in keyboard_patterns:
-            if pattern in password_lower:
-                raise ValidationError(
-                    _("Hasło zawiera sekwencję klawiaturową, która jest łatwa do odgadnięcia. "
-                      "Użyj bardziej losowego hasła."),
-                    code='password_keyboard_pattern',
-                )
+        if keyboard:
+            raise ValidationError(
+                _("Hasło zawiera sekwencję klawiaturową, która jest łatwa do odgadnięcia. "
+                  "Użyj bardziej losowego hasła."),
+                code='password_keyboard_pattern',
+            )
         
         # Sprawdź czy hasło to powtórzenie jednego znaku/wzorca
         if len(set(password)) <= 2 and len(password) >= 14:
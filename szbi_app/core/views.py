@@ -1,77 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import update_session_auth_hash
+from django.contrib.auth.models import User
 from django.contrib import messages
 from django.urls import reverse
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.db import models as db_models
-
-from .models import Organization, Department, Position, Permission, PermissionGroup, PositionPermission, DepartmentPermission, Employee, ActivityLog, EmployeePermissionGroup
+from django.http import StreamingHttpResponse, FileResponse, Http404
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+import csv
+import json
+import tempfile
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from .models import Organization, Department, Position, Permission, PermissionGroup, Employee, ActivityLog, EmployeePermissionGroup, ActivityLogParticipant
 from .forms import OrganizationForm, DepartmentForm, PositionForm, PermissionForm, PermissionGroupForm, EmployeeForm, PasswordChangeForm, AdminPasswordResetForm
-
-
-def get_related_objects(obj):
-    """
-    Zbiera wszystkie powiązane obiekty, które blokują lub zostaną skasowane kaskadowo.
-    Zwraca dict: {'protected': [...], 'cascade': [...], 'set_null': [...]}
-    """
-    result = {'protected': [], 'cascade': [], 'set_null': []}
-    
-    for related in obj._meta.get_fields():
-        # Relacje odwrotne (ForeignKey, OneToOne) - tylko odwrotne, nie forward
-        if related.one_to_many or related.one_to_one:
-            if not hasattr(related, 'related_model'):
-                continue
-            # Pomijamy forward relations (np. Employee.user)
-            if not hasattr(related, 'get_accessor_name'):
-                continue
-            accessor = related.get_accessor_name()
-            try:
-                manager = getattr(obj, accessor)
-                if hasattr(manager, 'count'):
-                    count = manager.count()
-                else:
-                    count = 1 if manager is not None else 0
-            except Exception:
-                continue
-            
-            if count == 0:
-                continue
-            
-            on_delete = getattr(related, 'on_delete', None)
-            model_name = related.related_model._meta.verbose_name_plural
-            
-            entry = {'model': model_name, 'count': count, 'accessor': accessor}
-            
-            if on_delete == db_models.PROTECT:
-                result['protected'].append(entry)
-            elif on_delete == db_models.CASCADE:
-                result['cascade'].append(entry)
-            elif on_delete == db_models.SET_NULL:
-                result['set_null'].append(entry)
-        
-        # Relacje M2M - tylko odwrotne
-        elif related.many_to_many:
-            if not hasattr(related, 'get_accessor_name'):
-                continue
-            accessor = related.get_accessor_name()
-            try:
-                manager = getattr(obj, accessor)
-                count = manager.count()
-            except Exception:
-                continue
-            
-            if count > 0:
-                model_name = related.related_model._meta.verbose_name_plural
-                result['cascade'].append({'model': model_name, 'count': count, 'accessor': accessor, 'm2m': True})
-    
-    return result
-
-
-def has_blocking_relations(related_info):
-    """Sprawdza czy są relacje PROTECT blokujące usunięcie"""
-    return len(related_info['protected']) > 0
+from .permission_matrix import PermissionMatrix
+from .org_tree import build_organization_tree
+from .related_objects import get_related_objects, has_blocking_relations
+from .assignments import sync_permission_groups
+from . import activity_stats, log_writer, log_archive, timeline
+from .activity_log import (
+    get_activity_log_filters, get_filtered_logs, get_archive_filter, paginate_keyset, get_relevance_page,
+    get_cached_count, EXPORT_COLUMNS, iter_export_logs, export_csv_row, escape_csv_value,
+)
 
 
 def is_admin(user):
@@ -103,6 +56,12 @@ def dashboard(request):
         'is_admin': is_admin(request.user),
         'display_name': display_name,
     }
+    if context['is_admin']:
+        # Trend aktywności z dziennych agregatów (bez odczytu dziennika)
+        context['activity_trend'] = activity_stats.with_bar_width([
+            (month.strftime('%m.%Y'), count) for month, count in activity_stats.monthly_trend(12)
+        ])
+        context['activity_last_week'] = sum(count for _, count in activity_stats.daily_trend(7))
     return render(request, 'core/dashboard.html', context)
 
 
@@ -113,7 +72,7 @@ def dashboard(request):
 def organization_structure(request):
     """Struktura organizacyjna - jedna główna organizacja"""
     organization = get_or_create_organization()
-    departments = organization.departments.filter(parent__isnull=True)
+    departments = build_organization_tree(organization)
     
     return render(request, 'core/organization_structure.html', {
         'organization': organization,
@@ -205,7 +164,7 @@ def department_delete(request, pk):
     """Usuwanie działu"""
     department = get_object_or_404(Department, pk=pk)
     organization = department.organization
-    related = get_related_objects(department)
+    related = get_related_objects(department, transitive=True)
     blocked = has_blocking_relations(related)
     
     if request.method == 'POST' and not blocked:
@@ -541,16 +500,7 @@ def position_permissions(request, pk):
     
     if request.method == 'POST':
         selected_groups = request.POST.getlist('permission_groups')
-        
-        # Usuń stare przypisania
-        PositionPermission.objects.filter(position=position).delete()
-        
-        # Dodaj nowe przypisania
-        for group_id in selected_groups:
-            PositionPermission.objects.create(
-                position=position,
-                permission_group_id=group_id
-            )
+        sync_permission_groups(position, selected_groups, request=request)
         
         messages.success(request, f'Uprawnienia dla stanowiska "{position.name}" zostały zaktualizowane.')
         return redirect('core:organization_structure')
@@ -573,16 +523,7 @@ def department_permissions(request, pk):
     
     if request.method == 'POST':
         selected_groups = request.POST.getlist('permission_groups')
-        
-        # Usuń stare przypisania
-        DepartmentPermission.objects.filter(department=department).delete()
-        
-        # Dodaj nowe przypisania
-        for group_id in selected_groups:
-            DepartmentPermission.objects.create(
-                department=department,
-                permission_group_id=group_id
-            )
+        sync_permission_groups(department, selected_groups, request=request)
         
         messages.success(request, f'Uprawnienia dla działu "{department.name}" zostały zaktualizowane.')
         return redirect('core:organization_structure')
@@ -602,6 +543,10 @@ def employee_list(request):
     """Lista pracowników"""
     organization = get_or_create_organization()
     employees = Employee.objects.filter(organization=organization).select_related('department', 'user').prefetch_related('positions')
+    # Ostatnia aktywność z listy uczestników dziennika (bez odczytu dziennika)
+    employees = employees.annotate(last_activity_at=Subquery(
+        ActivityLogParticipant.objects.filter(user_id=OuterRef('user_id')).values('last_activity_at')
+    ))
     
     return render(request, 'core/employee_list.html', {
         'employees': employees,
@@ -616,7 +561,7 @@ def employee_create(request):
     organization = get_or_create_organization()
     
     if request.method == 'POST':
-        form = EmployeeForm(request.POST, organization=organization)
+        form = EmployeeForm(request.POST, organization=organization, request=request)
         if form.is_valid():
             employee = form.save()
             log_activity(request, 'create', 'employee', employee, 
@@ -640,7 +585,7 @@ def employee_update(request, pk):
     organization = employee.organization
     
     if request.method == 'POST':
-        form = EmployeeForm(request.POST, instance=employee, organization=organization)
+        form = EmployeeForm(request.POST, instance=employee, organization=organization, request=request)
         if form.is_valid():
             form.save()
             log_activity(request, 'update', 'employee', employee, 
@@ -662,19 +607,10 @@ def employee_update(request, pk):
 def employee_delete(request, pk):
     """Usuwanie pracownika"""
     employee = get_object_or_404(Employee, pk=pk)
-    related = get_related_objects(employee)
-    # Sprawdź też powiązania user (PROTECT na DocumentLog, DocumentVersion itp.)
-    user_related = get_related_objects(employee.user)
-    blocked = has_blocking_relations(related) or has_blocking_relations(user_related)
-    
-    # Połącz informacje o powiązaniach
-    all_protected = related['protected'] + user_related['protected']
-    all_cascade = related['cascade'] + user_related['cascade']
-    combined_related = {
-        'protected': all_protected,
-        'cascade': all_cascade,
-        'set_null': related['set_null'] + user_related['set_null'],
-    }
+    # Usuwany jest też user (PROTECT na DocumentLog, DocumentVersion itp.), a wraz
+    # z nim kaskadowo pracownik - jedna analiza całego grafu obejmuje oba obiekty
+    combined_related = get_related_objects(employee.user, transitive=True)
+    blocked = has_blocking_relations(combined_related)
     
     if request.method == 'POST' and not blocked:
         user = employee.user
@@ -727,71 +663,215 @@ def employee_permissions(request, pk):
     })
 
 
-# ============== DZIENNIK ZDARZEŃ ==============
+@login_required
+@user_passes_test(is_admin)
+def permission_matrix(request):
+    """Macierz uprawnień: wszyscy pracownicy x wszystkie uprawnienia"""
+    organization = get_or_create_organization()
+    matrix = PermissionMatrix.build(organization)
+    
+    paginator = Paginator(range(len(matrix)), 100)  # 100 pracowników na stronę
+    page_obj = paginator.get_page(request.GET.get('page'))
+    rows = [
+        (matrix.employees[row], matrix.row_flags(row))
+        for row in page_obj.object_list
+    ]
+    
+    return render(request, 'core/permission_matrix.html', {
+        'organization': organization,
+        'permissions': matrix.permissions,
+        'column_counts': matrix.column_counts(),
+        'rows': rows,
+        'page_obj': page_obj,
+    })
+
+
+class _Echo:
+    """Pseudo-bufor dla csv.writer - zwraca zapisany wiersz zamiast go buforować"""
+    def write(self, value):
+        return value
+
 
 @login_required
 @user_passes_test(is_admin)
-def activity_log_list(request):
-    """Lista zdarzeń w dzienniku z filtrowaniem i paginacją"""
-    logs = ActivityLog.objects.select_related('user').all()
-    
-    # Filtrowanie po kategorii
-    category = request.GET.get('category')
-    if category:
-        logs = logs.filter(category=category)
-    
-    # Filtrowanie po akcji
-    action = request.GET.get('action')
-    if action:
-        logs = logs.filter(action=action)
-    
-    # Filtrowanie po użytkowniku
-    user_id = request.GET.get('user')
-    if user_id:
-        logs = logs.filter(user_id=user_id)
-    
-    # Filtrowanie po dacie od
-    date_from = request.GET.get('date_from')
-    if date_from:
-        logs = logs.filter(created_at__date__gte=date_from)
-    
-    # Filtrowanie po dacie do
-    date_to = request.GET.get('date_to')
-    if date_to:
-        logs = logs.filter(created_at__date__lte=date_to)
-    
-    # Wyszukiwanie tekstowe
-    search = request.GET.get('search')
-    if search:
-        logs = logs.filter(
-            Q(object_repr__icontains=search) |
-            Q(description__icontains=search) |
-            Q(user__username__icontains=search)
-        )
+def permission_matrix_export(request, fmt):
+    """Eksport macierzy uprawnień do CSV (strumieniowo) lub XLSX"""
+    organization = get_or_create_organization()
+    matrix = PermissionMatrix.build(organization)
     
-    # Paginacja
-    paginator = Paginator(logs, 50)  # 50 zdarzeń na stronę
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        
+        def stream():
+            yield '\ufeff'  # BOM - poprawne polskie znaki w Excelu
+            yield writer.writerow([escape_csv_value(value) for value in matrix.header()])
+            for row in matrix.iter_export_rows():
+                yield writer.writerow([escape_csv_value(value) for value in row])
+        
+        response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+        filename = 'macierz_uprawnien.csv'
+    elif fmt == 'xlsx':
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            messages.error(request, 'Eksport XLSX wymaga pakietu openpyxl. Użyj eksportu CSV.')
+            return redirect('core:permission_matrix')
+        
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Macierz uprawnień')
+        sheet.append(matrix.header())
+        for row in matrix.iter_export_rows():
+            sheet.append(row)
+        tmp = tempfile.TemporaryFile()
+        workbook.save(tmp)
+        tmp.seek(0)
+        response = FileResponse(
+            tmp, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        filename = 'macierz_uprawnien.xlsx'
+    else:
+        raise Http404
     
-    # Pobierz unikalne wartości do filtrów
-    from django.contrib.auth.models import User
-    users = User.objects.filter(activity_logs__isnull=False).distinct()
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    log_activity(request, 'export', 'permission', None,
+                 f'Wyeksportowano macierz uprawnień ({fmt.upper()}, {len(matrix)} pracowników)')
+    return response
+
+
+# ============== DZIENNIK ZDARZEŃ ==============
+
+@login_required
+@user_passes_test(is_admin)
+def activity_log_list(request):
+    """Lista zdarzeń w dzienniku z filtrowaniem i stronicowaniem kursorowym"""
+    log_writer.flush()  # wpisy oczekujące w buforze procesu
+    filters = get_activity_log_filters(request.GET)
+    logs = get_filtered_logs(filters)
+    if filters['search'] and filters['order'] == 'relevance':
+        page = get_relevance_page(filters)
+    else:
+        page = paginate_keyset(logs, request.GET.get('cursor'), archive_filter=get_archive_filter(filters))
     
     return render(request, 'core/activity_log_list.html', {
-        'page_obj': page_obj,
-        'logs': page_obj,
+        'page': page,
+        'logs': page,
+        'total_count': get_cached_count(logs, filters),
+        'archived_count': log_archive.archived_row_count(),
+        'categories': ActivityLog.CATEGORY_CHOICES,
+        'actions': ActivityLog.ACTION_CHOICES,
+        'participants': activity_stats.get_participants(),
+        'current_filters': filters,
+        'filter_query': urlencode({key: value for key, value in filters.items() if value}),
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def activity_log_export(request, fmt):
+    """Eksport dziennika (z filtrami listy, łącznie z archiwum) do CSV lub JSONL - strumieniowo"""
+    if fmt not in ('csv', 'jsonl'):
+        raise Http404
+    filters = get_activity_log_filters(request.GET)
+    log_activity(request, 'export', 'system', None,
+                 f'Wyeksportowano dziennik zdarzeń ({fmt.upper()})',
+                 details={'filters': {key: value for key, value in filters.items() if value}})
+    # Zapis bufora przed odczytem - na SQLite zapis w trakcie strumieniowania
+    # czekałby na zakończenie odczytu
+    log_writer.flush()
+    rows = iter_export_logs(filters)
+    
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        
+        def stream():
+            yield '\ufeff'  # BOM - poprawne polskie znaki w Excelu
+            yield writer.writerow([label for _, label in EXPORT_COLUMNS])
+            for row in rows:
+                yield writer.writerow(export_csv_row(row))
+        
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        def stream():
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+        
+        content_type = 'application/x-ndjson; charset=utf-8'
+    
+    response = StreamingHttpResponse(stream(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="dziennik_zdarzen.{fmt}"'
+    return response
+
+
+@login_required
+@user_passes_test(is_admin)
+def activity_statistics(request):
+    """Statystyki dziennika zdarzeń - trendy i zestawienia z dziennych agregatów"""
+    filters = {name: request.GET.get(name) or None for name in ('category', 'action', 'user')}
+    if filters['user'] and not filters['user'].isdigit():
+        filters['user'] = None
+    since = timezone.localdate() - timedelta(days=29)
+    
+    category_labels = dict(ActivityLog.CATEGORY_CHOICES)
+    action_labels = dict(ActivityLog.ACTION_CHOICES)
+    by_user = activity_stats.breakdown('user', since, **filters)
+    usernames = User.objects.in_bulk([row['user'] for row in by_user if row['user']])
+    
+    return render(request, 'core/activity_statistics.html', {
+        'monthly_trend': activity_stats.with_bar_width([
+            (month.strftime('%m.%Y'), count) for month, count in activity_stats.monthly_trend(12, **filters)
+        ]),
+        'daily_trend': activity_stats.with_bar_width([
+            (day.strftime('%d.%m'), count) for day, count in activity_stats.daily_trend(30, **filters)
+        ]),
+        'by_category': activity_stats.with_bar_width([
+            (category_labels.get(row['category'], row['category']), row['total'])
+            for row in activity_stats.breakdown('category', since, **filters)
+        ]),
+        'by_action': activity_stats.with_bar_width([
+            (action_labels.get(row['action'], row['action']), row['total'])
+            for row in activity_stats.breakdown('action', since, **filters)
+        ]),
+        'by_user': activity_stats.with_bar_width([
+            (usernames[row['user']].username if row['user'] in usernames else 'System', row['total'])
+            for row in by_user
+        ]),
         'categories': ActivityLog.CATEGORY_CHOICES,
         'actions': ActivityLog.ACTION_CHOICES,
-        'users': users,
-        'current_filters': {
-            'category': category,
-            'action': action,
-            'user': user_id,
-            'date_from': date_from,
-            'date_to': date_to,
-            'search': search,
-        }
+        'participants': activity_stats.get_participants(),
+        'current_filters': filters,
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def timeline_view(request):
+    """Wspólna oś czasu wszystkich dzienników - globalna, użytkownika lub obiektu"""
+    log_writer.flush()
+    user_id = request.GET.get('user') or None
+    object_type = request.GET.get('object_type') or None
+    object_id = request.GET.get('object_id') or None
+    if (user_id and not user_id.isdigit()) or (object_id and not object_id.isdigit()):
+        raise Http404
+    
+    subject_user = None
+    if object_type and object_id:
+        stream = timeline.object_stream(object_type, object_id)
+        params = {'object_type': object_type, 'object_id': object_id}
+    elif user_id:
+        subject_user = get_object_or_404(User, pk=user_id)
+        stream = timeline.user_stream(user_id)
+        params = {'user': user_id}
+    else:
+        stream = timeline.global_stream()
+        params = {}
+    page = timeline.get_page(stream, request.GET.get('cursor'))
+    
+    return render(request, 'core/timeline.html', {
+        'page': page,
+        'subject_user': subject_user,
+        'object_type': object_type if object_id else None,
+        'object_id': object_id,
+        'filter_query': urlencode(params),
     })
 
 
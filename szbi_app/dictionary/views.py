@@ -21,11 +21,7 @@ def has_dictionary_permission(user):
         return True
     
     if hasattr(user, 'employee'):
-        employee = user.employee
-        permissions = employee.get_permissions()
-        for perm in permissions:
-            if perm.category == 'dictionary':
-                return True
+        return 'dictionary' in user.employee.get_permission_categories()
     
     return False
 
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_alter_documentaccess_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Czas'),
+        ),
+    ]
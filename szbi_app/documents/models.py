@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Document(models.Model):
@@ -143,7 +144,7 @@ class DocumentLog(models.Model):
         verbose_name="Dokument"
     )
     user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name="Użytkownik")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Czas")
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Czas")
     action = models.CharField(
         max_length=30, choices=ACTION_CHOICES, verbose_name="Akcja"
     )
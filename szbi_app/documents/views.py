@@ -21,6 +21,7 @@ from core.mixins import (
     PERM_DOCUMENTS_ADMIN, PERM_DOCUMENTS_OWNER, PERM_DOCUMENTS_MANAGER,
     PERM_DOCUMENTS_APPROVER
 )
+from core import log_writer
 
 # Uprawnienia do przeglądania dokumentów
 DOCS_VIEW_PERMISSIONS = [PERM_DOCUMENTS_ADMIN, PERM_DOCUMENTS_OWNER, PERM_DOCUMENTS_MANAGER, PERM_DOCUMENTS_APPROVER]
@@ -30,12 +31,12 @@ DOCS_EDIT_PERMISSIONS = [PERM_DOCUMENTS_ADMIN, PERM_DOCUMENTS_OWNER, PERM_DOCUME
 
 def _log_action(document, user, action, description=""):
     """Helper do logowania akcji na dokumencie"""
-    DocumentLog.objects.create(
+    log_writer.enqueue(DocumentLog(
         document=document,
         user=user,
         action=action,
         description=description
-    )
+    ))
 
 
 class DocumentListView(SZBIPermissionRequiredMixin, ListView):
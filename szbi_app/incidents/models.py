@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from core.models import Employee
 from assets.models import Asset
 
@@ -239,7 +240,7 @@ class IncidentLog(models.Model):
         blank=True,
         verbose_name="Opis"
     )
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Data i czas")
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Data i czas")
 
     class Meta:
         verbose_name = "Dziennik incydentu"
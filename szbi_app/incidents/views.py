@@ -17,6 +17,7 @@ from core.mixins import (
     PERM_INCIDENTS_VIEW_ALL, PERM_INCIDENTS_VIEW_OWN,
     PERM_INCIDENTS_ADMIN, PERM_INCIDENTS_MANAGE
 )
+from core import log_writer
 
 # Uprawnienia do przeglądania wszystkich incydentów
 INCIDENTS_VIEW_ALL_PERMISSIONS = [PERM_INCIDENTS_ADMIN, PERM_INCIDENTS_VIEW_ALL, PERM_INCIDENTS_MANAGE]
@@ -26,12 +27,12 @@ INCIDENTS_MANAGE_PERMISSIONS = [PERM_INCIDENTS_ADMIN, PERM_INCIDENTS_MANAGE]
 
 def _log_action(incident, user, action, description=""):
     """Helper do logowania akcji na incydencie"""
-    IncidentLog.objects.create(
+    log_writer.enqueue(IncidentLog(
         incident=incident,
         user=user,
         action=action,
         description=description
-    )
+    ))
 
 
 class IncidentDeleteView(SZBIPermissionRequiredMixin, DeleteView):
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from core.models import Employee
 from dictionary.models import ISORequirement
 from documents.models import Document
@@ -189,7 +190,7 @@ class SoALog(models.Model):
         blank=True,
         verbose_name="Opis"
     )
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Data i czas")
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Data i czas")
 
     class Meta:
         verbose_name = "Dziennik Deklaracji Stosowania"
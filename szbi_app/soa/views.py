@@ -14,6 +14,7 @@ from core.mixins import (
     SZBIPermissionRequiredMixin, szbi_permission_required,
     PERM_COMPLIANCE_ADMIN, PERM_COMPLIANCE_OWNER, PERM_COMPLIANCE_MANAGER, PERM_COMPLIANCE_APPROVER
 )
+from core import log_writer
 
 # Uprawnienia do przeglądania deklaracji
 SOA_VIEW_PERMISSIONS = [PERM_COMPLIANCE_ADMIN, PERM_COMPLIANCE_OWNER, PERM_COMPLIANCE_MANAGER, PERM_COMPLIANCE_APPROVER]
@@ -23,12 +24,12 @@ SOA_EDIT_PERMISSIONS = [PERM_COMPLIANCE_ADMIN, PERM_COMPLIANCE_OWNER, PERM_COMPL
 
 def _log_action(declaration, user, action, description=""):
     """Helper do logowania akcji na deklaracji"""
-    SoALog.objects.create(
+    log_writer.enqueue(SoALog(
         declaration=declaration,
         user=user,
         action=action,
         description=description
-    )
+    ))
 
 
 # ============== DEKLARACJE ==============
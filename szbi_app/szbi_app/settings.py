@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.SZBIPermissionsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.szbi_permissions',
             ],
         },
     },
@@ -94,39 +96,30 @@ DATABASES = {
 # - Minimalna długość hasła: 14 znaków
 # - Pozwalanie na hasła do 128 znaków
 # - Sprawdzanie na polskiej liście słabych haseł CERT PL
+# - Sprawdzanie w offline korpusie haseł z wycieków (HIBP)
 # - Sprawdzanie przewidywalnych członów (nazwa firmy, systemu, itp.)
 # - NIE wymuszanie okresowej zmiany haseł
 # - NIE wymaganie znaków specjalnych, cyfr, wielkich liter
 # - Podawanie dokładnego powodu odrzucenia hasła
 
+# Argon2 z parametrami z kalibracji (komenda calibrate_argon2, core/hashers.py);
+# skróty z innymi parametrami aktualizowane są po zalogowaniu, po wysłaniu odpowiedzi
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'core.hashers.CalibratedArgon2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
     'django.contrib.auth.hashers.ScryptPasswordHasher',
 ]
 
+AUTHENTICATION_BACKENDS = ['core.backends.DeferredRehashModelBackend']
+
+# Wszystkie reguły (walidatory CERT z core/validators.py i podobieństwo do
+# danych użytkownika) sprawdzane są przez jeden walidator (core/password_policy.py)
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'core.validators.CERTMinimumLengthValidator',
-        'OPTIONS': {'min_length': 14},
-    },
-    {
-        'NAME': 'core.validators.CERTMaximumLengthValidator',
-        'OPTIONS': {'max_length': 128},
-    },
-    {
-        'NAME': 'core.validators.CERTPolishWeakPasswordValidator',
-    },
-    {
-        'NAME': 'core.validators.CERTPredictablePatternValidator',
-    },
-    {
-        'NAME': 'core.validators.CERTNoSequentialValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+        'NAME': 'core.password_policy.PasswordPolicyValidator',
+        'OPTIONS': {'min_length': 14, 'max_length': 128},
     },
 ]
 
@@ -166,3 +159,68 @@ SESSION_COOKIE_AGE = 3600  # Sesja wygasa po 1 godzinie
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
+
+# Cache (m.in. skompilowane uprawnienia SZBI - core/permission_cache.py)
+# LocMemCache jest osobny dla każdego procesu: unieważnienie dociera tylko do
+# procesu, który zapisał zmianę, a pozostałe widzą ją po SZBI_PERMISSION_CACHE_TIMEOUT.
+# Przy wielu procesach (gunicorn) należy ustawić współdzielony backend
+# (np. Redis/Memcached).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+SZBI_PERMISSION_CACHE_TIMEOUT = 3600
+
+# Buforowany zapis dziennika zdarzeń (core/log_writer.py)
+# BUFFERED=False - zapis synchroniczny (np. w testach)
+# Wpisy oczekujące w buforze (do MAX_SIZE wpisów, do MAX_AGE s) giną przy
+# awarii lub zabiciu procesu (SIGKILL); wyjątek inny niż DatabaseError przy
+# zapisie paczki traci całą paczkę, a wpisy niemożliwe do zapisania są tylko
+# logowane (logger core.log_writer).
+SZBI_ACTIVITY_LOG = {
+    'BUFFERED': True,
+    'MAX_SIZE': 100,           # liczba wpisów wymuszająca zapis
+    'MAX_AGE': 1.0,            # maksymalny czas oczekiwania wpisu w buforze (s)
+    'FLUSH_ON_REQUEST': False, # zapis po każdym żądaniu (True - krótsze okno utraty, mniejsze paczki)
+}
+
+# Czas (s) przechowywania w cache liczby zdarzeń dziennika dla danego zestawu
+# filtrów (core/activity_log.py); None - liczba nie jest wyświetlana
+SZBI_ACTIVITY_LOG_COUNT_TIMEOUT = 300
+
+# Backend wyszukiwania w dzienniku zdarzeń (core/log_search.py); None - wybór
+# automatyczny: indeks FTS5 na SQLite, w pozostałych przypadkach icontains
+SZBI_ACTIVITY_LOG_SEARCH_BACKEND = None
+
+# Archiwum dziennika zdarzeń (core/log_archive.py, komenda archive_activity_log)
+# Pełne miesiące starsze niż RETENTION_DAYS przenoszone są do plików w DIR
+SZBI_ACTIVITY_LOG_ARCHIVE = {
+    'DIR': BASE_DIR / 'archive' / 'activity_log',
+    'RETENTION_DAYS': 365,
+}
+
+# Łańcuch skrótów dziennika zdarzeń (core/log_chain.py, komenda verify_activity_log)
+# KEY - klucz podpisów HMAC punktów kontrolnych (None - SECRET_KEY)
+SZBI_ACTIVITY_LOG_CHAIN = {
+    'CHECKPOINT_INTERVAL': 10000,  # liczba wpisów między punktami kontrolnymi
+    'VERIFY_SEGMENT_SIZE': 50000,  # zakres id sprawdzany jako jedno zadanie (--workers)
+    'KEY': None,
+}
+
+# Offline korpus haseł z wycieków w formacie HIBP (core/breached_passwords.py,
+# komenda update_breached_passwords). Bez zbudowanego korpusu walidator
+# CERTBreachedPasswordValidator jest pomijany.
+# MIN_COUNT - minimalna liczba wystąpień w wyciekach odrzucająca hasło
+SZBI_BREACHED_PASSWORDS = {
+    'DIR': BASE_DIR / 'password_data' / 'breached',
+    'MIN_COUNT': 1,
+}
+
+# Skróty haseł (core/hashers.py)
+# PARAMS_FILE - parametry Argon2 zapisywane przez komendę calibrate_argon2
+# DEFERRED_REHASH=False - aktualizacja skrótu przy logowaniu od razu
+SZBI_PASSWORD_HASHING = {
+    'PARAMS_FILE': BASE_DIR / 'password_data' / 'argon2.json',
+    'DEFERRED_REHASH': True,
+}